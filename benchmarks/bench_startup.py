@@ -0,0 +1,110 @@
+# benchmarks/bench_startup.py
+"""헤드리스 렌더 경로의 콜드 스타트 시간 벤치마크 / 회귀 검사.
+
+    python benchmarks/bench_startup.py                   # 측정해서 출력
+    python benchmarks/bench_startup.py --save base.json  # 기준값 저장
+    python benchmarks/bench_startup.py --check base.json # 기준보다 느려지면 종료 코드 1
+    python benchmarks/bench_startup.py --check           # 저장소의 startup_baseline.json 과 비교
+
+매번 새 인터프리터를 띄워 canvas_core 를 불러오고 작은 장면 하나를 그린다. 기계마다 다른
+PyQt5.QtGui 자체 로딩 시간은 빼고 우리 모듈이 더한 시간만 비교한다. 헤드리스 경로에서
+불러오면 안 되는 모듈(QtWidgets, numpy, dataclasses 등)이 올라오면 바로 실패한다.
+기준 파일이 없거나 기준에 없는 케이스가 있으면 검사를 통과시키지 않고 실패한다.
+"""
+from __future__ import annotations
+from typing import Dict, List
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "benchmarks", "startup_baseline.json")
+
+# 헤드리스 경로에 있으면 안 되는 모듈
+FORBIDDEN = ("PyQt5.QtWidgets", "numpy", "dataclasses", "inspect")
+
+CASES = {
+    "qtgui": "import PyQt5.QtGui",
+    "import": "import canvas_core",
+    "render": ("from canvas_core import CanvasCore\n"
+               "c = CanvasCore(64, 64)\n"
+               "c.add_rect((4, 4), (40, 40), fill='red')\n"
+               "c.render()"),
+    "scene_io": "import canvas_core, scene_io",
+}
+
+_CHECK = ("import sys\n"
+          "{code}\n"
+          "bad = [m for m in {forbidden!r} if m in sys.modules]\n"
+          "if bad: sys.exit('loaded at startup: ' + ', '.join(bad))\n")
+
+def run_once(code:str) -> float:
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", _CHECK.format(code=code, forbidden=FORBIDDEN)],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = (time.perf_counter() - start) * 1000.0
+    if proc.returncode:
+        raise SystemExit(f"{code!r} failed: {proc.stderr.strip()}")
+    return elapsed
+
+def measure(repeat:int) -> Dict[str, float]:
+    # 케이스를 번갈아 돌려 시스템 부하 변화가 한쪽에만 몰리지 않게 한다
+    samples: Dict[str, List[float]] = {name: [] for name in CASES}
+    for name, code in CASES.items():
+        run_once(code)  # 바이트코드 캐시 데우기
+    for _ in range(repeat):
+        for name, code in CASES.items():
+            samples[name].append(run_once(code))
+    med = {name: statistics.median(v) for name, v in samples.items()}
+    # Qt 자체 로딩 시간을 뺀, 우리 코드가 더한 시간
+    return {name: round(ms - med["qtgui"], 2) if name != "qtgui" else round(ms, 2)
+            for name, ms in med.items()}
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-n", "--repeat", type=int, default=15)
+    ap.add_argument("--save", metavar="JSON", help="write the results as a baseline")
+    ap.add_argument("--check", metavar="JSON", nargs="?", const=BASELINE,
+                    help="fail if slower than this baseline (default: benchmarks/startup_baseline.json)")
+    ap.add_argument("--tolerance", type=float, default=0.25,
+                    help="allowed slowdown over the baseline (fraction, default 0.25)")
+    ap.add_argument("--slack-ms", type=float, default=5.0,
+                    help="absolute noise allowance in ms (default 5)")
+    args = ap.parse_args(argv)
+    if args.check and not os.path.exists(args.check):
+        # 기준이 없으면 비교할 것도 없다 - 조용히 통과시키지 않는다
+        ap.error(f"baseline {args.check} not found (create it with --save {args.check})")
+
+    result = measure(args.repeat)
+    for name, ms in result.items():
+        label = "PyQt5.QtGui alone" if name == "qtgui" else f"{name} (over QtGui)"
+        print(f"{label:<26} {ms:8.2f} ms")
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+    if args.check:
+        with open(args.check, encoding="utf-8") as f:
+            base = json.load(f)
+        failed = False
+        for name, ms in result.items():
+            if name == "qtgui":
+                continue
+            if name not in base:
+                failed = True
+                print(f"MISSING {name}: not in baseline {args.check}")
+                continue
+            limit = base[name] * (1 + args.tolerance) + args.slack_ms
+            if ms > limit:
+                failed = True
+                print(f"REGRESSION {name}: {ms:.2f} ms > {limit:.2f} ms (baseline {base[name]:.2f})")
+        return 1 if failed else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+# benchmarks/bench_suite.py
+"""CanvasCore / PaintCanvas / ShapeDrawingFunctions 주요 경로 벤치마크 (offscreen).
+
+    python benchmarks/bench_suite.py                          # 기본 크기로 전부
+    python benchmarks/bench_suite.py -k render --sizes 1000,100000
+    python benchmarks/bench_suite.py --out now.json           # 결과 JSON 저장
+    python benchmarks/bench_suite.py --check benchmarks/baseline.json  # 기준보다 느려지면 종료 코드 1
+
+케이스마다 장면 크기(도형 수 n)를 바꿔 가며 ``repeat`` 번 재고 중앙값/최솟값을 남긴다.
+난수 시드가 고정이라 같은 n 이면 항상 같은 장면이다. benchmarks/baseline.json 은 기본
+설정으로 잰 기준값이다 (meta 의 환경에서). 다른 기계에서는 --out 으로 새로 만들어 쓴다.
+"""
+from __future__ import annotations
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PyQt5.QtCore import PYQT_VERSION_STR, QT_VERSION_STR, Qt, QEvent, QPoint
+from PyQt5.QtGui import QMouseEvent, QPainter
+from PyQt5.QtWidgets import QApplication, QWidget
+
+from canvas_core import CanvasCore
+
+W, H = 1920, 1080
+DEFAULT_SIZES = (1000, 10000)
+KINDS = ("rect", "ellipse", "line", "triangle")
+COLORS = ("red", "green", "blue", "yellow", "#336699", None)
+
+# (setup(n) -> state, run(state) -> None, 한 번 실행당 작업 수, 단위)
+Case = Tuple[Callable[[int], Any], Callable[[Any], None], Callable[[int], int], str]
+CASES: Dict[str, Case] = {}
+# 위젯 케이스용. 참조가 없으면 PyQt 가 바로 지운다
+_app: Optional[QApplication] = None
+
+def case(name:str, ops:Callable[[int], int]=lambda n: 1, unit:str="ms"):
+    def deco(fn):
+        setup, run = fn()
+        CASES[name] = (setup, run, ops, unit)
+        return fn
+    return deco
+
+def random_shapes(n:int, seed:int=1) -> List[tuple]:
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        x, y = rnd.randrange(W), rnd.randrange(H)
+        out.append((KINDS[i % 4], (x, y), (x + rnd.randint(-60, 60), y + rnd.randint(-60, 60)),
+                    rnd.choice(COLORS[:-1]), rnd.randint(1, 4), rnd.choice(COLORS)))
+    return out
+
+def build_core(n:int, render:bool=True) -> CanvasCore:
+    core = CanvasCore(W, H)
+    for kind, p1, p2, stroke, width, fill in random_shapes(n):
+        if kind == "line":
+            core.add_line(p1, p2, stroke, width)
+        else:
+            getattr(core, "add_" + kind)(p1, p2, stroke, width, fill)
+    if render:
+        core.render()
+    return core
+
+def _add_case(kind:str):
+    def fn():
+        def setup(n):
+            return CanvasCore(W, H), random_shapes(n)
+        def run(state):
+            core, shapes = state
+            add = getattr(core, "add_" + kind)
+            if kind == "line":
+                for _, p1, p2, stroke, width, _ in shapes:
+                    add(p1, p2, stroke, width)
+            else:
+                for _, p1, p2, stroke, width, fill in shapes:
+                    add(p1, p2, stroke, width, fill)
+        return setup, run
+    case(f"add_{kind}", ops=lambda n: n, unit="us/op")(fn)
+
+for _kind in KINDS:
+    _add_case(_kind)
+
+@case("render_full")
+def _render_full():
+    return build_core, lambda core: core.render(full=True)
+
+@case("render_dirty")
+def _render_dirty():
+    # 도형 하나의 색이 바뀐 뒤의 한 프레임 (부분 다시 그리기)
+    def setup(n):
+        core = build_core(n)
+        core.set_fill_by_id(core.store.ids[n // 2], "magenta")
+        return core
+    return setup, lambda core: core.render()
+
+_FILL_OPS = 200
+
+@case("set_fill_by_id", ops=lambda n: _FILL_OPS, unit="us/op")
+def _set_fill_by_id():
+    def setup(n):
+        core = build_core(n)
+        rnd = random.Random(2)
+        ids = core.store.ids
+        return core, [ids[rnd.randrange(len(ids))] for _ in range(_FILL_OPS)]
+    def run(state):
+        core, ids = state
+        for i, sid in enumerate(ids):
+            core.set_fill_by_id(sid, COLORS[i % 5])
+            core.render()
+    return setup, run
+
+@case("set_fill_at_point", ops=lambda n: _FILL_OPS, unit="us/op")
+def _set_fill_at_point():
+    def setup(n):
+        rnd = random.Random(3)
+        return build_core(n), [(rnd.randrange(W), rnd.randrange(H)) for _ in range(_FILL_OPS)]
+    def run(state):
+        core, points = state
+        for i, xy in enumerate(points):
+            core.set_fill_at_point(xy, COLORS[i % 5])
+            core.render()
+    return setup, run
+
+@case("save_image_png")
+def _save_image():
+    def setup(n):
+        return build_core(n), os.path.join(tempfile.gettempdir(), "bench_suite.png")
+    def run(state):
+        core, path = state
+        core.save_image(path)
+    return setup, run
+
+# 마우스 이벤트 흐름: 이벤트 _FRAME 개마다 이벤트 루프를 한 번 돌려 한 프레임을 흉내 낸다
+_EVENTS = 2000
+_FRAME = 8
+
+def _mouse(kind, x, y):
+    buttons = Qt.NoButton if kind == QEvent.MouseButtonRelease else Qt.LeftButton
+    return QMouseEvent(kind, QPoint(x, y), Qt.LeftButton, buttons, Qt.NoModifier)
+
+def _drag_path(seed:int, count:int) -> List[Tuple[int, int]]:
+    rnd = random.Random(seed)
+    x, y = 300, 300
+    path = []
+    for _ in range(count):
+        x = min(max(x + rnd.randint(-6, 6), 0), 599)
+        y = min(max(y + rnd.randint(-6, 6), 0), 599)
+        path.append((x, y))
+    return path
+
+def _replay(widget, path, press, move, release, app) -> None:
+    press(_mouse(QEvent.MouseButtonPress, *path[0]))
+    for i, (x, y) in enumerate(path[1:], 1):
+        move(_mouse(QEvent.MouseMove, x, y))
+        if i % _FRAME == 0:
+            app.processEvents()
+    release(_mouse(QEvent.MouseButtonRelease, *path[-1]))
+    app.processEvents()
+
+@case("paint_canvas_stroke", ops=lambda n: _EVENTS, unit="us/op")
+def _paint_canvas_stroke():
+    # n 은 획 하나당 이벤트 수가 아니라 미리 그려 둔 획 수 (n // 100)
+    from paint_canvas import PaintCanvas
+    def setup(n):
+        app = QApplication.instance()
+        w = PaintCanvas(600, 600)
+        w.show()
+        for s in range(max(1, n // 100)):
+            _replay(w, _drag_path(100 + s, 50), w.mousePressEvent, w.mouseMoveEvent,
+                    w.mouseReleaseEvent, app)
+        return w, _drag_path(4, _EVENTS + 1)
+    def run(state):
+        w, path = state
+        _replay(w, path, w.mousePressEvent, w.mouseMoveEvent, w.mouseReleaseEvent,
+                QApplication.instance())
+    return setup, run
+
+class _ShapeHost(QWidget):
+    # main.MainApp 의 도형 영역과 같은 연결
+    def __init__(self):
+        super().__init__()
+        self.setFixedSize(600, 600)
+        from shape_drawing import ShapeDrawingFunctions
+        self.drawer = ShapeDrawingFunctions(self)
+
+    def paintEvent(self, event):
+        p = QPainter(self)
+        self.drawer.paint(p, event.rect())
+        p.end()
+
+@case("shape_drawing_drag", ops=lambda n: _EVENTS, unit="us/op")
+def _shape_drawing_drag():
+    def setup(n):
+        w = _ShapeHost()
+        w.show()
+        d = w.drawer
+        for kind, p1, p2, *_ in random_shapes(n):
+            d.set_shape({"rect": "사각형", "ellipse": "원", "triangle": "삼각형", "line": "직선"}[kind])
+            d.start_drawing(p1[0] % 600, p1[1] % 600)
+            d.finish_drawing(p2[0] % 600, p2[1] % 600)
+        QApplication.instance().processEvents()
+        return w, _drag_path(5, _EVENTS + 1)
+    def run(state):
+        w, path = state
+        d = w.drawer
+        d.set_shape("원")
+        _replay(w, path, lambda e: d.start_drawing(e.x(), e.y()),
+                lambda e: d.update_drawing(e.x(), e.y()),
+                lambda e: d.finish_drawing(e.x(), e.y()), QApplication.instance())
+    return setup, run
+
+def run_case(name:str, n:int, repeat:int) -> Dict[str, Any]:
+    setup, run, ops, unit = CASES[name]
+    scale = 1e6 if unit == "us/op" else 1e3
+    samples = []
+    for _ in range(repeat):
+        state = setup(n)
+        start = time.perf_counter()
+        run(state)
+        samples.append((time.perf_counter() - start) * scale / ops(n))
+    return {"unit": unit, "median": round(statistics.median(samples), 4),
+            "min": round(min(samples), 4), "repeat": repeat}
+
+def run_all(names:Sequence[str], sizes:Sequence[int], repeat:int,
+            log:Optional[Callable[[str], None]]=print) -> Dict[str, Any]:
+    results = {}
+    for name in names:
+        for n in sizes:
+            key = f"{name}[n={n}]"
+            results[key] = run_case(name, n, repeat)
+            if log is not None:
+                r = results[key]
+                log(f"{key:<34} {r['median']:>12.3f} {r['unit']:<6} (min {r['min']:.3f})")
+    return {"meta": {"python": platform.python_version(), "qt": QT_VERSION_STR,
+                     "pyqt": PYQT_VERSION_STR, "platform": platform.platform(),
+                     "machine": platform.machine(), "canvas": [W, H],
+                     "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "results": results}
+
+def compare(current:Dict[str, Any], baseline:Dict[str, Any], tolerance:float) -> List[str]:
+    """기준보다 (1 + tolerance) 배 넘게 느려진 항목을 돌려준다. 없는 항목은 건너뛴다."""
+    slow = []
+    base = baseline.get("results", {})
+    for key, r in current["results"].items():
+        b = base.get(key)
+        if b is None or b.get("unit") != r["unit"] or b["median"] <= 0:
+            continue
+        ratio = r["median"] / b["median"]
+        if ratio > 1 + tolerance:
+            slow.append(f"{key}: {r['median']:.3f} vs {b['median']:.3f} {r['unit']} (x{ratio:.2f})")
+    return slow
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-k", dest="pattern", default="", help="run only cases whose name contains this")
+    ap.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                    help="comma-separated shape counts (default: %(default)s)")
+    ap.add_argument("-n", "--repeat", type=int, default=5)
+    ap.add_argument("--out", metavar="JSON", help="write results to this file")
+    ap.add_argument("--check", metavar="JSON", help="compare against this baseline")
+    ap.add_argument("--tolerance", type=float, default=0.2,
+                    help="allowed slowdown over the baseline (fraction, default 0.2)")
+    ap.add_argument("--list", action="store_true", help="list the cases and exit")
+    args = ap.parse_args(argv)
+
+    if args.list:
+        print("\n".join(CASES))
+        return 0
+    global _app
+    _app = QApplication.instance() or QApplication(sys.argv[:1])
+    names = [name for name in CASES if args.pattern in name]
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    current = run_all(names, sizes, args.repeat)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    if args.check:
+        with open(args.check, encoding="utf-8") as f:
+            slow = compare(current, json.load(f), args.tolerance)
+        for line in slow:
+            print("REGRESSION", line)
+        return 1 if slow else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,32 @@
 from __future__ import annotations
-from typing import List, Tuple, Optional, Union
-from dataclasses import dataclass, field
-import math
+from array import array
+import os
+import time
+from typing import Iterable, List, Mapping, Tuple, Optional
 
-from PyQt5.QtCore import Qt, QPoint, QRect
-from PyQt5.QtGui import QImage, QPainter, QPen, QBrush, QColor
+from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtGui import QImage, QPainter, QColor, QRegion
 
-ColorLike = Union[str, Tuple[int, int, int], QColor]
+from color import ColorLike, pack_color, to_qcolor
+from spatial_index import Bounds, GridIndex
+from shape_store import RECT, ELLIPSE, LINE, TRIANGLE, ShapeStore, ShapeView
+from paint_batch import BatchPainter, FrameStats, StyleCache
+from undo import DEFAULT_BUDGET, Command, UndoStack
+import metrics
 
-def _to_qcolor(c: Optional[ColorLike]) -> Optional[QColor]:
-    if c is None:
-        return None
-    if isinstance(c, QColor):
-        return QColor(c)
-    if isinstance(c, tuple) and len(c) == 3:
-        r, g, b = c
-        return QColor(int(r), int(g), int(b))
-    return QColor(str(c))
+# 예전 API 의 Shape 데이터클래스들은 shape_types 에 있다. dataclasses 를 불러오는
+# 비용을 헤드리스 경로에서 빼려고, 처음 접근할 때만 가져온다 (canvas_core.RectShape 등)
+_SHAPE_TYPES = ("Shape", "LineShape", "RectShape", "EllipseShape", "TriangleShape")
+
+def __getattr__(name:str):
+    if name in _SHAPE_TYPES:
+        import shape_types
+        return getattr(shape_types, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+_MAX_DIRTY_RECTS = 256
+_BACKENDS = ("qpainter", "numpy", "numpy_exact")
+_BLACK = 0xff000000
 
 _id_seed = 0
 def _next_id() -> int:
@@ -24,147 +34,635 @@ def _next_id() -> int:
     _id_seed += 1
     return _id_seed
 
-@dataclass
-class Shape:
-    id: int
-    stroke: QColor
-    width: int
-    fill: Optional[QColor] = None
-
-    def draw(self, p: QPainter) -> None:
-        raise NotImplementedError
-
-    def contains(self, pt: QPoint) -> bool:
-        raise NotImplementedError
-
-    def set_fill(self, color: Optional[ColorLike]) -> None:
-        self.fill = _to_qcolor(color)
-
-@dataclass
-class LineShape(Shape):
-    p1: QPoint = field(default_factory=QPoint)
-    p2: QPoint = field(default_factory=QPoint)
-
-    def draw(self, p: QPainter) -> None:
-        p.setPen(QPen(self.stroke, self.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
-        p.setBrush(Qt.NoBrush)
-        p.drawLine(self.p1, self.p2)
-
-    def contains(self, pt: QPoint) -> bool:
-        x, y = pt.x(), pt.y()  # <- pt.y() 추가
-        x1, y1 = self.p1.x(), self.p1.y()
-        x2, y2 = self.p2.x(), self.p2.y()
-        dx, dy = x2 - x1, y2 - y1
-        if dx == 0 and dy == 0:
-            dist = math.hypot(x - x1, y - y1)
-        else:
-            t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / float(dx*dx + dy*dy)))
-            projx, projy = x1 + t*dx, y1 + t*dy
-            dist = math.hypot(x - projx, y - projy)
-        return dist <= max(3.0, self.width/2 + 1.5)
-
-@dataclass
-class RectShape(Shape):
-    rect: QRect = field(default_factory=QRect)
-
-    def draw(self, p: QPainter) -> None:
-        p.setPen(QPen(self.stroke, self.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
-        p.setBrush(QBrush(self.fill) if self.fill is not None else Qt.NoBrush)
-        p.drawRect(self.rect)
-
-    def contains(self, pt: QPoint) -> bool:
-        return self.rect.contains(pt)
-
-@dataclass
-class EllipseShape(Shape):
-    rect: QRect = field(default_factory=QRect)
-
-    def draw(self, p: QPainter) -> None:
-        p.setPen(QPen(self.stroke, self.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
-        p.setBrush(QBrush(self.fill) if self.fill is not None else Qt.NoBrush)
-        p.drawEllipse(self.rect)
-
-    def contains(self, pt: QPoint) -> bool:
-        if self.rect.width() == 0 or self.rect.height() == 0:
-            return False
-        cx = self.rect.x() + self.rect.width()/2.0
-        cy = self.rect.y() + self.rect.height()/2.0
-        rx = self.rect.width()/2.0
-        ry = self.rect.height()/2.0
-        nx = (pt.x() - cx)/rx
-        ny = (pt.y() - cy)/ry
-        return nx*nx + ny*ny <= 1.0
+def _reserve_ids(upto:int) -> None:
+    # 불러온 장면의 id 와 겹치지 않도록 시드를 최소 upto 까지 올린다
+    global _id_seed
+    _id_seed = max(_id_seed, upto)
 
 class CanvasCore:
-    def __init__(self, width:int=800, height:int=500, bg:ColorLike="white") -> None:
-        self._bg = _to_qcolor(bg) or QColor(Qt.white)
+    """도형 장면과 그 래스터 이미지.
+
+    ``backend`` 는 "qpainter"(기본), "numpy", "numpy_exact" 중 하나다. NumPy 백엔드는
+    안티앨리어싱을 하지 않으므로 ``antialias`` 를 생략하면 qpainter 에서는 켜고 NumPy
+    백엔드에서는 끈다. NumPy 백엔드에 ``antialias=True`` 를 주면 ValueError.
+    """
+
+    def __init__(self, width:int=800, height:int=500, bg:ColorLike="white", index_cell:int=64,
+                 backend:str="qpainter", antialias:Optional[bool]=None) -> None:
+        if backend not in _BACKENDS:
+            raise ValueError(f"unknown backend {backend!r}, expected one of {_BACKENDS}")
+        if antialias is None:
+            antialias = backend == "qpainter"
+        elif antialias and backend != "qpainter":
+            raise ValueError(f"backend {backend!r} does not antialias, pass antialias=False")
+        self._bg = to_qcolor(bg) or QColor(Qt.white)
         self.image = QImage(width, height, QImage.Format_RGB32)
-        self.shapes: List[Shape] = []
+        self.backend = backend
+        self.antialias = antialias
+        self._raster = None
+        self._raster_stale = True
+        self._store = ShapeStore()
+        self._store.on_change = self._on_store_change
+        self._z_top = 0
+        self._z_bottom = 0
+        self._order: Optional[array] = array("i")
+        self._index = GridIndex(index_cell, bounds_of=self._store.bounds)
+        self._index_pending = False
+        self._index_bounds = None
+        self._hit_table = None
+        self._dirty: List[Bounds] = []
+        self._full_dirty = False
+        # 마지막 render 이후 맨 위에 추가만 된 도형 - 지울 필요 없이 덧그리면 된다
+        self._appended: List[int] = []
+        self._styles = StyleCache()
+        self.last_frame = FrameStats()
+        # enable_history() 전에는 None - 기록 비용이 전혀 없다
+        self.history: Optional[UndoStack] = None
+        # 장면이 바뀔 때마다 증가 - 비동기 렌더 결과가 아직 유효한지 가린다
+        self._version = 0
+        self._render_queue = None
+        # None 이면 월드 좌표 = 이미지 좌표 (부분 다시 그리기 경로). 설정하면 viewport 로 그린다
+        self._view = None
+        self._lod = None  # (장면 버전, viewport.LodTable)
         self._clear_image()
 
+    @property
+    def store(self) -> ShapeStore:
+        return self._store
+
+    @property
+    def index(self) -> GridIndex:
+        # 불러온 장면은 공간 인덱스를 처음 질의할 때 만든다
+        if self._index_pending:
+            self._build_index()
+        return self._index
+
+    @property
+    def shapes(self) -> List[ShapeView]:
+        # z 순서(아래 -> 위)의 프록시 리스트. 도형 데이터는 저장소 열에 있다
+        store = self._store
+        return [store.view_at(r) for r in self._rows_in_z()]
+
     def add_line(self, p1:Tuple[int,int], p2:Tuple[int,int], stroke:ColorLike="black", width:int=3) -> int:
-        s = LineShape(id=_next_id(), stroke=_to_qcolor(stroke) or QColor(Qt.black),
-                      width=max(1,width), fill=None, p1=QPoint(*p1), p2=QPoint(*p2))
-        self.shapes.append(s)
-        return s.id
+        return self._add(LINE, p1[0], p1[1], p2[0], p2[1], stroke, width, None)
 
     def add_rect(self, p1:Tuple[int,int], p2:Tuple[int,int], stroke:ColorLike="black",
                  width:int=3, fill:Optional[ColorLike]=None) -> int:
-        rect = _make_rect(p1,p2)
-        s = RectShape(id=_next_id(), stroke=_to_qcolor(stroke) or QColor(Qt.black),
-                      width=max(1,width), fill=_to_qcolor(fill), rect=rect)
-        self.shapes.append(s)
-        return s.id
+        return self._add(RECT, *_norm_rect(p1,p2), stroke, width, fill)
 
     def add_ellipse(self, p1:Tuple[int,int], p2:Tuple[int,int], stroke:ColorLike="black",
                     width:int=3, fill:Optional[ColorLike]=None) -> int:
-        rect = _make_rect(p1,p2)
-        s = EllipseShape(id=_next_id(), stroke=_to_qcolor(stroke) or QColor(Qt.black),
-                         width=max(1,width), fill=_to_qcolor(fill), rect=rect)
-        self.shapes.append(s)
-        return s.id
+        return self._add(ELLIPSE, *_norm_rect(p1,p2), stroke, width, fill)
+
+    def add_triangle(self, p1:Tuple[int,int], p2:Tuple[int,int], stroke:ColorLike="black",
+                     width:int=3, fill:Optional[ColorLike]=None) -> int:
+        # 꼭짓점은 p1 행의 가운데, 밑변은 p2 행 (ShapeDrawingFunctions 의 삼각형과 같은 모양)
+        return self._add(TRIANGLE, p1[0], p1[1], p2[0], p2[1], stroke, width, fill)
 
     def set_fill_by_id(self, shape_id:int, color:Optional[ColorLike]) -> bool:
-        shp = self._find(shape_id)
-        if not shp: return False
-        if isinstance(shp, LineShape):
-            shp.set_fill(None)
-            return True
-        shp.set_fill(color)
+        if shape_id not in self._store: return False
+        before = self._snapshot((shape_id,))
+        self._store.set_fill(shape_id, pack_color(color))
+        self._record(before)
         return True
 
+    def set_fill_many(self, colors:Mapping[int, Optional[ColorLike]]) -> int:
+        store = self._store
+        ids = [sid for sid in colors if sid in store]
+        before = self._snapshot(ids)
+        for sid in ids:
+            store.set_fill(sid, pack_color(colors[sid]))
+        self._record(before)
+        return len(ids)
+
+    def remove(self, ids:Iterable[int]) -> int:
+        store = self._store
+        ids = [sid for sid in ids if sid in store]
+        before = self._snapshot(ids)
+        n = 0
+        for sid in ids:
+            if sid not in store: continue
+            self._mark_dirty(store.bounds(sid))
+            self.index.remove(sid)
+            store.remove(sid)
+            n += 1
+        if n:
+            self._order = None
+            self._hit_table = None
+        self._record(before)
+        return n
+
+    def reorder(self, ids:Iterable[int], front:bool=True) -> int:
+        # ids 의 상대 순서를 유지한 채 맨 위(front) 또는 맨 아래로 옮긴다
+        store = self._store
+        ids = [sid for sid in ids if sid in store]
+        before = self._snapshot(ids)
+        for sid in ids:
+            self._mark_dirty(store.bounds(sid))
+        if front:
+            for sid in ids:
+                self._z_top += 1
+                store.z[store.row(sid)] = self._z_top
+        else:
+            for sid in reversed(ids):
+                self._z_bottom -= 1
+                store.z[store.row(sid)] = self._z_bottom
+        if ids:
+            self._order = None
+            self._hit_table = None
+        self._record(before)
+        return len(ids)
+
     def set_fill_at_point(self, xy:Tuple[int,int], color:Optional[ColorLike]) -> Optional[int]:
-        pt = QPoint(*xy)
-        for shp in reversed(self.shapes):
-            if isinstance(shp, LineShape): continue
-            if shp.contains(pt):
-                shp.set_fill(color)
-                return shp.id
+        sid = self.hit_test(xy)
+        if sid is None:
+            return None
+        self.set_fill_by_id(sid, color)
+        return sid
+
+    def hit_test(self, xy:Tuple[int,int], include_lines:bool=False) -> Optional[int]:
+        store = self._store
+        for sid in self._by_z(self.index.query_point(*xy)):
+            if not include_lines and store.kind[store.row(sid)] == LINE: continue
+            if store.contains(sid, *xy):
+                return sid
         return None
 
-    def render(self) -> None:
-        self._clear_image()
-        p = QPainter(self.image)
-        p.setRenderHint(QPainter.Antialiasing, True)
-        for shp in self.shapes:
-            shp.draw(p)
-        p.end()
+    def hits_at(self, xy:Tuple[int,int], include_lines:bool=False) -> List[int]:
+        store = self._store
+        out = []
+        for sid in self._by_z(self.index.query_point(*xy)):
+            if not include_lines and store.kind[store.row(sid)] == LINE: continue
+            if store.contains(sid, *xy):
+                out.append(sid)
+        return out
+
+    def hits_in_rect(self, p1:Tuple[int,int], p2:Tuple[int,int], include_lines:bool=True) -> List[int]:
+        (x1,y1), (x2,y2) = p1, p2
+        ids = self._by_z(self.index.query_rect((min(x1,x2), min(y1,y2), max(x1,x2), max(y1,y2))))
+        if include_lines:
+            return ids
+        store = self._store
+        return [sid for sid in ids if store.kind[store.row(sid)] != LINE]
+
+    def hit_test_rect(self, p1:Tuple[int,int], p2:Tuple[int,int], include_lines:bool=True) -> Optional[int]:
+        ids = self.hits_in_rect(p1, p2, include_lines)
+        return ids[0] if ids else None
+
+    def hit_test_many(self, points, include_lines:bool=False):
+        """점 배열 (N, 2) 마다 맨 위 도형 id 를 NumPy 로 한 번에 구한다 (없으면 -1)."""
+        from hit_batch import CellTable, as_points
+        if self._hit_table is None:
+            self._hit_table = CellTable(self._store, self.index.cell, self.index.max_cells)
+        xs, ys = as_points(points)
+        return self._hit_table.query(xs, ys, include_lines)
+
+    def set_fill_at_points(self, points, colors):
+        """점마다 set_fill_at_point 를 차례로 부른 것과 같다.
+
+        colors 는 색 하나(None, str, int, QColor, (r, g, b[, a]) 튜플) 또는 점 수만큼의 색
+        시퀀스(list, NumPy 배열 등 튜플이 아닌 것). 점이 세 개일 때 리스트는 늘 점마다 색이다.
+        """
+        ids = self.hit_test_many(points)
+        colors = _per_point_colors(colors)
+        per_point = isinstance(colors, list)
+        if per_point and len(colors) != len(ids):
+            raise ValueError(f"expected {len(ids)} colors, got {len(colors)}")
+        packed = None if per_point else pack_color(colors)
+        store = self._store
+        hits = ids.tolist()
+        before = self._snapshot({sid for sid in hits if sid >= 0})
+        for i, sid in enumerate(hits):
+            if sid < 0: continue
+            store.set_fill(sid, pack_color(colors[i]) if per_point else packed)
+        self._record(before)
+        return ids
+
+    def enable_history(self, budget:int=DEFAULT_BUDGET) -> UndoStack:
+        """도형 편집(add/remove/채우기/z 순서/clear)을 undo 할 수 있게 기록하기 시작한다.
+
+        기록은 바뀐 도형의 전/후 레코드뿐이라 undo 비용은 도형 수와 무관하다.
+        ``budget`` 바이트를 넘으면 오래된 기록부터 버린다.
+        """
+        if self.history is None:
+            self.history = UndoStack(budget)
+        else:
+            self.history.budget = budget
+        return self.history
+
+    def undo(self) -> bool:
+        return self.history is not None and self.history.undo()
+
+    def redo(self) -> bool:
+        return self.history is not None and self.history.redo()
+
+    @property
+    def is_dirty(self) -> bool:
+        return self._full_dirty or bool(self._dirty) or bool(self._appended)
+
+    def pending_rect(self) -> Optional[QRect]:
+        # 다음 render 가 바꿀 이미지 영역 (바뀔 것이 없으면 None)
+        if self._full_dirty or (self._view is not None and self.is_dirty):
+            return self.image.rect()
+        store = self._store
+        boxes = self._dirty + [store.bounds(sid) for sid in self._appended if sid in store]
+        if not boxes:
+            return None
+        x0, y0, x1, y1 = zip(*boxes)
+        return QRect(min(x0), min(y0), max(x1) - min(x0) + 1, max(y1) - min(y0) + 1) \
+            .intersected(self.image.rect())
+
+    def invalidate(self, rect:Optional[QRect]=None) -> None:
+        # rect 가 없으면 전체 다시 그림
+        if rect is None:
+            self._version += 1
+            self._full_dirty = True
+            self._raster_stale = True
+        else:
+            self._mark_dirty((rect.left(), rect.top(), rect.right(), rect.bottom()))
+
+    @property
+    def view(self):
+        return self._view
+
+    def set_view(self, view) -> None:
+        """확대/이동 보기 (viewport.Viewport, None 이면 해제). 다음 render 가 전체를 다시 그린다.
+
+        보기가 있으면 백엔드와 상관없이 보이는 도형만, 작은 도형은 LOD 자리표시로 그린다.
+        도형 좌표와 hit-test 는 계속 월드 좌표다 (화면 점은 map_to_world 로 바꾼다).
+        """
+        if view != self._view:
+            # 장면은 그대로라 버전은 올리지 않는다 (보기용 표를 다시 만들지 않도록)
+            self._view = view
+            self._full_dirty = True
+
+    def pan(self, dx:float, dy:float) -> None:
+        self.set_view(self._current_view().panned(dx, dy))
+
+    def zoom(self, factor:float, anchor:Optional[Tuple[float, float]]=None) -> None:
+        # anchor(이미지 좌표)가 없으면 이미지 가운데를 기준으로
+        if anchor is None:
+            anchor = (self.image.width() / 2, self.image.height() / 2)
+        self.set_view(self._current_view().zoomed(factor, anchor))
+
+    def map_to_world(self, xy:Tuple[float, float]) -> Tuple[int, int]:
+        if self._view is None:
+            return int(xy[0]), int(xy[1])
+        x, y = self._view.to_world(*xy)
+        return int(x // 1), int(y // 1)
+
+    def _current_view(self):
+        if self._view is not None:
+            return self._view
+        from viewport import Viewport
+        return Viewport()
+
+    def render(self, full:bool=False) -> None:
+        # last_frame: 이번 render 의 도형 수 / 그리기 호출 / 펜·브러시 변경 횟수 (qpainter 백엔드)
+        start = metrics.frame_begin() if metrics.enabled else 0.0
+        self.last_frame = FrameStats()
+        kind = ""
+        if self._view is not None:
+            if full or self.is_dirty:
+                kind = "view"
+                self._render_view()
+        elif self.backend != "qpainter":
+            kind = self.backend
+            self._render_numpy(full)
+        elif full or self._full_dirty:
+            kind = "full"
+            self._clear_image()
+            p = QPainter(self.image)
+            p.setRenderHint(QPainter.Antialiasing, self.antialias)
+            self.last_frame = BatchPainter(p, self._store, self._styles).paint_rows(self._rows_in_z())
+            p.end()
+        elif self._dirty:
+            # 변경된 영역만 배경으로 지우고, 그 영역에 걸친 도형만 z 순서대로 다시 그린다
+            kind = "dirty"
+            region = QRegion()
+            ids = set()
+            for b in self._dirty:
+                x0, y0, x1, y1 = b
+                region = region.united(QRect(x0, y0, x1-x0+1, y1-y0+1))
+                ids.update(self.index.query_rect(b))
+            region = region.intersected(QRegion(self.image.rect()))
+            p = QPainter(self.image)
+            p.setRenderHint(QPainter.Antialiasing, self.antialias)
+            p.setClipRegion(region)
+            rects = region.rects()
+            for r in rects:
+                p.fillRect(r, self._bg)
+            self.last_frame = BatchPainter(p, self._store, self._styles).paint_ids(
+                reversed(self._by_z(list(ids))))
+            p.end()
+        elif self._appended:
+            # 새 도형은 이미 그려진 것들보다 위에 있으므로 기존 픽셀 위에 바로 그린다
+            kind = "append"
+            p = QPainter(self.image)
+            p.setRenderHint(QPainter.Antialiasing, self.antialias)
+            self.last_frame = BatchPainter(p, self._store, self._styles).paint_ids(self._appended)
+            p.end()
+        if kind and metrics.enabled:
+            self._record_frame(start, kind, rects if kind == "dirty" else None)
+        self._dirty.clear()
+        self._appended.clear()
+        self._full_dirty = False
+
+    def _record_frame(self, start:float, kind:str, rects) -> None:
+        # 계측이 켜져 있을 때만: 그린/걸러낸 도형 수와 다시 칠한 픽셀 수
+        frame, total = self.last_frame, len(self._store)
+        if kind == "dirty":
+            pixels = sum(r.width() * r.height() for r in rects)
+        elif kind == "append":
+            pixels = sum((b[2] - b[0] + 1) * (b[3] - b[1] + 1)
+                         for b in map(self._store.bounds, self._appended))
+        else:
+            pixels = self.image.width() * self.image.height()
+        drawn = frame.shapes if self.backend == "qpainter" or kind == "view" else total
+        culled = total - drawn if kind in ("full", "dirty", "view") else 0
+        metrics.frame_end("render", start, drawn=drawn, culled=culled,
+                          draw_calls=frame.draw_calls, state_changes=frame.state_changes,
+                          pixels=pixels, **{"kind." + kind: 1})
+
+    def render_tiled(self, tile:int=512, workers:Optional[int]=None, processes:bool=False) -> None:
+        # 큰 이미지용: 타일별로 병렬로 그려 self.image 에 합친다 (항상 전체 다시 그림)
+        from tiled_render import render_tiled
+        start = metrics.frame_begin() if metrics.enabled else 0.0
+        render_tiled(self, tile, workers, processes)
+        if metrics.enabled:
+            metrics.frame_end("render_tiled", start, drawn=len(self._store),
+                              pixels=self.image.width() * self.image.height())
+        self._dirty.clear()
+        self._appended.clear()
+        self._full_dirty = False
+
+    def _render_view(self) -> None:
+        # 보기는 전체를 다시 그린다 (이동/확대마다 어차피 전부 바뀐다)
+        from viewport import LodTable, np, paint_view
+        view = self._view
+        table = None
+        if np is not None:
+            rows = self._rows_in_z()
+            # 장면이 바뀌었을 때만 다시 만든다 - 이동/확대 프레임은 표를 그대로 쓴다
+            if self._lod is None or self._lod[0] != self._version:
+                self._lod = (self._version, LodTable(self._store, rows))
+            table = self._lod[1]
+        else:
+            # NumPy 가 없으면 공간 인덱스로 먼저 보이는 도형만 고른다
+            b = view.world_rect(self.image.width(), self.image.height())
+            rows = [self._store.row(sid) for sid in reversed(self._by_z(self.index.query_rect(b)))]
+        self.last_frame = paint_view(self.image, self._store, rows, view, self._bg, self.antialias,
+                                     self._styles, table=table)
+
+    def _render_numpy(self, full:bool) -> None:
+        # 도형이 바뀐 뒤 처음 그릴 때만 배열을 다시 만든다
+        if self._raster is None:
+            from numpy_raster import NumpyRasterizer
+            self._raster = NumpyRasterizer(exact=self.backend == "numpy_exact")
+        if self._raster_stale:
+            self._raster.load_store(self._store, self._rows_in_z())
+            self._raster_stale = False
+        if full or self._full_dirty:
+            self._raster.render(self.image, self._bg)
+        elif self._dirty:
+            x0, y0, x1, y1 = zip(*self._dirty)
+            self._raster.render(self.image, self._bg, (min(x0), min(y0), max(x1), max(y1)))
+
+    @property
+    def render_queue(self):
+        # 처음 접근한 스레드(보통 GUI 스레드)가 완료 신호를 받는다
+        if self._render_queue is None:
+            from render_queue import RenderQueue
+            self._render_queue = RenderQueue(self)
+        return self._render_queue
+
+    def render_async(self, callback=None):
+        """지금 장면의 사본을 작업 스레드에서 그린다. ``Future[QImage]`` 를 돌려준다.
+
+        밀린 렌더 요청은 마지막 것만 그린다. 끝난 뒤 장면이 그대로면 결과가 self.image 가
+        되고, callback(QImage) 과 render_queue.rendered 신호는 UI 스레드에서 불린다.
+        """
+        return self.render_queue.render(self, callback)
+
+    def save_async(self, path:str, callback=None):
+        """render_async 와 같은 사본을 작업 스레드에서 그리고 인코딩한다. ``Future[bool]``."""
+        return self.render_queue.save(self, path, callback)
+
+    def _adopt_image(self, image:QImage) -> None:
+        # render_queue 가 UI 스레드에서만 부른다 (장면이 사본과 같을 때)
+        self.image = image
+        self._dirty.clear()
+        self._appended.clear()
+        self._full_dirty = False
 
     def save_image(self, path:str) -> bool:
-        self.render()
-        return self.image.save(path)
+        if self.is_dirty:
+            self.render()
+        if not metrics.enabled:
+            return self.image.save(path)
+        start = time.perf_counter()
+        ok = self.image.save(path)
+        metrics.observe("encode.ms", (time.perf_counter() - start) * 1000.0)
+        if ok:
+            metrics.count("encode.bytes", os.path.getsize(path))
+        return ok
+
+    def export_streaming(self, path:str, band:int=256) -> None:
+        # 전체 QImage 없이 밴드 단위로 그려 .png 또는 .ppm 으로 바로 쓴다
+        from stream_export import export_png, export_ppm
+        (export_ppm if path.lower().endswith(".ppm") else export_png)(path, self, band=band)
+
+    def save_scene(self, path:str) -> None:
+        # .json 이면 교환용 JSON, 그 밖에는 mmap 으로 열 수 있는 바이너리 장면 파일
+        from scene_io import save_scene, save_json
+        (save_json if path.lower().endswith(".json") else save_scene)(self, path)
+
+    @classmethod
+    def load_scene(cls, path:str, **kwargs) -> "CanvasCore":
+        from scene_io import load_scene, load_json
+        return (load_json if path.lower().endswith(".json") else load_scene)(path, **kwargs)
 
     def clear(self) -> None:
-        self.shapes.clear()
+        before = self._snapshot(list(self._store))
+        self._clear()
+        self._record(before)
+
+    def _clear(self) -> None:
+        self._version += 1
+        self._store.clear()
+        self._z_top = self._z_bottom = 0
+        self._order = array("i")
+        self._index.clear()
+        self._index_pending = False
+        self._index_bounds = None
+        self._hit_table = None
+        self._dirty.clear()
+        self._appended.clear()
+        self._full_dirty = False
+        self._raster_stale = True
         self._clear_image()
 
+    def _add(self, kind:int, x0:int, y0:int, x1:int, y1:int, stroke:ColorLike, width:int,
+             fill:Optional[ColorLike]) -> int:
+        sid = _next_id()
+        self._version += 1
+        self._z_top += 1
+        s = pack_color(stroke)
+        r = self._store.add(kind, sid, x0, y0, x1, y1, _BLACK if s is None else s, max(1,width),
+                            pack_color(fill), self._z_top)
+        if self._order is not None:
+            self._order.append(r)
+        self._hit_table = None
+        b = self._store.bounds(sid)
+        if not self._index_pending:
+            self._index.insert(sid, b)
+        if self._full_dirty or self._dirty or self.backend != "qpainter":
+            self._mark_dirty(b)
+        else:
+            self._raster_stale = True
+            self._appended.append(sid)
+        if self.history is not None:
+            self.history.push(_SceneEdit(self, {sid: None}, {sid: self._store.record_at(r)}))
+        return sid
+
+    def _snapshot(self, ids:Iterable[int]) -> Optional[dict]:
+        # 기록 중일 때만: 바뀌기 전 레코드 (없는 도형은 None)
+        if self.history is None:
+            return None
+        store = self._store
+        return {sid: store.record_at(store.row(sid)) if sid in store else None for sid in ids}
+
+    def _record(self, before:Optional[dict]) -> None:
+        if not before:
+            return
+        after = self._snapshot(before)
+        if after != before:
+            self.history.push(_SceneEdit(self, before, after))
+
+    def _restore(self, states:Mapping[int, Optional[tuple]]) -> None:
+        # undo/redo: 도형마다 기록된 레코드 상태로 되돌린다 (None 이면 없는 상태)
+        store = self._store
+        for sid, rec in states.items():
+            cur = store.record_at(store.row(sid)) if sid in store else None
+            if cur == rec:
+                continue
+            if cur is not None and rec is not None and cur[:8] == rec[:8]:
+                # 모양은 같고 채우기/z 만 다름 - 행을 옮기지 않고 그 자리에서 고친다
+                if cur[8:10] != rec[8:10]:
+                    store.set_fill(sid, rec[8] if rec[9] else None)
+                if cur[10] != rec[10]:
+                    self._mark_dirty(store.bounds(sid))
+                    store.z[store.row(sid)] = rec[10]
+                    self._order = None
+                    self._hit_table = None
+                continue
+            if cur is not None:
+                self._mark_dirty(store.bounds(sid))
+                self.index.remove(sid)
+                store.remove(sid)
+            if rec is not None:
+                store.add_record(rec)
+                b = store.bounds(sid)
+                if not self._index_pending:
+                    self._index.insert(sid, b)
+                self._mark_dirty(b)
+                self._z_top = max(self._z_top, rec[10])
+                self._z_bottom = min(self._z_bottom, rec[10])
+            self._order = None
+            self._hit_table = None
+
+    def _adopt(self, store:ShapeStore, z_top:int, z_bottom:int, z_sorted:bool=False,
+               bounds:Optional[memoryview]=None) -> None:
+        # 불러온 저장소로 장면을 통째로 바꾼다. 인덱스는 처음 필요할 때 만든다
+        self._version += 1
+        self._store = store
+        store.on_change = self._on_store_change
+        self._z_top, self._z_bottom = z_top, z_bottom
+        self._order = array("i", range(len(store))) if z_sorted else None
+        self._index = GridIndex(self._index.cell, bounds_of=store.bounds)
+        self._index_pending = True
+        self._index_bounds = bounds
+        self._hit_table = None
+        self._raster_stale = True
+        self._dirty.clear()
+        self._appended.clear()
+        self._full_dirty = True
+
+    def _build_index(self) -> None:
+        # 파일의 경계 상자 블록은 불러온 뒤 삭제가 없는 동안 앞쪽 행들과 그대로 맞는다
+        store, index, pre = self._store, self._index, self._index_bounds
+        n = len(pre) // 4 if pre is not None else 0
+        ids = store.ids
+        for r in range(n):
+            index.insert(ids[r], (pre[4*r], pre[4*r+1], pre[4*r+2], pre[4*r+3]))
+        for r in range(n, len(store)):
+            index.insert(ids[r], store.bounds(ids[r]))
+        self._index_pending = False
+        self._index_bounds = None
+
+    def _on_store_change(self, sid:int) -> None:
+        self._mark_dirty(self._store.bounds(sid))
+
+    def _mark_dirty(self, b:Bounds) -> None:
+        self._version += 1
+        self._raster_stale = True
+        if self._full_dirty:
+            return
+        if self._appended:
+            # 덧그리기 대기 중인 도형도 일반 변경 영역으로 돌린다 (순서가 섞이지 않도록)
+            store, pending, self._appended = self._store, self._appended, []
+            self._dirty.extend(store.bounds(sid) for sid in pending if sid in store)
+        self._dirty.append(b)
+        # 변경 영역이 너무 잘게 많아지면 전체 다시 그리기가 더 싸다
+        if len(self._dirty) > _MAX_DIRTY_RECTS:
+            self._full_dirty = True
+            self._dirty.clear()
+
+    def _rows_in_z(self) -> array:
+        # 삭제/재배치 후 처음 접근할 때만 다시 정렬
+        if self._order is None:
+            z = self._store.z
+            self._order = array("i", sorted(range(len(z)), key=z.__getitem__))
+        return self._order
+
+    def _by_z(self, ids:List[int]) -> List[int]:
+        # 위에 있는(나중에 추가된) 도형이 먼저
+        z, row = self._store.z, self._store.row
+        return sorted(ids, key=lambda sid: z[row(sid)], reverse=True)
+
     def _clear_image(self) -> None:
         self.image.fill(self._bg)
 
-    def _find(self, shape_id:int) -> Optional[Shape]:
-        return next((s for s in self.shapes if s.id==shape_id), None)
+    def _find(self, shape_id:int) -> Optional[ShapeView]:
+        return self._store.view(shape_id) if shape_id in self._store else None
+
+class _SceneEdit(Command):
+    """CanvasCore 편집 한 번: 바뀐 도형들의 전/후 레코드."""
+
+    def __init__(self, core:CanvasCore, before:dict, after:dict) -> None:
+        self.core = core
+        self.before = before
+        self.after = after
+        self.nbytes = (len(before) + len(after)) * 160
+
+    def undo(self) -> None:
+        self.core._restore(self.before)
+
+    def redo(self) -> None:
+        self.core._restore(self.after)
+
+def _per_point_colors(colors):
+    # 색 시퀀스면 list 로, 색 하나면 그대로 돌려준다. 튜플은 늘 색 하나
+    if colors is None or isinstance(colors, (str, int, tuple, QColor)):
+        return colors
+    if hasattr(colors, "tolist"):
+        # NumPy 배열은 항상 점마다 색 (스칼라는 tolist() 가 정수 하나)
+        return colors.tolist()
+    try:
+        return list(colors)
+    except TypeError:
+        return colors
 
-def _make_rect(p1:Tuple[int,int], p2:Tuple[int,int]) -> QRect:
-    x1,y1 = p1
-    x2,y2 = p2
-    return QRect(min(x1,x2), min(y1,y2), abs(x2-x1), abs(y2-y1))
+def _norm_rect(p1:Tuple[int,int], p2:Tuple[int,int]) -> Tuple[int,int,int,int]:
+    (x1,y1), (x2,y2) = p1, p2
+    return min(x1,x2), min(y1,y2), max(x1,x2), max(y1,y2)
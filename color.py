@@ -1,171 +1,88 @@
-# canvas_core.py
+# color.py
+"""색 변환: 사용자가 넘기는 색을 압축된 0xAARRGGBB 정수로 바꾼다.
+
+도형 저장소, 장면 파일, 펜/브러시 캐시는 모두 이 정수를 쓰고, QColor 는 그릴 때만 만든다.
+받는 형식: QColor, Qt.GlobalColor, 색 이름/"#rgb"/"#rrggbb"/"#aarrggbb" 문자열,
+(r, g, b) / (r, g, b, a) 튜플(또는 리스트), 이미 압축된 0xAARRGGBB 정수.
+같은 값을 반복해서 넘기는 경우가 대부분이라 결과를 크기 제한 LRU 로 기억한다.
+"""
 from __future__ import annotations
-from typing import List, Tuple, Optional, Union
-from dataclasses import dataclass
-import math
+from functools import lru_cache
+from typing import Optional, Tuple, Union
 
-from PyQt5.QtCore import Qt, QPoint, QRect
-from PyQt5.QtGui import QImage, QPainter, QPen, QBrush, QColor
+from PyQt5.QtGui import QColor
 
-ColorLike = Union[str, Tuple[int, int, int], QColor]
+ColorLike = Union[str, Tuple[int, int, int], Tuple[int, int, int, int], int, QColor]
 
-def _to_qcolor(c: Optional[ColorLike]) -> Optional[QColor]:
+CACHE_SIZE = 1024
+_OPAQUE = 0xff000000
+
+def pack_color(c) -> Optional[int]:
+    """색을 0xAARRGGBB 정수로. None 은 None (채우기 없음).
+
+    잘못된 색은 QColor 와 같은 값이 된다 (이름/문자열은 불투명 검정, 범위를 벗어난
+    튜플은 0).
+    """
     if c is None:
         return None
-    if isinstance(c, QColor):
+    t = type(c)
+    if t is int:
+        return c & 0xffffffff
+    if t is QColor:
+        return c.rgba()
+    if t is str and c[:1] == "#":
+        # 16진 문자열은 캐시를 찾는 것보다 바로 읽는 편이 빠르다 (서로 다른 값이 많을 때도)
+        packed = _parse_hex(c[1:])
+        if packed is not None:
+            return packed
+    elif t is list:
+        c = tuple(c)
+    try:
+        return _cached(c)
+    except TypeError:  # 해시할 수 없는 값
+        return _parse(c)
+
+def to_qcolor(c) -> Optional[QColor]:
+    """그리기용 QColor. QColor 를 넘기면 복사본을 돌려준다."""
+    if c is None:
+        return None
+    if type(c) is QColor:
         return QColor(c)
-    if isinstance(c, tuple) and len(c) == 3:
-        r, g, b = c
-        return QColor(int(r), int(g), int(b))
-    return QColor(str(c))
-
-_id_seed = 0
-def _next_id() -> int:
-    global _id_seed
-    _id_seed += 1
-    return _id_seed
-
-@dataclass
-class Shape:
-    id: int
-    stroke: QColor
-    width: int
-    fill: Optional[QColor] = None
-
-    def draw(self, p: QPainter) -> None:
-        raise NotImplementedError
-
-    def contains(self, pt: QPoint) -> bool:
-        raise NotImplementedError
-
-    def set_fill(self, color: Optional[ColorLike]) -> None:
-        self.fill = _to_qcolor(color)
-
-@dataclass
-class LineShape(Shape):
-    p1: QPoint = QPoint()
-    p2: QPoint = QPoint()
-
-    def draw(self, p: QPainter) -> None:
-        p.setPen(QPen(self.stroke, self.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
-        p.setBrush(Qt.NoBrush)
-        p.drawLine(self.p1, self.p2)
-
-    def contains(self, pt: QPoint) -> bool:
-        x, y = pt.x(), pt.y()
-        x1, y1 = self.p1.x(), self.p1.y()
-        x2, y2 = self.p2.x(), self.p2.y()
-        dx, dy = x2 - x1, y2 - y1
-        if dx == 0 and dy == 0:
-            dist = math.hypot(x - x1, y - y1)
-        else:
-            t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / float(dx*dx + dy*dy)))
-            projx, projy = x1 + t*dx, y1 + t*dy
-            dist = math.hypot(x - projx, y - projy)
-        return dist <= max(3.0, self.width/2 + 1.5)
-
-@dataclass
-class RectShape(Shape):
-    rect: QRect = QRect()
-
-    def draw(self, p: QPainter) -> None:
-        p.setPen(QPen(self.stroke, self.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
-        p.setBrush(QBrush(self.fill) if self.fill is not None else Qt.NoBrush)
-        p.drawRect(self.rect)
-
-    def contains(self, pt: QPoint) -> bool:
-        return self.rect.contains(pt)
-
-@dataclass
-class EllipseShape(Shape):
-    rect: QRect = QRect()
-
-    def draw(self, p: QPainter) -> None:
-        p.setPen(QPen(self.stroke, self.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
-        p.setBrush(QBrush(self.fill) if self.fill is not None else Qt.NoBrush)
-        p.drawEllipse(self.rect)
-
-    def contains(self, pt: QPoint) -> bool:
-        if self.rect.width() == 0 or self.rect.height() == 0:
-            return False
-        cx = self.rect.x() + self.rect.width()/2.0
-        cy = self.rect.y() + self.rect.height()/2.0
-        rx = self.rect.width()/2.0
-        ry = self.rect.height()/2.0
-        nx = (pt.x() - cx)/rx
-        ny = (pt.y() - cy)/ry
-        return nx*nx + ny*ny <= 1.0
-
-class CanvasCore:
-    def __init__(self, width:int=800, height:int=500, bg:ColorLike="white") -> None:
-        self._bg = _to_qcolor(bg) or QColor(Qt.white)
-        self.image = QImage(width, height, QImage.Format_RGB32)
-        self.shapes: List[Shape] = []
-        self._clear_image()
-
-    def add_line(self, p1:Tuple[int,int], p2:Tuple[int,int], stroke:ColorLike="black", width:int=3) -> int:
-        s = LineShape(id=_next_id(), stroke=_to_qcolor(stroke) or QColor(Qt.black),
-                      width=max(1,width), fill=None, p1=QPoint(*p1), p2=QPoint(*p2))
-        self.shapes.append(s)
-        return s.id
-
-    def add_rect(self, p1:Tuple[int,int], p2:Tuple[int,int], stroke:ColorLike="black",
-                 width:int=3, fill:Optional[ColorLike]=None) -> int:
-        rect = _make_rect(p1,p2)
-        s = RectShape(id=_next_id(), stroke=_to_qcolor(stroke) or QColor(Qt.black),
-                      width=max(1,width), fill=_to_qcolor(fill), rect=rect)
-        self.shapes.append(s)
-        return s.id
-
-    def add_ellipse(self, p1:Tuple[int,int], p2:Tuple[int,int], stroke:ColorLike="black",
-                    width:int=3, fill:Optional[ColorLike]=None) -> int:
-        rect = _make_rect(p1,p2)
-        s = EllipseShape(id=_next_id(), stroke=_to_qcolor(stroke) or QColor(Qt.black),
-                         width=max(1,width), fill=_to_qcolor(fill), rect=rect)
-        self.shapes.append(s)
-        return s.id
+    return QColor.fromRgba(pack_color(c))
+
+def cache_info():
+    return _cached.cache_info()
+
+def clear_cache() -> None:
+    _cached.cache_clear()
+
+def _parse(c) -> int:
+    if isinstance(c, str):
+        return QColor(c).rgba()
+    if isinstance(c, tuple) and len(c) in (3, 4):
+        v = tuple(map(int, c))
+        if all(0 <= x <= 255 for x in v):
+            r, g, b = v[:3]
+            a = v[3] if len(v) == 4 else 255
+            return (a << 24) | (r << 16) | (g << 8) | b
+        return QColor(*v).rgba()
+    if isinstance(c, QColor):
+        return c.rgba()
+    return QColor(c).rgba()
 
-    def set_fill_by_id(self, shape_id:int, color:Optional[ColorLike]) -> bool:
-        shp = self._find(shape_id)
-        if not shp: return False
-        if isinstance(shp, LineShape):
-            shp.set_fill(None)
-            return True
-        shp.set_fill(color)
-        return True
+_cached = lru_cache(maxsize=CACHE_SIZE)(_parse)
 
-    def set_fill_at_point(self, xy:Tuple[int,int], color:Optional[ColorLike]) -> Optional[int]:
-        pt = QPoint(*xy)
-        for shp in reversed(self.shapes):
-            if isinstance(shp, LineShape): continue
-            if shp.contains(pt):
-                shp.set_fill(color)
-                return shp.id
+def _parse_hex(h:str) -> Optional[int]:
+    # "#rgb", "#rrggbb", "#aarrggbb" 만. 나머지 길이는 QColor 규칙에 맡긴다.
+    # int() 는 "_", 부호, 공백, 유니코드 숫자도 받으므로 ASCII 영숫자만 통과시킨다
+    n = len(h)
+    if n not in (3, 6, 8) or not (h.isascii() and h.isalnum()):
         return None
-
-    def render(self) -> None:
-        self._clear_image()
-        p = QPainter(self.image)
-        p.setRenderHint(QPainter.Antialiasing, True)
-        for shp in self.shapes:
-            shp.draw(p)
-        p.end()
-
-    def save_image(self, path:str) -> bool:
-        self.render()
-        return self.image.save(path)
-
-    def clear(self) -> None:
-        self.shapes.clear()
-        self._clear_image()
-
-    def _clear_image(self) -> None:
-        self.image.fill(self._bg)
-
-    def _find(self, shape_id:int) -> Optional[Shape]:
-        return next((s for s in self.shapes if s.id==shape_id), None)
-
-def _make_rect(p1:Tuple[int,int], p2:Tuple[int,int]) -> QRect:
-    x1,y1 = p1
-    x2,y2 = p2
-    return QRect(min(x1,x2), min(y1,y2), abs(x2-x1), abs(y2-y1))
+    try:
+        v = int(h, 16)
+    except ValueError:
+        return None
+    if n == 3:
+        r, g, b = v >> 8, (v >> 4) & 0xf, v & 0xf
+        return _OPAQUE | (r * 0x11 << 16) | (g * 0x11 << 8) | b * 0x11
+    return v if n == 8 else v | _OPAQUE
@@ -0,0 +1,175 @@
+# flood_fill.py
+"""래스터용 페인트 통(flood fill). QImage 픽셀을 복사 없이 NumPy 배열로 보고 행 단위 구간으로 채운다.
+
+픽셀 하나씩 큐에 넣는 대신, 행마다 "채울 수 있는 픽셀"의 연속 구간(run)을 한 번에 구해
+구간끼리 위아래로 이어 나간다. 행의 일치 검사는 그 행에 처음 닿을 때 한 번만 벡터로 한다.
+"""
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Tuple
+import sys
+
+from PyQt5.QtGui import QImage
+
+try:
+    import numpy as np
+except ImportError:  # numpy 는 선택 의존성 - 채우기를 쓸 때만 필요
+    np = None
+
+from color import pack_color
+
+# uint32 픽셀을 바이트로 볼 때 B, G, R, A 채널의 비트 위치
+_SHIFTS = (0, 8, 16, 24) if sys.byteorder == "little" else (24, 16, 8, 0)
+
+class Spans:
+    """채운 영역. 행 y 마다 [x0, x1] (양 끝 포함) 구간들."""
+    __slots__ = ("y", "x0", "x1")
+
+    def __init__(self, y, x0, x1) -> None:
+        self.y, self.x0, self.x1 = y, x0, x1
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    @property
+    def pixels(self) -> int:
+        return int((self.x1 - self.x0 + 1).sum())
+
+    @property
+    def bounds(self) -> Tuple[int, int, int, int]:
+        return int(self.x0.min()), int(self.y.min()), int(self.x1.max()), int(self.y.max())
+
+    def paint(self, a:"np.ndarray", color:int) -> None:
+        # 구간을 배열에 바로 쓴다 (혼합 없이 교체)
+        for y, x0, x1 in zip(self.y.tolist(), self.x0.tolist(), self.x1.tolist()):
+            a[y, x0:x1 + 1] = color
+
+def flood_spans(a:"np.ndarray", x:int, y:int, tolerance:int=0,
+                connectivity:int=4) -> Optional[Spans]:
+    """(h, w) uint32 배열에서 (x, y) 와 이어진, 시작 픽셀 색과 비슷한 영역의 구간들.
+
+    ``tolerance`` 는 채널(A, R, G, B)별 최대 차이 (0 = 같은 색만). ``connectivity`` 는 4 또는 8.
+    (x, y) 가 배열 밖이면 None.
+    """
+    rows = _flood(a, x, y, tolerance, connectivity)
+    return None if rows is None else _collect(rows)
+
+def flood_fill(image:QImage, x:int, y:int, color, tolerance:int=0,
+               connectivity:int=4) -> Optional[Spans]:
+    """QImage 를 제자리에서 채운다. 채운 구간을 돌려주고, 바뀐 것이 없으면 None.
+
+    이미지는 32비트 형식(RGB32/ARGB32)이어야 한다. 시작 픽셀이 이미 ``color`` 이고
+    tolerance 가 0 이면 아무것도 하지 않는다.
+    """
+    from numpy_raster import image_array
+    a = image_array(image)
+    packed = pack_color(color)
+    if image.format() == QImage.Format_RGB32:
+        packed |= 0xff000000
+    if not (0 <= x < a.shape[1] and 0 <= y < a.shape[0]):
+        return None
+    if tolerance <= 0 and int(a[y, x]) == packed:
+        return None
+    rows = _flood(a, x, y, tolerance, connectivity)
+    # 행의 구간이 모두 채워졌으면 일치 마스크로 한 번에, 아니면 구간별로 쓴다
+    for r, row in enumerate(rows):
+        if row is None:
+            continue
+        starts, ends, seen, m = row
+        n = seen.count(1)
+        if n == len(seen) and n > 1:
+            np.copyto(a[r], packed, where=m)
+        elif n:
+            line = a[r]
+            for j in _seen_indices(seen, n):
+                line[starts[j]:ends[j] + 1] = packed
+    return _collect(rows)
+
+# 행 하나의 상태: 구간 시작 리스트, 끝 리스트(포함), 방문 표시, 일치 마스크
+_Row = Tuple[list, list, bytearray, "np.ndarray"]
+
+def _flood(a:"np.ndarray", x:int, y:int, tolerance:int, connectivity:int) -> Optional[List[Optional[_Row]]]:
+    # 구간 단위 BFS. 방문한 구간은 행 상태의 seen 에 표시된다 (닿지 않은 행은 None)
+    if np is None:
+        raise RuntimeError("flood fill requires numpy (pip install numpy)")
+    if connectivity not in (4, 8):
+        raise ValueError(f"connectivity must be 4 or 8, got {connectivity}")
+    h, w = a.shape
+    if not (0 <= x < w and 0 <= y < h):
+        return None
+    match = _matcher(int(a[y, x]), tolerance, w)
+    grow = 1 if connectivity == 8 else 0
+    rows: List[Optional[_Row]] = [None] * h
+
+    def runs(r:int) -> _Row:
+        m = match(a[r])
+        cut = np.flatnonzero(m[1:] != m[:-1]) + 1
+        edges = np.concatenate(([0], cut, [w]))
+        k = 0 if m[0] else 1
+        starts = edges[k:-1:2].tolist()
+        got = rows[r] = (starts, (edges[k + 1::2] - 1).tolist(), bytearray(len(starts)), m)
+        return got
+
+    starts, ends, seen, _ = runs(y)
+    i = bisect_right(starts, x) - 1
+    seen[i] = 1
+    stack = [(y, starts[i], ends[i])]
+    pop, push = stack.pop, stack.append
+    left, right = bisect_left, bisect_right
+    last = h - 1
+    while stack:
+        r, s, e = pop()
+        lo, hi = s - grow, e + grow
+        # 위/아래 행에서 끝 >= lo 이고 시작 <= hi 인 구간이 [lo, hi] 와 겹친다
+        if r > 0:
+            ns, ne, nseen, _ = rows[r - 1] or runs(r - 1)
+            for j in range(left(ne, lo), right(ns, hi)):
+                if not nseen[j]:
+                    nseen[j] = 1
+                    push((r - 1, ns[j], ne[j]))
+        if r < last:
+            ns, ne, nseen, _ = rows[r + 1] or runs(r + 1)
+            for j in range(left(ne, lo), right(ns, hi)):
+                if not nseen[j]:
+                    nseen[j] = 1
+                    push((r + 1, ns[j], ne[j]))
+    return rows
+
+def _seen_indices(seen:bytearray, n:int) -> List[int]:
+    if n == len(seen):
+        return list(range(n))
+    return [j for j, v in enumerate(seen) if v]
+
+def _collect(rows:List[Optional[_Row]]) -> Spans:
+    ys, x0s, x1s = [], [], []
+    for r, row in enumerate(rows):
+        if row is None:
+            continue
+        starts, ends, seen, _ = row
+        n = seen.count(1)
+        if not n:
+            continue
+        idx = _seen_indices(seen, n)
+        ys.extend([r] * n)
+        x0s.extend(starts[j] for j in idx)
+        x1s.extend(ends[j] for j in idx)
+    return Spans(np.array(ys, np.int32), np.array(x0s, np.int32), np.array(x1s, np.int32))
+
+def _matcher(target:int, tolerance:int, width:int):
+    if tolerance <= 0:
+        return lambda row: row == target
+    # 채널마다 |c - t| <= tol 은 uint8 로 (c - lo) 가 (hi - lo) 이하인 것과 같다 (lo 미만은
+    # 빼기가 넘쳐 큰 값이 된다). 네 채널의 결과 바이트가 모두 1 이면 uint32 로 0x01010101.
+    # (w, 4) 에 (4,) 를 브로드캐스트하면 느리므로 행 길이만큼 펼친 표를 미리 만든다
+    chans = [(target >> shift) & 0xff for shift in _SHIFTS]
+    lo = np.tile(np.array([max(0, c - tolerance) for c in chans], np.uint8), width)
+    span = np.tile(np.array([min(255, c + tolerance) - max(0, c - tolerance) for c in chans],
+                            np.uint8), width)
+    diff = np.empty_like(lo)
+    ok = np.empty(len(lo), bool)
+
+    def match(row):
+        np.subtract(row.view(np.uint8), lo, out=diff)
+        np.less_equal(diff, span, out=ok)
+        return ok.view(np.uint32) == 0x01010101
+    return match
@@ -0,0 +1,151 @@
+# hit_batch.py
+from __future__ import annotations
+from typing import Tuple
+
+from shape_store import RECT, ELLIPSE, LINE, TRIANGLE, TYPECODES, ShapeStore
+
+try:
+    import numpy as np
+except ImportError:  # numpy 는 선택 의존성 - 일괄 hit-test 를 쓸 때만 필요
+    np = None
+
+class CellTable:
+    """저장소 전체를 (셀 key, 행) 쌍으로 펼쳐 key 순으로 정렬한 일괄 hit-test 용 스냅샷.
+
+    GridIndex 와 같은 셀 크기를 쓰지만 NumPy 배열(CSR 형태)이라 점 수천 개를
+    한 번에 후보 도형과 짝지을 수 있다. 도형 기하/z 가 바뀌면 다시 만들어야 한다.
+    GridIndex 처럼 ``max_cells`` 보다 많은 셀에 걸치는 도형은 펼치지 않고 ``large`` 에
+    따로 두고, 질의 때 경계 상자로 점들과 짝짓는다.
+    """
+
+    def __init__(self, store:ShapeStore, cell:int=64, max_cells:int=1024) -> None:
+        if np is None:
+            raise RuntimeError("hit_test_many requires numpy (pip install numpy)")
+        self.cell = cell
+        n = len(store)
+        col = lambda name: np.frombuffer(getattr(store, name), TYPECODES[name]) \
+            if n else np.zeros(0, TYPECODES[name])
+        self.kind = col("kind").copy()
+        self.ids = col("ids").copy()
+        self.z = col("z").copy()
+        self.x0, self.y0, self.x1, self.y1 = (col(k).astype(np.int64) for k in ("x0", "y0", "x1", "y1"))
+        self.width = col("width").astype(np.int64)
+        # shape_store.shape_pad 과 같은 여유
+        pad = np.ceil(np.maximum(3.0, self.width / 2 + 2)).astype(np.int64)
+        bx0 = np.minimum(self.x0, self.x1) - pad
+        by0 = np.minimum(self.y0, self.y1) - pad
+        bx1 = np.maximum(self.x0, self.x1) + pad
+        by1 = np.maximum(self.y0, self.y1) + pad
+        cx0, cy0, cx1, cy1 = bx0 // cell, by0 // cell, bx1 // cell, by1 // cell
+        self.cxmin = int(cx0.min()) if n else 0
+        self.cymin = int(cy0.min()) if n else 0
+        self.ncx = int(cx1.max()) - self.cxmin + 1 if n else 1
+        self.ncy = int(cy1.max()) - self.cymin + 1 if n else 1
+        w = cx1 - cx0 + 1
+        cnt = w * (cy1 - cy0 + 1)
+        big = cnt > max_cells
+        self.large = np.flatnonzero(big)
+        self.large_bounds = tuple(b[big] for b in (bx0, by0, bx1, by1))
+        cnt[big] = 0
+        row = np.repeat(np.arange(n, dtype=np.int64), cnt)
+        local = np.arange(int(cnt.sum()), dtype=np.int64) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+        cx = cx0[row] + local % w[row]
+        cy = cy0[row] + local // w[row]
+        key = (cy - self.cymin) * self.ncx + (cx - self.cxmin)
+        o = np.argsort(key, kind="stable")
+        self.keys = key[o]
+        self.rows = row[o]
+
+    def query(self, xs:"np.ndarray", ys:"np.ndarray", include_lines:bool=False,
+              chunk:int=1 << 16) -> "np.ndarray":
+        out = np.full(len(xs), -1, np.int64)
+        for s in range(0, len(xs), chunk):
+            out[s:s + chunk] = self._query(xs[s:s + chunk], ys[s:s + chunk], include_lines)
+        return out
+
+    def _query(self, xs:"np.ndarray", ys:"np.ndarray", include_lines:bool) -> "np.ndarray":
+        out = np.full(len(xs), -1, np.int64)
+        cx = xs // self.cell - self.cxmin
+        cy = ys // self.cell - self.cymin
+        inside = (cx >= 0) & (cx < self.ncx) & (cy >= 0) & (cy < self.ncy)
+        key = np.where(inside, cy * self.ncx + cx, -1)
+        lo = np.searchsorted(self.keys, key, "left")
+        hi = np.searchsorted(self.keys, key, "right")
+        cnt = np.where(inside, hi - lo, 0)
+        pi = np.repeat(np.arange(len(xs), dtype=np.int64), cnt)
+        local = np.arange(int(cnt.sum()), dtype=np.int64) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+        r = self.rows[lo[pi] + local]
+        if len(self.large):
+            pi, r = self._pair_large(xs, ys, pi, r)
+        if not len(pi):
+            return out
+        x = xs[pi].astype(np.float64)
+        y = ys[pi].astype(np.float64)
+        hit = self._contains(r, x, y, include_lines)
+        pi, r = pi[hit], r[hit]
+        if not len(pi):
+            return out
+        # 점마다 z 가 가장 큰(맨 위) 도형. z 는 도형마다 유일하다
+        z = self.z[r]
+        best = np.full(len(xs), np.iinfo(np.int64).min, np.int64)
+        np.maximum.at(best, pi, z)
+        win = z == best[pi]
+        out[pi[win]] = self.ids[r[win]]
+        return out
+
+    def _pair_large(self, xs:"np.ndarray", ys:"np.ndarray", pi:"np.ndarray",
+                    r:"np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+        # 큰 도형마다 경계 상자 안의 점들을 후보 쌍에 더한다
+        pis, rs = [pi], [r]
+        for row, x0, y0, x1, y1 in zip(self.large.tolist(), *(b.tolist() for b in self.large_bounds)):
+            m = np.flatnonzero((xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1))
+            if len(m):
+                pis.append(m)
+                rs.append(np.full(len(m), row, np.int64))
+        return np.concatenate(pis), np.concatenate(rs)
+
+    def _contains(self, r:"np.ndarray", x:"np.ndarray", y:"np.ndarray", include_lines:bool) -> "np.ndarray":
+        # shape_store.ShapeStore.contains 와 같은 식을 같은 순서로 계산한다
+        kind = self.kind[r]
+        x0, y0, x1, y1 = self.x0[r], self.y0[r], self.x1[r], self.y1[r]
+        hit = np.zeros(len(r), bool)
+
+        m = kind == RECT
+        hit[m] = (x0[m] <= x[m]) & (x[m] < x1[m]) & (y0[m] <= y[m]) & (y[m] < y1[m])
+
+        m = (kind == ELLIPSE) & (x1 != x0) & (y1 != y0)
+        rx = (x1[m] - x0[m]) / 2.0
+        ry = (y1[m] - y0[m]) / 2.0
+        nx = (x[m] - (x0[m] + rx)) / rx
+        ny = (y[m] - (y0[m] + ry)) / ry
+        hit[m] = nx*nx + ny*ny <= 1.0
+
+        m = kind == TRIANGLE
+        if m.any():
+            # shape_store.triangle_hit: 세 변에 대한 외적 부호가 모두 같으면 안쪽
+            ax, ay = (x0[m] + x1[m]) // 2, y0[m]
+            bx, by, cx, cy = x0[m], y1[m], x1[m], y1[m]
+            px, py = x[m], y[m]
+            d1 = (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+            d2 = (cx - bx) * (py - by) - (cy - by) * (px - bx)
+            d3 = (ax - cx) * (py - cy) - (ay - cy) * (px - cx)
+            neg = (d1 < 0) | (d2 < 0) | (d3 < 0)
+            pos = (d1 > 0) | (d2 > 0) | (d3 > 0)
+            area = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+            hit[m] = ~(neg & pos) & (area != 0)
+
+        if include_lines:
+            m = kind == LINE
+            lx0, ly0, lx1, ly1 = x0[m], y0[m], x1[m], y1[m]
+            dx, dy = lx1 - lx0, ly1 - ly0
+            den = (dx*dx + dy*dy).astype(np.float64)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = np.clip(((x[m] - lx0) * dx + (y[m] - ly0) * dy) / den, 0.0, 1.0)
+            t = np.where(den == 0, 0.0, t)
+            dist = np.hypot(x[m] - (lx0 + t*dx), y[m] - (ly0 + t*dy))
+            hit[m] = dist <= np.maximum(3.0, self.width[r][m] / 2 + 1.5)
+        return hit
+
+def as_points(points) -> Tuple["np.ndarray", "np.ndarray"]:
+    a = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+    return a[:, 0], a[:, 1]
@@ -58,13 +58,13 @@ class MainApp(QWidget):
         self.canvas_core.add_rect((50, 50), (150, 150), stroke="red", width=3, fill="yellow")
         self.canvas_core.add_ellipse((200, 50), (300, 150), stroke="blue", width=2, fill="green")
         self.canvas_core.add_line((50, 200), (300, 300), stroke="black", width=4)
-        self.canvas_core.render()
-        self.canvas_core.image.save("canvas_core_test.png")
+        # 렌더와 PNG 인코딩은 작업 스레드에서 - 창이 뜨는 것을 막지 않는다
+        self.canvas_core.save_async("canvas_core_test.png")
 
     def shape_paint_event(self, event):
+        # 바뀐 영역(event.rect())만 도형 층 캐시에서 복사하고 미리보기를 얹는다
         painter = QPainter(self.shape_canvas_widget)
-        painter.drawPixmap(0, 0, self.shape_drawer.get_canvas_image())
-        self.shape_drawer.draw_preview(painter)
+        self.shape_drawer.paint(painter, event.rect())
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,257 @@
+# metrics.py
+"""렌더 경로 계측: 프로세스 안 지표 저장소(카운터, 히스토그램), 훅, 샘플링 프로파일러.
+
+기본은 꺼져 있다. 계측 지점은 ``if metrics.enabled:`` 만 검사하므로 꺼져 있을 때 비용은
+전역 변수 조회 하나다.
+
+    import metrics
+    metrics.enable()
+    core.render()
+    print(metrics.registry.snapshot()["histograms"]["render.ms"])
+    metrics.registry.add_hook(lambda name, ms, fields: ...)   # 프레임마다 호출
+    metrics.profile_next(frames=30, callback=lambda prof: print(prof.folded()))
+"""
+from __future__ import annotations
+from bisect import bisect_left
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+import _thread
+import sys
+import time
+
+enabled = False
+
+# 히스토그램 칸 경계 (ms): 0.01ms 부터 두 배씩, 마지막은 약 84초
+BUCKETS: Tuple[float, ...] = tuple(0.01 * 2 ** i for i in range(24))
+
+Hook = Callable[[str, float, Dict[str, float]], None]
+
+class Histogram:
+    """고정 로그 칸 히스토그램. 백분위는 칸 상한으로 근사한다."""
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value:float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q:float) -> float:
+        if not self.count:
+            return 0.0
+        need = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= need and c:
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(max(upper, self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        if not self.count:
+            return {"count": 0}
+        return {"count": self.count, "sum": round(self.total, 4), "min": round(self.min, 4),
+                "max": round(self.max, 4), "mean": round(self.total / self.count, 4),
+                "p50": round(self.percentile(0.5), 4), "p90": round(self.percentile(0.9), 4),
+                "p99": round(self.percentile(0.99), 4)}
+
+class Registry:
+    """이름 붙은 카운터와 히스토그램, 그리고 프레임 훅 목록."""
+
+    def __init__(self) -> None:
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.hooks: List[Hook] = []
+        self.last_profile: Optional[SamplingProfiler] = None
+        self._lock = _thread.allocate_lock()
+
+    def count(self, name:str, n:float=1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name:str, value:float) -> None:
+        with self._lock:
+            h = self.histograms.get(name)
+            if h is None:
+                h = self.histograms[name] = Histogram()
+            h.observe(value)
+
+    def record_frame(self, name:str, ms:float, fields:Dict[str, float]) -> None:
+        # "<name>.ms" 히스토그램 + 필드별 누적 카운터, 그리고 훅 호출
+        with self._lock:
+            h = self.histograms.get(name + ".ms")
+            if h is None:
+                h = self.histograms[name + ".ms"] = Histogram()
+            h.observe(ms)
+            counters = self.counters
+            counters[name + ".frames"] = counters.get(name + ".frames", 0) + 1
+            for key, value in fields.items():
+                if isinstance(value, (int, float)):
+                    key = f"{name}.{key}"
+                    counters[key] = counters.get(key, 0) + value
+        for hook in list(self.hooks):
+            hook(name, ms, fields)
+
+    def add_hook(self, hook:Hook) -> None:
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook:Hook) -> None:
+        self.hooks.remove(hook)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {"counters": dict(self.counters),
+                    "histograms": {k: h.summary() for k, h in self.histograms.items()}}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+registry = Registry()
+
+def enable(on:bool=True) -> None:
+    global enabled
+    enabled = on
+
+def disable() -> None:
+    enable(False)
+
+def frame_begin() -> float:
+    # enabled 일 때만 부른다. 예약된 프로파일링이 있으면 이 프레임부터 표본을 뜬다
+    if _armed is not None and not _armed.running:
+        _armed.start()
+    return time.perf_counter()
+
+def frame_end(name:str, start:float, **fields:float) -> float:
+    ms = (time.perf_counter() - start) * 1000.0
+    registry.record_frame(name, ms, fields)
+    if _armed is not None and _armed.running:
+        _count_profiled_frame()
+    return ms
+
+def observe(name:str, value:float) -> None:
+    registry.observe(name, value)
+
+def count(name:str, n:float=1) -> None:
+    registry.count(name, n)
+
+class SamplingProfiler:
+    """대상 스레드의 호출 스택을 ``interval`` 초마다 떠서 모은다 (sys._current_frames).
+
+    ``top()`` 은 가장 안쪽 함수별 표본 수, ``folded()`` 는 flamegraph 용 접힌 스택 텍스트.
+    """
+
+    def __init__(self, interval:float=0.001, thread_id:Optional[int]=None) -> None:
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.running = False
+        self._thread = None
+
+    def start(self) -> "SamplingProfiler":
+        import threading
+        if self.thread_id is None:
+            self.thread_id = _thread.get_ident()
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="metrics-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self.running = False
+        if self._thread is not None and self._thread.ident != _thread.get_ident():
+            self._thread.join()
+        self._thread = None
+        return self
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def top(self, n:int=20) -> List[Tuple[str, int]]:
+        leaf: Counter = Counter()
+        for stack, c in self.stacks.items():
+            leaf[stack[-1]] += c
+        return leaf.most_common(n)
+
+    def folded(self) -> str:
+        return "\n".join(f"{';'.join(stack)} {c}" for stack, c in self.stacks.most_common())
+
+    def _run(self) -> None:
+        me = _thread.get_ident()
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None and self.thread_id != me:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+            time.sleep(self.interval)
+
+_armed: Optional[SamplingProfiler] = None
+_armed_frames = 0
+_armed_restore = False
+_armed_callback: Optional[Callable[[SamplingProfiler], None]] = None
+
+def profile_next(frames:int=1, interval:float=0.001,
+                 callback:Optional[Callable[[SamplingProfiler], None]]=None) -> None:
+    """다음 ``frames`` 개 프레임 동안만 샘플링 프로파일러를 돌린다 (계측이 꺼져 있어도 그동안만 켠다).
+
+    끝나면 결과가 ``registry.last_profile`` 에 남고 callback 이 있으면 불린다.
+    """
+    global _armed, _armed_frames, _armed_restore, _armed_callback, enabled
+    if _armed is not None:
+        return
+    _armed = SamplingProfiler(interval)
+    _armed_frames = max(1, frames)
+    _armed_restore = enabled
+    _armed_callback = callback
+    enabled = True
+
+def _count_profiled_frame() -> None:
+    global _armed, _armed_frames, enabled
+    _armed_frames -= 1
+    if _armed_frames > 0:
+        return
+    prof, _armed = _armed, None
+    prof.stop()
+    enabled = _armed_restore
+    registry.last_profile = prof
+    if _armed_callback is not None:
+        _armed_callback(prof)
+
+def install_signal_trigger(path:str, frames:int=60, signum:Optional[int]=None) -> bool:
+    """신호(기본 SIGUSR1)를 받으면 다음 ``frames`` 프레임을 프로파일해 접힌 스택을 path 에 쓴다.
+
+    신호를 지원하지 않는 플랫폼에서는 False 를 돌려준다.
+    """
+    import signal
+    if signum is None:
+        signum = getattr(signal, "SIGUSR1", None)
+        if signum is None:
+            return False
+
+    def write(prof:SamplingProfiler) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(prof.folded())
+
+    signal.signal(signum, lambda *_: profile_next(frames, callback=write))
+    return True
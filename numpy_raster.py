@@ -0,0 +1,530 @@
+# numpy_raster.py
+from __future__ import annotations
+from typing import Dict, Optional, Sequence, Tuple
+
+from PyQt5.QtCore import Qt, QPoint, QRect
+from PyQt5.QtGui import QImage, QPainter, QPainterPath, QPen, QColor, QPolygon
+
+from paint_batch import BatchPainter
+from shape_types import Shape, LineShape, EllipseShape, TriangleShape
+from shape_store import RECT, ELLIPSE, LINE, TRIANGLE, TYPECODES, ShapeStore, triangle_points
+from spatial_index import Bounds
+
+try:
+    import numpy as np
+except ImportError:  # numpy 는 선택 의존성 - 이 백엔드를 쓸 때만 필요
+    np = None
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("numpy backend requires numpy (pip install numpy)")
+
+def image_array(image:QImage) -> "np.ndarray":
+    # QImage 픽셀 버퍼를 복사 없이 (height, width) uint32 배열로 본다
+    _require_numpy()
+    if image.depth() != 32:
+        raise ValueError("image must be a 32-bit QImage (RGB32/ARGB32)")
+    ptr = image.bits()
+    ptr.setsize(image.sizeInBytes())
+    a = np.frombuffer(ptr, np.uint32).reshape(image.height(), image.bytesPerLine() // 4)
+    return a[:, :image.width()]
+
+_COLUMNS = ("kind", "x0", "y0", "x1", "y1", "width", "stroke", "fill", "has_fill")
+# 빠른 모드에서 픽셀을 펼쳐 그릴 도형의 종류별 최대 비용(후보 픽셀 수, _set_columns 참고).
+# 키 이미지에 QPainter 로 그리는 값이 도형 하나에 8~30us 라, 이보다 크면 QPainter 쪽이 빠르다
+# (2000x2000, 도형 수를 두 배로 늘려 잰 한계 비용). 사각형은 늘 슬라이스로 칠하고, 타원은 Qt 가
+# 베지어로 근사한 테두리를 맞출 수 없어 늘 키 이미지로 그린다
+_MAX_COST = {LINE: 256, TRIANGLE: 640}
+# 이보다 짧게 이어지는 불투명 구간은 키 버퍼 없이 QPainter 로 그린다
+_MIN_RUN = 32
+# 키 이미지(RGB32)에 담을 수 있는 키 수: 도형 하나가 채우기/테두리 두 개를 쓰고 0 은 빈 칸
+_MAX_KEYS = ((1 << 24) - 2) // 2
+# 픽셀 중심이 테두리 경계에 딱 걸리면 Qt 는 위/왼쪽 경계는 빼고 아래/오른쪽은 넣는다.
+# 거리를 재는 표본점을 중심에서 아주 조금 왼쪽 위로 옮겨 같은 결과를 낸다
+_SAMPLE = 0.5 - 1e-7
+
+class _Batch:
+    """한 종류 도형의 기하/스타일 배열 (z 오름차순)."""
+    __slots__ = ("z", "x0", "y0", "x1", "y1", "width", "stroke", "fill", "has_fill")
+
+    @classmethod
+    def from_columns(cls, z, x0, y0, x1, y1, width, stroke, fill, has_fill) -> "_Batch":
+        out = cls.__new__(cls)
+        for name, col, dt in zip(cls.__slots__, (z, x0, y0, x1, y1, width, stroke, fill, has_fill),
+                                 (np.int32,) * 6 + (np.uint32, np.uint32, bool)):
+            setattr(out, name, np.ascontiguousarray(col, dt))
+        return out
+
+    def __len__(self) -> int:
+        return len(self.z)
+
+class NumpyRasterizer:
+    """도형 기하를 NumPy 배열로 들고 QImage 비트에 직접 일괄 래스터화한다 (안티앨리어싱 없음).
+
+    불투명 도형이 이어지는 구간은 픽셀마다 가장 위 도형의 키(z*2 + 테두리 여부)를 고르는 키
+    버퍼 하나로 그린다. 도형마다 따로 경로를 고르고, NumPy 로 맞추지 않는 도형은 키를 색으로 써서
+    QPainter 로 키 이미지에 그린 뒤 같은 버퍼에서 합치므로 z 순서와 무관하게 섞을 수 있다.
+    반투명 색(알파 < 255)을 쓰는 도형은 섞어 그려야 하므로 z 순서대로 QPainter 로 그린다.
+
+    ``exact=True`` 는 QPainter(안티앨리어싱 끔)와 픽셀 단위로 같다: Qt 래스터라이저와 규칙이
+    일치하는 사각형(이미지 안쪽, 납작하지 않은 것)만 NumPy 슬라이스로 칠하고, 둥근 모서리
+    픽셀은 두께별로 한 번에 더한다.
+    ``exact=False`` 는 여기에 더해 비용이 작은 직선/삼각형도 NumPy 로 펼쳐 그린다. 이 둘은
+    가장자리 픽셀이 QPainter 와 조금 다를 수 있다 (얼마나 다른지는 ``cross_check`` 로 본다).
+    타원은 두 모드 모두 키 이미지로 그리므로 QPainter 와 같다.
+
+    펼쳐 그리는 도형은 경계 상자 픽셀 수(비용)가 종류별 한도 이하인 것만 고른다 (``max_cost``
+    를 주면 모든 종류에 같은 한도). ``min_run`` 개 미만 이어지는 불투명 구간은 키 버퍼 없이
+    QPainter 로 바로 그린다.
+    """
+
+    def __init__(self, exact:bool=False, chunk_pixels:int=1 << 22, max_cost:Optional[int]=None,
+                 min_run:int=_MIN_RUN) -> None:
+        _require_numpy()
+        self.exact = exact
+        self.chunk_pixels = chunk_pixels
+        self.max_cost = max_cost
+        self.min_run = min_run
+        self._shapes: Sequence[Shape] = ()
+        self._set_columns(*(np.zeros(0, TYPECODES[name]) for name in _COLUMNS))
+
+    def __len__(self) -> int:
+        return len(self._shapes)
+
+    def load(self, shapes:Sequence[Shape]) -> None:
+        # shapes 는 z 오름차순. 리스트 위치가 곧 z
+        rows = []
+        for s in shapes:
+            if isinstance(s, TriangleShape):
+                kind = TRIANGLE
+                x0, y0, x1, y1 = s.coords()
+            elif isinstance(s, LineShape):
+                kind = LINE
+                x0, y0, x1, y1 = s.p1.x(), s.p1.y(), s.p2.x(), s.p2.y()
+            else:
+                kind = ELLIPSE if isinstance(s, EllipseShape) else RECT
+                r = s.rect
+                x0, y0 = r.x(), r.y()
+                x1, y1 = x0 + r.width(), y0 + r.height()
+            rows.append((kind, x0, y0, x1, y1, s.width, s.stroke.rgba(),
+                         s.fill.rgba() if s.fill is not None else 0, s.fill is not None))
+        cols = list(zip(*rows)) if rows else [()] * len(_COLUMNS)
+        self._set_columns(*(np.array(c, TYPECODES[name]) for c, name in zip(cols, _COLUMNS)))
+        self._shapes = shapes
+
+    def load_store(self, store:ShapeStore, rows:Sequence[int]) -> None:
+        # 저장소 열을 복사 없이 NumPy 로 보고, z 순서(rows)대로 한 번에 모은다
+        order = np.frombuffer(rows, np.int32) if len(rows) else np.zeros(0, np.int32)
+        self._set_columns(*(np.frombuffer(getattr(store, name), TYPECODES[name])[order]
+                            if len(order) else np.zeros(0, TYPECODES[name]) for name in _COLUMNS))
+        self._shapes = _RowViews(store, order)
+
+    def _set_columns(self, kind, x0, y0, x1, y1, width, stroke, fill, has_fill) -> None:
+        x0, y0, x1, y1, w = (c.astype(np.int64) for c in (x0, y0, x1, y1, width))
+        has_fill = has_fill.astype(bool)
+        stroke, fill = stroke.astype(np.uint32), fill.astype(np.uint32)
+        opaque = (stroke >> 24 == 255) & (~has_fill | (fill >> 24 == 255))
+        length = np.maximum(np.abs(x1 - x0), np.abs(y1 - y0))
+        # 후보 픽셀 수. 두께 1 이하 직선은 긴 축 한 칸에 한 픽셀이지만 픽셀마다 따로 흩어 쓰므로
+        # 후보 픽셀 세 개 값으로 센다
+        self._cost = np.select([(kind == LINE) & (w <= 1), kind == LINE, kind == TRIANGLE],
+                               [3 * (length + 1), (length + w + 2) * (2 * w + 3),
+                                (np.abs(x1 - x0) + w + 3) * (np.abs(y1 - y0) + w + 3)],
+                               (x1 - x0 + w + 1) * (y1 - y0 + w + 1))
+        # 칠해질 수 있는 범위 (펜 두께 절반 + 1px)
+        pad = w // 2 + 1
+        self._box = np.stack([np.minimum(x0, x1) - pad, np.minimum(y0, y1) - pad,
+                              np.maximum(x0, x1) + pad, np.maximum(y0, y1) + pad], axis=1)
+        # 사각형은 납작하지 않으면 모든 두께에서 Qt 와 같은 픽셀을 낸다
+        self._rect_ok = (kind == RECT) & (w >= 1) & (x1 > x0) & (y1 > y0)
+        self._numpy_ok = opaque
+        self._kind = kind.astype(np.int8)
+        self._cols = (x0, y0, x1, y1, w, stroke, fill, has_fill)
+
+    def render(self, image:QImage, bg:QColor, clip:Optional[Bounds]=None) -> None:
+        arr = image_array(image)
+        h, w = arr.shape
+        cx0, cy0, cx1, cy1 = clip if clip is not None else (0, 0, w - 1, h - 1)
+        clip = (max(cx0, 0), max(cy0, 0), min(cx1, w - 1), min(cy1, h - 1))
+        if clip[2] < clip[0] or clip[3] < clip[1]:
+            return
+        arr[clip[1]:clip[3] + 1, clip[0]:clip[2] + 1] = bg.rgb()
+        n = len(self._kind)
+        if not n:
+            return
+        slices, pixels = self._route(w, h)
+        numpy = slices | pixels
+        # 불투명 구간은 키 버퍼로, 반투명 도형은 z 순서대로 QPainter 로
+        opaque = _long_runs(self._numpy_ok, self.min_run)
+        edges = np.flatnonzero(np.diff(opaque.astype(np.int8))) + 1
+        bounds = [0, *edges.tolist(), n]
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            if not opaque[lo] or not numpy[lo:hi].any():
+                self._render_qpainter(image, lo, hi, clip)
+                continue
+            for a in range(lo, hi, _MAX_KEYS):
+                self._render_keys(arr, a, min(a + _MAX_KEYS, hi), clip, slices, pixels)
+
+    def _route(self, w:int, h:int) -> Tuple["np.ndarray", "np.ndarray"]:
+        # (슬라이스로 칠할 도형, 픽셀을 펼칠 도형). 나머지 불투명 도형은 키 이미지로.
+        # Qt 는 이미지 가장자리에서 잘린 테두리를 다르게 찍으므로 완전히 안쪽인 것만 NumPy 로
+        b, kind = self._box, self._kind
+        inside = (b[:, 0] >= 0) & (b[:, 1] >= 0) & (b[:, 2] < w) & (b[:, 3] < h) & self._numpy_ok
+        slices = self._rect_ok & inside
+        if self.max_cost is not None:
+            limit = np.array([self.max_cost] * 4)
+        else:
+            limit = np.array([_MAX_COST.get(k, -1) for k in (RECT, ELLIPSE, LINE, TRIANGLE)])
+        limit[[RECT, ELLIPSE]] = -1
+        if self.exact:
+            limit[[LINE, TRIANGLE]] = -1
+        pixels = inside & (self._cost <= limit[kind])
+        return slices, pixels
+
+    def _render_qpainter(self, image:QImage, lo:int, hi:int, clip:Bounds) -> None:
+        p = QPainter(image)
+        p.setRenderHint(QPainter.Antialiasing, False)
+        p.setClipRect(QRect(clip[0], clip[1], clip[2] - clip[0] + 1, clip[3] - clip[1] + 1))
+        shapes = self._shapes
+        if isinstance(shapes, _RowViews):
+            # 저장소에서 왔으면 qpainter 백엔드와 같은 묶음 그리기로
+            BatchPainter(p, shapes.store).paint_rows(shapes.order[lo:hi].tolist())
+        else:
+            for s in shapes[lo:hi]:
+                s.draw(p)
+        p.end()
+
+    def _render_keys(self, arr:"np.ndarray", lo:int, hi:int, clip:Bounds,
+                     slices:"np.ndarray", pixels:"np.ndarray") -> None:
+        # 키 버퍼는 구간 도형이 닿는 범위만. 이미지 가장자리가 아닌 곳에서는 잘리지 않는다
+        h, w = arr.shape
+        b = self._box[lo:hi]
+        rx0, ry0 = max(int(b[:, 0].min()), 0), max(int(b[:, 1].min()), 0)
+        rx1, ry1 = min(int(b[:, 2].max()), w - 1), min(int(b[:, 3].max()), h - 1)
+        sub = (max(clip[0], rx0), max(clip[1], ry0), min(clip[2], rx1), min(clip[3], ry1))
+        if sub[2] < sub[0] or sub[3] < sub[1]:
+            return
+        keys = np.zeros((ry1 - ry0 + 1, rx1 - rx0 + 1), np.int32)
+        self._paint_slices(keys, np.flatnonzero(slices[lo:hi]) + lo, lo, rx0, ry0, sub)
+        rest = np.flatnonzero(~(slices[lo:hi] | pixels[lo:hi])) + lo
+        if len(rest):
+            np.maximum(keys, self._paint_keys(rest, lo, rx0, ry0, rx1 - rx0 + 1, ry1 - ry0 + 1), out=keys)
+        self._render_pixels(keys, np.flatnonzero(pixels[lo:hi]) + lo, lo, rx0, ry0, sub)
+        stroke, fill = self._cols[5], self._cols[6]
+        lut = np.zeros(2 * (hi - lo) + 1, np.uint32)
+        lut[1::2] = fill[lo:hi]
+        lut[2::2] = stroke[lo:hi]
+        k = keys[sub[1] - ry0:sub[3] - ry0 + 1, sub[0] - rx0:sub[2] - rx0 + 1]
+        np.copyto(arr[sub[1]:sub[3] + 1, sub[0]:sub[2] + 1], lut[k], where=k > 0)
+
+    def _paint_keys(self, idx:"np.ndarray", lo:int, rx0:int, ry0:int, kw:int, kh:int) -> "np.ndarray":
+        # QPainter 로 그릴 도형을 채우기 키/테두리 키를 색으로 삼아 키 이미지에 그린다.
+        # 펜/그리기 호출은 BatchPainter 와 같아서 칠해지는 픽셀도 같다
+        img = QImage(kw, kh, QImage.Format_RGB32)
+        img.fill(0)
+        p = QPainter(img)
+        p.setRenderHint(QPainter.Antialiasing, False)
+        p.translate(-rx0, -ry0)
+        pen = QPen(QColor(0), 1, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+        x0, y0, x1, y1, width, _, _, has_fill = (c[idx].tolist() for c in self._cols)
+        kind = self._kind[idx].tolist()
+        for j, z in enumerate(idx.tolist()):
+            key = 2 * (z - lo) + 1
+            pen.setColor(QColor(key + 1))
+            pen.setWidth(width[j])
+            p.setPen(pen)
+            k = kind[j]
+            p.setBrush(QColor(key) if has_fill[j] and k != LINE else Qt.NoBrush)
+            a, b, c, d = x0[j], y0[j], x1[j], y1[j]
+            if k == RECT:
+                p.drawRect(a, b, c - a, d - b)
+            elif k == LINE:
+                p.drawLine(a, b, c, d)
+            elif k == TRIANGLE:
+                p.drawPolygon(QPolygon([QPoint(x, y) for x, y in triangle_points(a, b, c, d)]))
+            else:
+                path = QPainterPath()
+                path.addEllipse(a, b, c - a, d - b)
+                p.drawPath(path)
+        p.end()
+        return (image_array(img) & 0xffffff).astype(np.int32)
+
+    def _paint_slices(self, keys:"np.ndarray", idx:"np.ndarray", lo:int, rx0:int, ry0:int,
+                      sub:Bounds) -> None:
+        # 사각형을 z 순서대로 슬라이스째 덮어쓴다 (뒤 도형의 키가 더 크다). 테두리는 변 기준
+        # [-w//2, (w-1)//2] 범위의 막대. 사각형 바깥 꼭짓점 칸은 모아서 마지막에 키 최댓값으로
+        if not len(idx):
+            return
+        sx0, sy0, sx1, sy1 = sub[0] - rx0, sub[1] - ry0, sub[2] - rx0 + 1, sub[3] - ry0 + 1
+        x0, y0, x1, y1, width, _, _, has_fill = (c[idx].tolist() for c in self._cols)
+        for j, z in enumerate(idx.tolist()):
+            key = 2 * (z - lo) + 1
+            sk = key + 1
+            a, c = width[j] // 2, (width[j] - 1) // 2
+            l, t, r, b = x0[j] - rx0, y0[j] - ry0, x1[j] - rx0, y1[j] - ry0
+            if has_fill[j]:
+                # 가운데 세로 띠와 좌우 막대를 테두리로 칠한 뒤 테두리가 덮지 않는 안쪽을 채우기로
+                boxes = ((l, t - a, r, b + c + 1, sk), (l - a, t, l, b, sk), (r, t, r + c + 1, b, sk),
+                         (l + c + 1, t + c + 1, r - a, b - a, key))
+            else:
+                boxes = ((l, t - a, r, t + c + 1, sk), (l, b - a, r, b + c + 1, sk),
+                         (l - a, t, l + c + 1, b, sk), (r - a, t, r + c + 1, b, sk))
+            if l - a >= sx0 and t - a >= sy0 and r + c < sx1 and b + c < sy1:
+                for bx0, by0, bx1, by1, k in boxes:
+                    keys[by0:by1, bx0:bx1] = k
+            else:
+                for bx0, by0, bx1, by1, k in boxes:
+                    keys[max(by0, sy0):max(min(by1, sy1), sy0), max(bx0, sx0):max(min(bx1, sx1), sx0)] = k
+        x0, y0, x1, y1, width = (c[idx] - o for c, o in zip(self._cols, (rx0, ry0, rx0, ry0, 0)))
+        sk = 2 * (idx - lo) + 2
+        flat = keys.reshape(-1)
+        for w in np.unique(width).tolist():
+            m = width == w
+            cx, dx, cy, dy = _corners(w)
+            px = np.stack([x0[m], x1[m]], axis=1)[:, cx] + dx
+            py = np.stack([y0[m], y1[m]], axis=1)[:, cy] + dy
+            keep = (px >= sx0) & (px < sx1) & (py >= sy0) & (py < sy1)
+            np.maximum.at(flat, py[keep] * keys.shape[1] + px[keep],
+                          np.broadcast_to(sk[m][:, None], px.shape)[keep].astype(np.int32))
+
+    def _render_pixels(self, keys:"np.ndarray", idx:"np.ndarray", lo:int, rx0:int, ry0:int,
+                       sub:Bounds) -> None:
+        # 픽셀 수 기준으로 잘라 메모리 사용량을 제한
+        if not len(idx):
+            return
+        csum = np.cumsum(self._cost[idx])
+        start = 0
+        while start < len(idx):
+            base = csum[start - 1] if start else 0
+            stop = int(np.searchsorted(csum, base + self.chunk_pixels, side="right"))
+            stop = min(max(stop, start + 1), len(idx))
+            self._render_chunk(keys, idx[start:stop], lo, rx0, ry0, sub)
+            start = stop
+
+    def _render_chunk(self, keys:"np.ndarray", idx:"np.ndarray", lo:int, rx0:int, ry0:int,
+                      sub:Bounds) -> None:
+        kind = self._kind[idx]
+        cols = [c[idx] for c in self._cols]
+        flat = keys.reshape(-1)
+        kw = keys.shape[1]
+        for k, fn in ((LINE, _line_pixels), (TRIANGLE, _triangle_pixels)):
+            m = kind == k
+            if not m.any():
+                continue
+            b = _Batch.from_columns(idx[m] - lo, *(c[m] for c in cols))
+            for px, py, key in fn(b, sub):
+                # 같은 픽셀은 key(= z*2 + 1 + 테두리 여부)가 가장 큰 것이 이긴다
+                np.maximum.at(flat, (py - ry0) * kw + (px - rx0), key)
+
+def cross_check(store:ShapeStore, width:int, height:int,
+                rows:Optional[Sequence[int]]=None) -> Dict[str, int]:
+    """빠른 모드 래스터라이저와 QPainter(안티앨리어싱 끔)가 다르게 칠한 픽셀 수를 종류별로 센다.
+
+    비용 한도 없이 NumPy 로 그릴 수 있는 도형은 모두 NumPy 로 그려 비교한다 (타원은 늘
+    키 이미지로 그리므로 0). rows 는 z 오름차순 행 번호 (생략하면 저장소의 모든 행).
+    """
+    _require_numpy()
+    order = np.asarray(range(len(store)) if rows is None else rows, np.int32)
+    kinds = np.frombuffer(store.kind, TYPECODES["kind"])[order] if len(order) else order
+    bg = QColor("white")
+    out: Dict[str, int] = {}
+    for name, k in (("rect", RECT), ("ellipse", ELLIPSE), ("line", LINE), ("triangle", TRIANGLE)):
+        sub = order[kinds == k]
+        ref = QImage(width, height, QImage.Format_RGB32)
+        ref.fill(bg)
+        p = QPainter(ref)
+        p.setRenderHint(QPainter.Antialiasing, False)
+        BatchPainter(p, store).paint_rows(sub.tolist())
+        p.end()
+        img = QImage(width, height, QImage.Format_RGB32)
+        raster = NumpyRasterizer(max_cost=1 << 62, min_run=1)
+        raster.load_store(store, sub)
+        raster.render(img, bg)
+        out[name] = int(np.count_nonzero(image_array(ref) != image_array(img)))
+    return out
+
+def _long_runs(mask:"np.ndarray", n:int) -> "np.ndarray":
+    # z 순서로 n 개 미만 이어지는 NumPy 구간은 앞뒤 QPainter 구간에 붙인다
+    # (구간을 바꿀 때마다 QPainter 를 새로 열고 z 버퍼를 돌리는 비용이 더 크다)
+    d = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(d == 1), np.flatnonzero(d == -1)
+    short = ends - starts < n
+    if not short.any():
+        return mask
+    lens = (ends - starts)[short]
+    out = mask.copy()
+    out[np.repeat(starts[short] - np.cumsum(lens) + lens, lens) + np.arange(int(lens.sum()))] = False
+    return out
+
+class _RowViews:
+    """z 위치 -> 저장소 프록시. QPainter 로 넘기는 구간에서만 실제로 만든다."""
+
+    def __init__(self, store:ShapeStore, order:"np.ndarray") -> None:
+        self.store = store
+        self.order = order
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __getitem__(self, sl:slice):
+        return [self.store.view_at(int(r)) for r in self.order[sl]]
+
+def _layer(b:_Batch, owner, px, py, stroke:bool):
+    return px, py, b.z[owner] * 2 + (2 if stroke else 1)
+
+def _corners(width:int):
+    # 사각형 바깥 네 꼭짓점 칸에서 칠할 픽셀 (cx, dx, cy, dy): x = (x0, x1)[cx] + dx,
+    # y = (y0, y1)[cy] + dy. 펜이 RoundJoin 이라 꼭짓점에서 두께 절반 이내인 것만
+    # (두께 1 이하는 Qt 가 가는 선으로 그려 네모나다)
+    out = _CORNERS.get(width)
+    if out is None:
+        a, c = width // 2, (width - 1) // 2
+        # 변 앞쪽 칸(-a..-1)과 뒤쪽 칸(0..c), 그리고 표본점에서 꼭짓점까지 거리
+        sides = ((0, np.arange(-a, 0), -np.arange(-a, 0) - _SAMPLE),
+                 (1, np.arange(c + 1), np.arange(c + 1) + _SAMPLE))
+        parts = []
+        for cy, dy, ey in sides:
+            for cx, dx, ex in sides:
+                gx, gy = np.meshgrid(dx, dy)
+                ok = np.add.outer(ey ** 2, ex ** 2) <= (width / 2.0) ** 2
+                if width <= 1:
+                    ok[:] = True
+                parts.append((np.full(ok.sum(), cx), gx[ok], np.full(ok.sum(), cy), gy[ok]))
+        out = _CORNERS[width] = tuple(np.concatenate(p) for p in zip(*parts))
+    return out
+
+_CORNERS: Dict[int, tuple] = {}
+
+def _line_pixels(b:_Batch, clip:Bounds):
+    thin = b.width <= 1
+    out = []
+    if thin.any():
+        out.append(_thin_line_pixels(_take(b, thin), clip))
+    if not thin.all():
+        out.append(_wide_line_pixels(_take(b, ~thin), clip))
+    return out
+
+def _take(b:_Batch, m) -> _Batch:
+    return _Batch.from_columns(*(getattr(b, name)[m] for name in _Batch.__slots__))
+
+def _axes(b:_Batch):
+    # 긴 축(major) 시작/끝, 짧은 축(minor) 시작/끝, 세로로 긴지
+    steep = np.abs(b.y1 - b.y0) > np.abs(b.x1 - b.x0)
+    return (np.where(steep, b.y0, b.x0), np.where(steep, b.y1, b.x1),
+            np.where(steep, b.x0, b.y0), np.where(steep, b.x1, b.y1), steep)
+
+def _thin_line_pixels(b:_Batch, clip:Bounds):
+    # 두께 1 이하는 Qt 처럼 긴 축 한 칸마다 한 픽셀. 기울기가 양수면 칸 중심, 아니면 칸 시작에서
+    # 짧은 축 좌표를 재고, 경계에 딱 걸리면 양수 쪽은 앞 칸을 고른다 (정수로만 계산)
+    a0, a1, m0, m1, steep = _axes(b)
+    lo = np.maximum(np.minimum(a0, a1), np.where(steep, clip[1], clip[0]))
+    hi = np.minimum(np.maximum(a0, a1), np.where(steep, clip[3], clip[2]))
+    n = np.maximum(hi - lo + 1, 0)
+    owner = np.repeat(np.arange(len(n), dtype=np.int32), n)
+    start = (np.cumsum(n) - n).astype(np.int32)
+    major = lo[owner] + np.arange(int(n.sum()), dtype=np.int32) - np.repeat(start, n)
+    da = a1 - a0
+    sg = np.where(da < 0, -1, 1)
+    n_a, n_m = (da * sg)[owner].astype(np.int64), ((m1 - m0) * sg)[owner].astype(np.int64)
+    rel = (major - a0[owner]).astype(np.int64)
+    den = np.maximum(n_a, 1)
+    minor = m0[owner] + np.where(n_m > 0, -((-(2 * rel + 1) * n_m) // (2 * den)) - 1, rel * n_m // den)
+    st = steep[owner]
+    px = np.where(st, minor, major)
+    py = np.where(st, major, minor)
+    hit = (px >= clip[0]) & (px <= clip[2]) & (py >= clip[1]) & (py <= clip[3])
+    return _layer(b, owner[hit], px[hit], py[hit], True)
+
+def _wide_line_pixels(b:_Batch, clip:Bounds):
+    # 펜이 RoundCap 이라 선은 선분에서 r 이내인 캡슐. 볼록하므로 긴 축 한 칸(표본 a)마다 짧은 축
+    # 구간 하나가 되고, 그 구간은 (직선 띠 ∩ 수선의 발이 선분 안) 과 양 끝 원 구간의 최소~최대다
+    r = b.width / 2.0
+    a0, a1, m0, m1, steep = _axes(b)
+    da, dm = (a1 - a0).astype(np.float64), (m1 - m0).astype(np.float64)
+    ri = np.ceil(r).astype(np.int64)
+    lo = np.maximum(np.minimum(a0, a1) - ri, np.where(steep, clip[1], clip[0]))
+    hi = np.minimum(np.maximum(a0, a1) + ri, np.where(steep, clip[3], clip[2]))
+    n = np.maximum(hi - lo + 1, 0)
+    line = np.repeat(np.arange(len(n)), n)
+    start = np.cumsum(n) - n
+    major = lo[line] + np.arange(int(n.sum())) - np.repeat(start, n)
+    ta = major + _SAMPLE - a0[line]          # 표본의 긴 축 좌표 - a0
+    rr = (r * r)[line]
+    mlo = np.full(len(ta), np.inf)
+    mhi = np.full(len(ta), -np.inf)
+    for ca, cm in ((0.0, m0[line]), ((a1 - a0)[line], m1[line])):
+        h2 = rr - (ta - ca) ** 2
+        ok = h2 >= 0
+        h = np.sqrt(np.where(ok, h2, 0.0))
+        mlo = np.where(ok, np.minimum(mlo, cm - h), mlo)
+        mhi = np.where(ok, np.maximum(mhi, cm + h), mhi)
+    # 띠: |M - (m0 + ta*s)| <= r*sqrt(1+s^2), 수선의 발: 0 <= (ta*da + (M - m0)*dm) / L^2 <= 1
+    ld, lm = da[line], dm[line]
+    ll = ld * ld + lm * lm
+    with np.errstate(divide="ignore", invalid="ignore"):
+        c = m0[line] + ta * np.where(ld != 0, lm / ld, 0.0)
+        e = np.sqrt(rr * ll) / np.abs(np.where(ld != 0, ld, 1.0))
+        p0 = m0[line] - ta * ld / lm
+        p1 = m0[line] + (ll - ta * ld) / lm
+    blo, bhi = c - e, c + e
+    flat = lm == 0
+    inside = np.where(flat, (ta * ld >= 0) & (ta * ld <= ll), True) & (ld != 0)
+    blo = np.where(flat, blo, np.maximum(blo, np.minimum(p0, p1)))
+    bhi = np.where(flat, bhi, np.minimum(bhi, np.maximum(p0, p1)))
+    inside &= blo <= bhi
+    mlo = np.where(inside, np.minimum(mlo, blo), mlo)
+    mhi = np.where(inside, np.maximum(mhi, bhi), mhi)
+    # 표본 M = minor + S 가 [mlo, mhi] 안인 칸
+    has = mlo <= mhi
+    first = np.ceil(np.where(has, mlo, 0.0) - _SAMPLE).astype(np.int64)
+    cnt = np.where(has, np.floor(np.where(has, mhi, 0.0) - _SAMPLE).astype(np.int64) - first + 1, 0)
+    cnt = np.maximum(cnt, 0)
+    step = np.repeat(np.arange(len(cnt)), cnt)
+    start = np.cumsum(cnt) - cnt
+    minor = first[step] + np.arange(int(cnt.sum())) - np.repeat(start, cnt)
+    owner, major = line[step], major[step]
+    st = steep[owner]
+    px = np.where(st, minor, major)
+    py = np.where(st, major, minor)
+    hit = (px >= clip[0]) & (px <= clip[2]) & (py >= clip[1]) & (py <= clip[3])
+    return _layer(b, owner[hit], px[hit], py[hit], True)
+
+def _triangle_pixels(b:_Batch, clip:Bounds):
+    # 채우기는 픽셀 중심이 세 변 안쪽(경계 포함)인 것, 테두리는 세 변을 직선처럼 (두꺼우면 변마다
+    # 캡슐이라 꼭짓점이 RoundJoin 처럼 둥글다)
+    pts = triangle_points(b.x0, b.y0, b.x1, b.y1)
+    out = [_triangle_fill(b, pts, clip)]
+    for (sx, sy), (ex, ey) in ((pts[0], pts[1]), (pts[1], pts[2]), (pts[2], pts[0])):
+        edge = _Batch.from_columns(b.z, sx, sy, ex, ey, b.width, b.stroke, b.fill, b.has_fill)
+        out.extend(_line_pixels(edge, clip))
+    return out
+
+def _triangle_fill(b:_Batch, pts, clip:Bounds):
+    # 행마다 x 구간 하나. 픽셀 중심을 두 배 한 정수 좌표(2x+1, 2y+1)로 세 변의 부호를 따져
+    # 반올림 없이 구간 끝을 구한다
+    (ax, ay), (bx, by), (cx, cy) = (tuple(np.asarray(v, np.int64) for v in q) for q in pts)
+    area = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    ly = np.maximum(np.minimum(np.minimum(ay, by), cy), clip[1])
+    hy = np.minimum(np.maximum(np.maximum(ay, by), cy), clip[3])
+    n = np.where(b.has_fill & (area != 0), np.maximum(hy - ly + 1, 0), 0)
+    tri = np.repeat(np.arange(len(n)), n)
+    start = np.cumsum(n) - n
+    py = ly[tri] + np.arange(int(n.sum())) - np.repeat(start, n)
+    fy2 = 2 * py + 1
+    sgn = np.sign(area)[tri]
+    xlo = np.full(len(py), clip[0], np.int64)
+    xhi = np.full(len(py), clip[2], np.int64)
+    ok = np.ones(len(py), bool)
+    for (x0, y0), (x1, y1) in (((ax, ay), (bx, by)), ((bx, by), (cx, cy)), ((cx, cy), (ax, ay))):
+        # 안쪽: c0 - k*(2x+1) >= 0
+        k = sgn * (y1 - y0)[tri]
+        c0 = sgn * (x1 - x0)[tri] * (fy2 - 2 * y0[tri]) + k * 2 * x0[tri]
+        safe = np.where(k != 0, 2 * k, 1)
+        xhi = np.where(k > 0, np.minimum(xhi, (c0 - k) // safe), xhi)
+        xlo = np.where(k < 0, np.maximum(xlo, -((k - c0) // safe)), xlo)
+        ok &= (k != 0) | (c0 >= 0)
+    cnt = np.where(ok, np.maximum(xhi - xlo + 1, 0), 0)
+    row = np.repeat(np.arange(len(cnt)), cnt)
+    start = np.cumsum(cnt) - cnt
+    px = xlo[row] + np.arange(int(cnt.sum())) - np.repeat(start, cnt)
+    return _layer(b, tri[row], px, py[row], False)
@@ -0,0 +1,208 @@
+# paint_batch.py
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PyQt5.QtCore import Qt, QLine, QPoint, QRect
+from PyQt5.QtGui import QPainter, QPainterPath, QPen, QBrush, QColor, QPolygon, QPolygonF
+
+from shape_store import RECT, LINE, TRIANGLE, ShapeStore, triangle_points
+from spatial_index import Bounds
+
+StyleKey = Tuple[int, int, Optional[int]]  # stroke, width, fill (없으면 None)
+
+# 묶음 안 겹침 검사용 격자 셀 크기
+_CELL = 32
+# 셀을 이보다 많이 차지하는 큰 도형은 묶지 않고 혼자 그린다
+_MAX_CELLS = 64
+_MAX_BATCH = 4096
+# paint_boxes 가 펜을 끈 상태 (실제 스타일의 두께는 1 이상)
+_NO_PEN = (0, 0)
+
+class FrameStats:
+    """한 번 그릴 때의 QPainter 사용량."""
+    __slots__ = ("shapes", "draw_calls", "state_changes")
+
+    def __init__(self, shapes:int=0, draw_calls:int=0, state_changes:int=0) -> None:
+        self.shapes = shapes
+        self.draw_calls = draw_calls
+        self.state_changes = state_changes
+
+    def __repr__(self) -> str:
+        return (f"FrameStats(shapes={self.shapes}, draw_calls={self.draw_calls}, "
+                f"state_changes={self.state_changes})")
+
+    def __eq__(self, other:object) -> bool:
+        if not isinstance(other, FrameStats):
+            return NotImplemented
+        return (self.shapes, self.draw_calls, self.state_changes) == \
+            (other.shapes, other.draw_calls, other.state_changes)
+
+    def add(self, other:"FrameStats") -> None:
+        self.shapes += other.shapes
+        self.draw_calls += other.draw_calls
+        self.state_changes += other.state_changes
+
+class StyleCache:
+    """스타일 key 별 QPen/QBrush 를 재사용한다. 한 번 만든 객체는 계속 들고 있는다."""
+
+    def __init__(self) -> None:
+        self._pens: Dict[Tuple[int, int], QPen] = {}
+        self._brushes: Dict[int, QBrush] = {}
+
+    def pen(self, stroke:int, width:int) -> QPen:
+        pen = self._pens.get((stroke, width))
+        if pen is None:
+            pen = QPen(QColor.fromRgba(stroke), width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+            self._pens[(stroke, width)] = pen
+        return pen
+
+    def brush(self, fill:int) -> QBrush:
+        brush = self._brushes.get(fill)
+        if brush is None:
+            brush = self._brushes[fill] = QBrush(QColor.fromRgba(fill))
+        return brush
+
+class BatchPainter:
+    """z 오름차순 행들을 스타일별로 묶어 그린다.
+
+    z 순서가 이웃한 같은 스타일·같은 종류 도형은, 서로 (경계 상자 기준으로) 겹치지
+    않는 동안 한 묶음이 된다. 겹치지 않으므로 묶음 안에서 그리는 순서는 결과에
+    영향이 없다. 사각형은 drawRects, 직선은 drawLines, 타원/삼각형은 QPainterPath 하나로
+    그리고, 펜/브러시는 스타일이 실제로 바뀔 때만 설정한다.
+    """
+
+    def __init__(self, p:QPainter, store:ShapeStore, cache:Optional[StyleCache]=None) -> None:
+        self.p = p
+        self.store = store
+        self.cache = cache if cache is not None else StyleCache()
+        self.stats = FrameStats()
+        self._pen: Optional[Tuple[int, int]] = None
+        self._brush: Optional[int] = -1  # -1: 아직 모름, None: NoBrush
+
+    def paint_rows(self, rows:Iterable[int]) -> FrameStats:
+        s = self.store
+        kind, stroke, width, fill, has_fill = s.kind, s.stroke, s.width, s.fill, s.has_fill
+        x0, y0, x1, y1 = s.x0, s.y0, s.x1, s.y1
+        batch: List[int] = []
+        cells: Dict[Tuple[int, int], List[Bounds]] = {}
+        key = None
+        for r in rows:
+            k = (kind[r], stroke[r], width[r], fill[r] if has_fill[r] else None)
+            pad = _paint_pad(width[r])
+            b = (min(x0[r], x1[r]) - pad, min(y0[r], y1[r]) - pad,
+                 max(x0[r], x1[r]) + pad, max(y0[r], y1[r]) + pad)
+            cx0, cy0, cx1, cy1 = b[0] // _CELL, b[1] // _CELL, b[2] // _CELL, b[3] // _CELL
+            if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > _MAX_CELLS:
+                if batch:
+                    self._flush(key, batch)
+                    batch, cells, key = [], {}, None
+                self._flush(k, [r])
+                continue
+            mine = [(cx, cy) for cy in range(cy0, cy1 + 1) for cx in range(cx0, cx1 + 1)]
+            if k != key or len(batch) >= _MAX_BATCH or _overlaps(cells, mine, b):
+                if batch:
+                    self._flush(key, batch)
+                batch, cells, key = [], {}, k
+            batch.append(r)
+            for c in mine:
+                cells.setdefault(c, []).append(b)
+        if batch:
+            self._flush(key, batch)
+        return self.stats
+
+    def paint_ids(self, ids:Iterable[int]) -> FrameStats:
+        row = self.store.row
+        return self.paint_rows(row(sid) for sid in ids)
+
+    def paint_boxes(self, rows:Iterable[int]) -> FrameStats:
+        # 축소 보기의 LOD 자리표시: 경계 상자를 선 없이 채운다 (채우기가 없으면 선 색).
+        # 같은 색이 이어지는 동안 drawRects 한 번으로 그린다
+        s, p, st = self.store, self.p, self.stats
+        stroke, fill, has_fill = s.stroke, s.fill, s.has_fill
+        x0, y0, x1, y1 = s.x0, s.y0, s.x1, s.y1
+        if self._pen != _NO_PEN:
+            p.setPen(Qt.NoPen)
+            self._pen = _NO_PEN
+            st.state_changes += 1
+        color, rects, n = None, [], 0
+        for r in rows:
+            n += 1
+            c = fill[r] if has_fill[r] else stroke[r]
+            if c != color:
+                if rects:
+                    p.drawRects(rects)
+                    st.draw_calls += 1
+                    rects = []
+                if self._brush != c:
+                    p.setBrush(self.cache.brush(c))
+                    self._brush = c
+                    st.state_changes += 1
+                color = c
+            lx, hx = (x0[r], x1[r]) if x0[r] <= x1[r] else (x1[r], x0[r])
+            ly, hy = (y0[r], y1[r]) if y0[r] <= y1[r] else (y1[r], y0[r])
+            rects.append(QRect(lx, ly, max(1, hx - lx), max(1, hy - ly)))
+        if rects:
+            p.drawRects(rects)
+            st.draw_calls += 1
+        st.shapes += n
+        return st
+
+    def _set_style(self, k:int, stroke:int, width:int, fill:Optional[int]) -> None:
+        p, st = self.p, self.stats
+        if self._pen != (stroke, width):
+            p.setPen(self.cache.pen(stroke, width))
+            self._pen = (stroke, width)
+            st.state_changes += 1
+        brush = None if k == LINE else fill
+        if self._brush != brush:
+            p.setBrush(Qt.NoBrush if brush is None else self.cache.brush(brush))
+            self._brush = brush
+            st.state_changes += 1
+
+    def _flush(self, key, batch:List[int]) -> None:
+        k, stroke, width, fill = key
+        self._set_style(k, stroke, width, fill)
+        s, p = self.store, self.p
+        x0, y0, x1, y1 = s.x0, s.y0, s.x1, s.y1
+        if k == RECT:
+            if len(batch) == 1:
+                r = batch[0]
+                p.drawRect(x0[r], y0[r], x1[r] - x0[r], y1[r] - y0[r])
+            else:
+                p.drawRects([QRect(x0[r], y0[r], x1[r] - x0[r], y1[r] - y0[r]) for r in batch])
+        elif k == LINE:
+            if len(batch) == 1:
+                r = batch[0]
+                p.drawLine(x0[r], y0[r], x1[r], y1[r])
+            else:
+                p.drawLines([QLine(x0[r], y0[r], x1[r], y1[r]) for r in batch])
+        elif k == TRIANGLE:
+            polys = [QPolygon([QPoint(x, y) for x, y in triangle_points(x0[r], y0[r], x1[r], y1[r])])
+                     for r in batch]
+            if len(polys) == 1:
+                p.drawPolygon(polys[0])
+            else:
+                path = QPainterPath()
+                for poly in polys:
+                    path.addPolygon(QPolygonF(poly))
+                    path.closeSubpath()
+                p.drawPath(path)
+        else:
+            path = QPainterPath()
+            for r in batch:
+                path.addEllipse(x0[r], y0[r], x1[r] - x0[r], y1[r] - y0[r])
+            p.drawPath(path)
+        self.stats.shapes += len(batch)
+        self.stats.draw_calls += 1
+
+def _paint_pad(width:int) -> int:
+    # 실제로 칠해지는 범위: 펜 두께 절반 + 안티앨리어싱 1px (hit-test 여유는 필요 없다)
+    return width // 2 + 2
+
+def _overlaps(cells:Dict[Tuple[int, int], List[Bounds]], mine:List[Tuple[int, int]], b:Bounds) -> bool:
+    x0, y0, x1, y1 = b
+    for c in mine:
+        for bx0, by0, bx1, by1 in cells.get(c, ()):
+            if bx0 <= x1 and x0 <= bx1 and by0 <= y1 and y0 <= by1:
+                return True
+    return False
@@ -1,10 +1,45 @@
 # paint_canvas.py
+import time
+
 from PyQt5.QtWidgets import QWidget, QPushButton, QHBoxLayout, QVBoxLayout
-from PyQt5.QtGui import QPainter, QPen, QPixmap, QColor
-from PyQt5.QtCore import Qt, QPoint
+from PyQt5.QtGui import QPainter, QPen, QPixmap, QColor, QPolygon, QImage
+from PyQt5.QtCore import Qt, QPoint, QRect
+
+from stroke_model import FillRegion, StrokeModel, stroke_pad
+from undo import DEFAULT_BUDGET, TileDelta, UndoStack
+from color import pack_color
+import metrics
+
+class StrokeLatency:
+    """입력 이벤트가 들어온 뒤 픽스맵에 그려지기까지의 지연(ms)과 프레임당 이벤트 수."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.events = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.total_ms = 0.0
+
+    def record(self, events, latency_ms):
+        self.frames += 1
+        self.events += events
+        self.last_ms = latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+        self.total_ms += latency_ms
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.frames if self.frames else 0.0
+
+    @property
+    def events_per_frame(self):
+        return self.events / self.frames if self.frames else 0.0
 
 class PaintCanvas(QWidget):
-    def __init__(self, width=700, height=600):
+    def __init__(self, width=700, height=600, tolerance=0.5, undo_budget=DEFAULT_BUDGET):
         super().__init__()
         self.setFixedSize(width, height)
         self.canvas = QPixmap(self.size())
@@ -13,31 +48,165 @@ class PaintCanvas(QWidget):
         self.last_point = QPoint()
         self.pen_color = Qt.black
         self.pen_width = 3
+        # 아직 픽스맵에 그리지 않은 이동 점들과 그중 첫 점이 들어온 시각
+        self._pending = []
+        self._pending_since = 0.0
+        self.latency = StrokeLatency()
+        # 획 데이터의 원본. self.canvas 는 이 모델을 화면 배율로 그려 둔 캐시
+        self.model = StrokeModel(tolerance)
+        # 획마다 픽스맵에서 바뀐 타일만 압축해 기록한다
+        self.history = UndoStack(undo_budget)
+        self._delta = None
 
     def change_color(self, color):
+        self.flush_stroke()
         self.pen_color = color
+        self._restart_stroke()
 
     def change_width(self, width):
+        self.flush_stroke()
         self.pen_width = width
+        self._restart_stroke()
+
+    def undo(self):
+        self.flush_stroke()
+        return not self.drawing and self.history.undo()
+
+    def redo(self):
+        return not self.drawing and self.history.redo()
+
+    def set_tolerance(self, tolerance):
+        # 이후에 끝나는 획부터 적용되는 단순화 허용 오차(px)
+        self.model.tolerance = tolerance
+
+    def fill_at(self, x, y, color=None, tolerance=0, connectivity=4):
+        # 페인트 통: (x, y) 와 이어진 비슷한 색 영역을 color(기본은 펜 색)로 채운다.
+        # 채운 영역을 돌려주고, 바뀐 것이 없으면 None
+        from flood_fill import flood_fill
+        if self.drawing:
+            return None
+        img = self.canvas.toImage()
+        spans = flood_fill(img, x, y, self.pen_color if color is None else color,
+                           tolerance, connectivity)
+        if spans is None or not len(spans):
+            return None
+        region = FillRegion(pack_color(self.pen_color if color is None else color), spans)
+        x0, y0, x1, y1 = region.bounds
+        rect = QRect(x0, y0, x1 - x0 + 1, y1 - y0 + 1)
+        delta = TileDelta(self.canvas, on_apply=self.update)
+        delta.touch(rect)
+        painter = QPainter(self.canvas)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.drawImage(rect, img, rect)
+        painter.end()
+        strokes, i = self.model.strokes, len(self.model.strokes)
+        strokes.append(region)
+        delta.on_undo = lambda: strokes.pop(i)
+        delta.on_redo = lambda: strokes.insert(i, region)
+        if len(delta.finish()):
+            self.history.push(delta)
+        self.update(rect)
+        return region
+
+    def export_image(self, scale=1.0, antialias=True):
+        # 모델에서 다시 그리므로 배율을 키워도 계단 없이 선명하다
+        img = QImage(round(self.width() * scale), round(self.height() * scale), QImage.Format_RGB32)
+        img.fill(Qt.white)
+        painter = QPainter(img)
+        painter.setRenderHint(QPainter.Antialiasing, antialias)
+        painter.scale(scale, scale)
+        self.model.render(painter)
+        painter.end()
+        return img
 
     def paintEvent(self, event):
+        # 한 프레임 동안 쌓인 이동 이벤트를 한 번에 그린 뒤, 다시 그릴 영역만 복사
+        start = metrics.frame_begin() if metrics.enabled else 0.0
+        events = len(self._pending)
+        self.flush_stroke()
         painter = QPainter(self)
-        painter.drawPixmap(0, 0, self.canvas)
+        rect = event.rect()
+        painter.drawPixmap(rect, self.canvas, rect)
+        painter.end()
+        if metrics.enabled:
+            metrics.frame_end("paint.paint_canvas", start, events=events,
+                              pixels=rect.width() * rect.height())
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self.drawing = True
             self.last_point = event.pos()
+            self._begin_stroke()
 
     def mouseMoveEvent(self, event):
         if self.drawing:
-            painter = QPainter(self.canvas)
-            pen = QPen(self.pen_color, self.pen_width, Qt.SolidLine)
-            painter.setPen(pen)
-            painter.drawLine(self.last_point, event.pos())
-            self.last_point = event.pos()
-            self.update()
+            pos = event.pos()
+            prev = self._pending[-1] if self._pending else self.last_point
+            if not self._pending:
+                self._pending_since = time.perf_counter()
+            self._pending.append(pos)
+            # Qt 가 같은 프레임의 update 영역을 합쳐 paintEvent 한 번으로 보낸다
+            self.update(self._segment_rect(prev, pos))
 
     def mouseReleaseEvent(self, event):
-        if event.button() == Qt.LeftButton:
+        if event.button() == Qt.LeftButton and self.drawing:
+            self.flush_stroke()
             self.drawing = False
+            self._end_stroke()
+
+    def flush_stroke(self):
+        # 쌓인 점을 last_point 에서 이어지는 polyline 하나로 픽스맵에 그린다
+        if not self._pending:
+            return
+        points = [self.last_point] + self._pending
+        if self._delta is not None:
+            pad = stroke_pad(self.pen_width)
+            self._delta.touch(QPolygon(points).boundingRect().adjusted(-pad, -pad, pad, pad))
+        painter = QPainter(self.canvas)
+        painter.setPen(QPen(self.pen_color, self.pen_width, Qt.SolidLine))
+        painter.drawPolyline(QPolygon(points))
+        painter.end()
+        self.last_point = self._pending[-1]
+        self.model.extend((p.x(), p.y()) for p in self._pending)
+        self.latency.record(len(self._pending), (time.perf_counter() - self._pending_since) * 1000.0)
+        self._pending = []
+
+    def _begin_stroke(self):
+        self.model.begin(self.pen_color, self.pen_width, (self.last_point.x(), self.last_point.y()))
+        self._delta = TileDelta(self.canvas, on_apply=self.update)
+
+    def _end_stroke(self):
+        stroke = self.model.end()
+        delta, self._delta = self._delta, None
+        if stroke is not None:
+            # 단순화된 획으로 픽스맵을 맞춰 둔다 (그 획 영역만)
+            x0, y0, x1, y1 = stroke.bounds
+            rect = QRect(x0, y0, x1 - x0 + 1, y1 - y0 + 1)
+            delta.touch(rect)
+            self._redraw(rect)
+            strokes, i = self.model.strokes, len(self.model.strokes) - 1
+            delta.on_undo = lambda: strokes.pop(i)
+            delta.on_redo = lambda: strokes.insert(i, stroke)
+            if len(delta.finish()):
+                self.history.push(delta)
+
+    def _restart_stroke(self):
+        # 그리는 도중 펜이 바뀌면 지금까지를 한 획으로 끝내고 새 펜으로 이어 그린다
+        if self.drawing:
+            self._end_stroke()
+            self._begin_stroke()
+
+    def _redraw(self, rect):
+        rect = rect.intersected(self.canvas.rect())
+        if rect.isEmpty():
+            return
+        painter = QPainter(self.canvas)
+        painter.setClipRect(rect)
+        painter.fillRect(rect, Qt.white)
+        self.model.render(painter, rect)
+        painter.end()
+        self.update(rect)
+
+    def _segment_rect(self, p1, p2):
+        pad = stroke_pad(self.pen_width)
+        return QRect(p1, p2).normalized().adjusted(-pad, -pad, pad, pad)
@@ -0,0 +1,136 @@
+# render_cli.py
+"""CanvasCore 장면을 GUI 없이 PNG 로 그리는 배치 렌더러.
+
+    python render_cli.py scenes.jsonl -o out/ -j 8
+    cat scenes.jsonl | python render_cli.py -o out/
+
+입력은 한 줄에 장면 하나 (scene_io.to_json 형식의 JSON). "output" 키가 있으면 그
+파일 이름으로, 없으면 scene-000001.png 처럼 입력 순서 번호로 저장한다. "output" 은
+출력 디렉터리 안의 상대 경로여야 하고 (절대 경로나 ".." 가 든 줄은 실패로 처리), 없는 하위
+디렉터리는 만든다. 실패한 줄은 출력 경로와 함께 표준 오류로 알린다.
+워커 프로세스마다 CanvasCore 하나를 만들어 두고 장면만 바꿔 가며 재사용한다.
+"""
+from __future__ import annotations
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+
+Job = Tuple[int, str]                    # 입력 순번, JSON 한 줄
+Result = Tuple[int, str, int, str]       # 순번, 출력 경로, 도형 수, 오류 메시지("" 이면 성공)
+
+_worker: dict = {}
+
+def _init_worker(out_dir:str, antialias:Optional[bool], backend:str, quality:int=-1) -> None:
+    _worker.update(out_dir=out_dir, antialias=antialias, backend=backend, quality=quality, core=None)
+
+def render_job(job:Job) -> Result:
+    # 워커에서 장면 한 줄을 그려 PNG 로 저장한다. 실패해도 예외 대신 메시지를 돌려준다
+    import scene_io
+    seq, line = job
+    path = ""
+    try:
+        data = json.loads(line)
+        path = os.path.join(_worker["out_dir"], _output_name(data.get("output")) or f"scene-{seq:06d}.png")
+        core = _worker["core"]
+        if core is None:
+            core = scene_io.from_json(data, antialias=_worker["antialias"], backend=_worker["backend"])
+            _worker["core"] = core
+        else:
+            scene_io.from_json(data, into=core)
+        core.render()
+        # "output" 에 하위 디렉터리가 있으면 저장 전에 만든다
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if not core.image.save(path, "PNG", _worker["quality"]):
+            return seq, path, len(core.store), "could not write image"
+        return seq, path, len(core.store), ""
+    except Exception as e:  # 잘못된 줄 하나 때문에 배치 전체가 멈추지 않게
+        return seq, path, 0, f"{type(e).__name__}: {e}"
+
+def _output_name(name:Optional[str]) -> Optional[str]:
+    # 장면의 "output" 은 출력 디렉터리 안의 상대 경로만 받는다
+    if not name:
+        return None
+    parts = name.replace("\\", "/").split("/")
+    if os.path.isabs(name) or os.path.splitdrive(name)[0] or ".." in parts:
+        raise ValueError(f"output must be a relative path inside the output directory: {name!r}")
+    return name
+
+def iter_jobs(paths:Iterable[str]) -> Iterator[Job]:
+    # "-" 는 표준 입력. 빈 줄은 건너뛰지만 순번은 줄 번호를 따른다
+    seq = 0
+    for path in paths:
+        f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+        try:
+            for line in f:
+                seq += 1
+                if line.strip():
+                    yield seq, line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+def render_batch(jobs:Iterable[Job], out_dir:str=".", workers:Optional[int]=None,
+                 antialias:Optional[bool]=None, backend:str="qpainter",
+                 chunksize:int=4, quality:int=-1) -> Iterator[Result]:
+    """장면들을 프로세스 풀에서 그려 결과를 입력 순서대로 내보낸다.
+
+    ``antialias=None`` 이면 백엔드 기본값을 쓴다 (qpainter 는 켬, NumPy 백엔드는 끔).
+    ``workers=0`` 이면 풀 없이 현재 프로세스에서 그린다 (디버깅/작은 배치용).
+    ``quality`` 는 QImage.save 의 PNG 품질 (-1 = Qt 기본값). 장면이 단순하면 시간 대부분이
+    PNG 압축이라, 값을 높이면(압축을 약하게) 파일은 커지지만 처리량이 크게 오른다.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    if workers == 0:
+        _init_worker(out_dir, antialias, backend, quality)
+        yield from map(render_job, jobs)
+        return
+    pool = ProcessPoolExecutor(
+        workers or os.cpu_count() or 1, mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker, initargs=(out_dir, antialias, backend, quality))
+    with pool:
+        yield from pool.map(render_job, jobs, chunksize=chunksize)
+
+def main(argv:Optional[List[str]]=None) -> int:
+    ap = argparse.ArgumentParser(description="Render CanvasCore JSON-lines scenes to PNG without a GUI.")
+    ap.add_argument("inputs", nargs="*", default=["-"], help="JSON-lines files ('-' = stdin, default)")
+    ap.add_argument("-o", "--out-dir", default=".", help="output directory (default: .)")
+    ap.add_argument("-j", "--jobs", type=int, default=None,
+                    help="worker processes (default: CPU count, 0 = render in this process)")
+    ap.add_argument("--chunksize", type=int, default=4, help="scenes sent to a worker at a time")
+    ap.add_argument("--backend", default="qpainter", choices=("qpainter", "numpy", "numpy_exact"))
+    ap.add_argument("--no-antialias", dest="antialias", action="store_const", const=False,
+                    help="turn antialiasing off (the numpy backends never antialias)")
+    ap.add_argument("--png-quality", type=int, default=-1,
+                    help="PNG quality 0-100, higher = faster and larger (default: Qt default)")
+    ap.add_argument("-q", "--quiet", action="store_true", help="only print errors and the summary")
+    args = ap.parse_args(argv)
+
+    start = time.perf_counter()
+    done = failed = shapes = 0
+    for seq, path, n, error in render_batch(iter_jobs(args.inputs), args.out_dir, args.jobs,
+                                            args.antialias, args.backend, args.chunksize,
+                                            args.png_quality):
+        if error:
+            failed += 1
+            where = f"line {seq} ({path})" if path else f"line {seq}"
+            print(f"{where}: {error}", file=sys.stderr)
+            continue
+        done += 1
+        shapes += n
+        if not args.quiet:
+            print(path)
+    elapsed = time.perf_counter() - start
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"rendered {done} images ({shapes} shapes, {failed} failed) in {elapsed:.2f}s "
+          f"- {rate:.1f} images/s", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
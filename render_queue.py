@@ -0,0 +1,248 @@
+# render_queue.py
+"""CanvasCore 비동기 렌더/저장. 장면 사본을 작업 스레드 하나에서 그리고 결과를 UI 스레드로 돌려준다.
+
+    core.render_queue.rendered.connect(label_update)   # 큐를 만든 스레드에서 불린다
+    future = core.render_async()                        # concurrent.futures.Future[QImage]
+    core.save_async("out.png", callback=lambda ok: ...)
+
+요청은 종류별(렌더 하나, 저장은 경로마다 하나)로 마지막 것만 남는다. 아직 시작하지 않은
+이전 요청의 future 는 바로 취소되고, 그리는 중인 요청은 다음 행 묶음 전에 멈춘 뒤 취소된다.
+결과 future 는 작업 스레드에서 완료되고, 콜백과 신호(``rendered``, ``saved``, ``failed``)는
+큐를 만든 스레드(보통 GUI 스레드)의 이벤트 루프로 전달된다. 전달 시점에 더 새 요청이
+있으면 신호와 콜백은 건너뛴다.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Hashable, Optional
+import threading
+import time
+
+from PyQt5.QtCore import Qt, QObject, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter, QColor
+
+from paint_batch import BatchPainter, StyleCache
+import metrics
+
+# 그리는 동안 이 행 수마다 취소 여부를 확인한다
+CHUNK = 16384
+
+class Snapshot:
+    """렌더 한 번에 필요한 장면 사본. 만든 뒤 원본 CanvasCore 가 바뀌어도 영향이 없다.
+
+    장면이 이미 그려져 있으면(더러운 곳이 없으면) 도형을 복사하지 않고 이미지를 공유한다
+    (QImage 는 암시적 공유라 원본에 다시 그릴 때 그쪽이 복사된다).
+    """
+    __slots__ = ("store", "rows", "image", "width", "height", "bg", "antialias", "backend",
+                 "view", "version")
+
+    def __init__(self, core) -> None:
+        self.width, self.height = core.image.width(), core.image.height()
+        self.bg = core._bg.rgba()
+        self.antialias = core.antialias
+        self.backend = core.backend
+        self.view = core.view
+        self.version = core._version
+        if core.is_dirty:
+            self.store = core.store.copy()
+            self.rows = core._rows_in_z()[:]
+            self.image = None
+        else:
+            self.store = self.rows = None
+            self.image = QImage(core.image)
+
+    def matches(self, core) -> bool:
+        # 사본을 뜬 뒤 장면과 렌더 설정이 그대로인가
+        return (self.version == core._version and self.antialias == core.antialias
+                and self.backend == core.backend and self.view == core.view
+                and self.bg == core._bg.rgba()
+                and (self.width, self.height) == (core.image.width(), core.image.height()))
+
+def render_snapshot(snap:Snapshot, stop:Callable[[], bool]=lambda: False,
+                    styles:Optional[StyleCache]=None) -> Optional[QImage]:
+    """사본을 새 QImage 에 그린다. 도중에 stop() 이 참이 되면 None."""
+    if snap.image is not None:
+        return snap.image
+    img = QImage(snap.width, snap.height, QImage.Format_RGB32)
+    bg = QColor.fromRgba(snap.bg)
+    if snap.view is not None:
+        from viewport import paint_view
+        return img if paint_view(img, snap.store, snap.rows, snap.view, bg, snap.antialias,
+                                 styles, stop) is not None else None
+    if snap.backend != "qpainter":
+        from numpy_raster import NumpyRasterizer
+        raster = NumpyRasterizer(exact=snap.backend == "numpy_exact")
+        raster.load_store(snap.store, snap.rows)
+        if stop():
+            return None
+        raster.render(img, bg)
+        return img
+    img.fill(bg)
+    p = QPainter(img)
+    p.setRenderHint(QPainter.Antialiasing, snap.antialias)
+    batch = BatchPainter(p, snap.store, styles)
+    rows = snap.rows
+    for i in range(0, len(rows), CHUNK):
+        if stop():
+            p.end()
+            return None
+        batch.paint_rows(rows[i:i + CHUNK])
+    p.end()
+    return img
+
+class _Job:
+    __slots__ = ("key", "seq", "snap", "path", "future", "callback", "stale")
+
+    def __init__(self, key:Hashable, seq:int, snap:Snapshot, path:Optional[str],
+                 callback:Optional[Callable]) -> None:
+        self.key = key
+        self.seq = seq
+        self.snap = snap
+        self.path = path
+        self.future: Future = Future()
+        self.callback = callback
+        self.stale = False
+
+    def stopped(self) -> bool:
+        return self.stale or self.future.cancelled()
+
+class RenderQueue(QObject):
+    """작업 스레드 하나로 도는 렌더/저장 큐. ``core`` 를 주면 끝난 렌더를 그 코어에 반영한다.
+
+    반영은 사본을 뜬 뒤 장면이 바뀌지 않았을 때만 한다 (core.image 를 결과로 바꾸고 더러운
+    영역을 비운다). 그러면 이어지는 render()/save_image() 가 다시 그리지 않는다.
+    """
+    rendered = pyqtSignal(QImage)
+    saved = pyqtSignal(str, bool)
+    failed = pyqtSignal(object)
+    # 작업 스레드 -> 큐를 만든 스레드 (QueuedConnection)
+    _done = pyqtSignal(object)
+
+    def __init__(self, core=None, parent:Optional[QObject]=None) -> None:
+        super().__init__(parent)
+        self._core = core
+        self._styles = StyleCache()
+        self._pending: "OrderedDict[Hashable, _Job]" = OrderedDict()
+        self._running: Optional[_Job] = None
+        self._latest: dict = {}
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._done.connect(self._deliver, Qt.QueuedConnection)
+
+    def render(self, core, callback:Optional[Callable[[QImage], None]]=None) -> Future:
+        return self._submit("render", Snapshot(core), None, callback)
+
+    def save(self, core, path:str, callback:Optional[Callable[[bool], None]]=None) -> Future:
+        return self._submit(("save", path), Snapshot(core), path, callback)
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending) + (self._running is not None)
+
+    def shutdown(self, wait:bool=True, cancel_pending:bool=False) -> None:
+        with self._cond:
+            self._closed = True
+            dropped = list(self._pending.values()) if cancel_pending else []
+            if cancel_pending:
+                self._pending.clear()
+            self._cond.notify()
+            thread = self._thread
+        for job in dropped:
+            job.future.cancel()
+        if wait and thread is not None:
+            thread.join()
+
+    def _submit(self, key:Hashable, snap:Snapshot, path:Optional[str],
+                callback:Optional[Callable]) -> Future:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("render queue is shut down")
+            self._seq += 1
+            job = _Job(key, self._seq, snap, path, callback)
+            self._latest[key] = job.seq
+            old = self._pending.pop(key, None)
+            if self._running is not None and self._running.key == key:
+                self._running.stale = True
+            self._pending[key] = job
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="render-queue", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        if old is not None:
+            # 시작도 하기 전에 밀려난 요청 (콜백은 잠금 밖에서)
+            old.future.cancel()
+            if metrics.enabled:
+                metrics.count("render_async.coalesced")
+        return job.future
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                _, job = self._pending.popitem(last=False)
+                self._running = job
+            try:
+                result = self._execute(job)
+            except Exception as e:
+                result = e
+            with self._cond:
+                self._running = None
+            self._finish(job, result)
+
+    def _execute(self, job:_Job):
+        # future 는 끝날 때까지 PENDING 으로 둔다 - 밀려나거나 취소되면 그대로 cancel() 할 수 있게
+        if job.stopped():
+            return None
+        start = time.perf_counter()
+        img = render_snapshot(job.snap, job.stopped, self._styles)
+        if img is None:
+            return None
+        if metrics.enabled:
+            metrics.observe("render_async.ms", (time.perf_counter() - start) * 1000.0)
+        if job.path is None:
+            return img
+        if job.stopped():
+            return None
+        start = time.perf_counter()
+        ok = img.save(job.path)
+        if metrics.enabled:
+            metrics.observe("encode.ms", (time.perf_counter() - start) * 1000.0)
+        return ok
+
+    def _finish(self, job:_Job, result) -> None:
+        future = job.future
+        if result is None or job.stale:
+            future.cancel()
+            if metrics.enabled:
+                metrics.count("render_async.cancelled")
+            return
+        if not future.set_running_or_notify_cancel():
+            return
+        if isinstance(result, Exception):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+        self._done.emit(job)
+
+    def _deliver(self, job:_Job) -> None:
+        # 큐를 만든 스레드에서. 그 사이 같은 종류의 더 새 요청이 들어왔으면 알리지 않는다
+        if self._latest.get(job.key) != job.seq:
+            return
+        exc = job.future.exception()
+        if exc is not None:
+            self.failed.emit(exc)
+            return
+        value = job.future.result()
+        if job.path is None:
+            if self._core is not None and job.snap.matches(self._core):
+                self._core._adopt_image(value)
+            self.rendered.emit(value)
+        else:
+            self.saved.emit(job.path, value)
+        if job.callback is not None:
+            job.callback(value)
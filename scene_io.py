@@ -0,0 +1,184 @@
+# scene_io.py
+from __future__ import annotations
+from array import array
+from typing import Any, Dict
+import json
+import mmap
+import struct
+import sys
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QImage
+
+from color import pack_color, to_qcolor
+from shape_store import RECT, ELLIPSE, LINE, TRIANGLE, COLUMNS, IdRows, ShapeStore
+
+# 파일 구성 (모두 little-endian)
+#   HEADER | 블록 오프셋 표 (열마다 + 경계 상자 블록, u64) | 블록들 (8 바이트 정렬)
+# 도형 레코드는 고정 길이(shape_store.RECORD 와 같은 필드)지만 열 단위로 나눠 저장한다.
+# 그래야 mmap 한 파일 위에 memoryview 를 바로 씌워 ShapeStore 열로 쓸 수 있다.
+# 행은 z 오름차순으로 저장하므로 불러온 뒤 정렬이 필요 없다.
+MAGIC = b"CCSCENE\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sHH16sQQIIIqqiiii")
+_CODES = "".join(code for _, code in COLUMNS).encode()
+_NBLOCKS = len(COLUMNS) + 1
+_OFFSETS = struct.Struct("<%dQ" % _NBLOCKS)
+_NATIVE = sys.byteorder == "little"
+
+_KIND_NAMES = {RECT: "rect", ELLIPSE: "ellipse", LINE: "line", TRIANGLE: "triangle"}
+_KINDS = {v: k for k, v in _KIND_NAMES.items()}
+
+def save_scene(core, path:str) -> None:
+    """CanvasCore 장면을 바이너리 파일로 저장한다 (도형, 배경/크기, z 카운터, id 시드)."""
+    import canvas_core
+    store = core.store
+    order = core._rows_in_z()
+    n = len(order)
+    blocks = []
+    for name, code in COLUMNS:
+        col = getattr(store, name)
+        blocks.append(array(code, map(col.__getitem__, order)))
+    bounds = array("i")
+    ids = store.ids
+    sx0 = sy0 = sx1 = sy1 = 0
+    for i, r in enumerate(order):
+        b = store.bounds(ids[r])
+        bounds.extend(b)
+        if i == 0:
+            sx0, sy0, sx1, sy1 = b
+        else:
+            sx0, sy0 = min(sx0, b[0]), min(sy0, b[1])
+            sx1, sy1 = max(sx1, b[2]), max(sy1, b[3])
+    blocks.append(bounds)
+
+    head = HEADER.pack(MAGIC, VERSION, _NBLOCKS, _CODES, n, canvas_core._id_seed,
+                       core.image.width(), core.image.height(), core._bg.rgba(),
+                       core._z_top, core._z_bottom, sx0, sy0, sx1, sy1)
+    pos = _align(HEADER.size + _OFFSETS.size)
+    offsets = []
+    for blk in blocks:
+        offsets.append(pos)
+        pos = _align(pos + len(blk) * blk.itemsize)
+    with open(path, "wb") as f:
+        f.write(head)
+        f.write(_OFFSETS.pack(*offsets))
+        for off, blk in zip(offsets, blocks):
+            f.write(b"\x00" * (off - f.tell()))
+            if not _NATIVE:
+                blk.byteswap()
+            blk.tofile(f)
+
+def read_header(path:str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        return _parse_header(f.read(HEADER.size + _OFFSETS.size))
+
+def load_scene(path:str, use_mmap:bool=True, **kwargs):
+    """save_scene 으로 저장한 파일을 CanvasCore 로 연다.
+
+    ``use_mmap`` 이면 파일을 copy-on-write 로 매핑하고 열을 복사하지 않는다. 공간
+    인덱스와 그리기는 처음 필요할 때 이루어진다. kwargs 는 CanvasCore 생성자로 넘긴다.
+    """
+    from canvas_core import CanvasCore, _reserve_ids
+    with open(path, "rb") as f:
+        head = _parse_header(f.read(HEADER.size + _OFFSETS.size))
+        n, offsets = head["count"], head["offsets"]
+        if use_mmap and _NATIVE:
+            owner = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            buf = memoryview(owner)
+            cols = {name: buf[off:off + n * struct.calcsize(code)].cast(code)
+                    for (name, code), off in zip(COLUMNS, offsets)}
+            store = ShapeStore.mapped(cols, owner)
+            bounds = buf[offsets[-1]:offsets[-1] + n * 16].cast("i")
+        else:
+            store = ShapeStore()
+            for (name, code), off in zip(COLUMNS, offsets):
+                setattr(store, name, _read_block(f, code, off, n))
+            bounds = _read_block(f, "i", offsets[-1], 4 * n)
+            store._row = IdRows.from_ids(store.ids)
+    core = CanvasCore(head["width"], head["height"], QColor.fromRgba(head["bg"]), **kwargs)
+    core._adopt(store, head["z_top"], head["z_bottom"], z_sorted=True, bounds=bounds)
+    _reserve_ids(head["next_id"])
+    return core
+
+def to_json(core) -> Dict[str, Any]:
+    """교환용 dict. 도형은 z 오름차순, 색은 '#aarrggbb' 문자열."""
+    import canvas_core
+    shapes = []
+    for v in core.shapes:
+        x0, y0, x1, y1 = v.coords()
+        fill = v.fill
+        shapes.append({
+            "id": v.id, "type": _KIND_NAMES[v.kind], "p1": [x0, y0], "p2": [x1, y1],
+            "stroke": v.stroke.name(QColor.HexArgb), "width": v.width,
+            "fill": fill.name(QColor.HexArgb) if fill is not None else None,
+        })
+    return {"version": VERSION, "width": core.image.width(), "height": core.image.height(),
+            "bg": core._bg.name(QColor.HexArgb), "next_id": canvas_core._id_seed, "shapes": shapes}
+
+def from_json(data:Dict[str, Any], into=None, **kwargs):
+    """to_json 형식의 dict 로 CanvasCore 를 만든다. id 가 없는 도형은 새 id 를 받는다.
+
+    색은 CanvasCore 가 받는 어떤 형식이든 되고, [r, g, b] 리스트도 받는다.
+    ``into`` 에 기존 CanvasCore 를 주면 새로 만들지 않고 그 장면을 통째로 바꾼다
+    (크기가 같으면 이미지 버퍼도 그대로 쓴다). 이때 kwargs 는 무시된다.
+    """
+    from canvas_core import CanvasCore, _next_id, _reserve_ids, _BLACK
+    ids = [s["id"] for s in data.get("shapes", ()) if s.get("id") is not None]
+    _reserve_ids(max([data.get("next_id") or 0] + ids))
+    width, height = data.get("width", 800), data.get("height", 500)
+    bg = data.get("bg", "white")
+    if into is None:
+        core = CanvasCore(width, height, bg, **kwargs)
+    else:
+        core = into
+        core._bg = to_qcolor(bg) or QColor(Qt.white)
+        if core.image.width() != width or core.image.height() != height:
+            core.image = QImage(width, height, QImage.Format_RGB32)
+        if core.history is not None:
+            core.history.clear()
+    store = ShapeStore()
+    for z, s in enumerate(data.get("shapes", ()), 1):
+        kind = _KINDS[s["type"]]
+        (x0, y0), (x1, y1) = s["p1"], s["p2"]
+        if kind in (RECT, ELLIPSE):
+            x0, y0, x1, y1 = min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+        stroke = pack_color(s.get("stroke", "black"))
+        fill = pack_color(s.get("fill")) if kind != LINE else None
+        sid = s.get("id")
+        store.add(kind, _next_id() if sid is None else sid, x0, y0, x1, y1,
+                  _BLACK if stroke is None else stroke, max(1, s.get("width", 3)), fill, z)
+    core._adopt(store, len(store), 0, z_sorted=True)
+    return core
+
+def save_json(core, path:str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(to_json(core), f)
+
+def load_json(path:str, **kwargs):
+    with open(path, encoding="utf-8") as f:
+        return from_json(json.load(f), **kwargs)
+
+def _parse_header(raw:bytes) -> Dict[str, Any]:
+    if len(raw) < HEADER.size + _OFFSETS.size:
+        raise ValueError("not a scene file (truncated header)")
+    (magic, version, nblocks, codes, count, next_id, width, height, bg,
+     z_top, z_bottom, sx0, sy0, sx1, sy1) = HEADER.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError("not a scene file (bad magic)")
+    if version != VERSION or nblocks != _NBLOCKS or codes.rstrip(b"\x00") != _CODES:
+        raise ValueError(f"unsupported scene file version {version}")
+    return {"count": count, "next_id": next_id, "width": width, "height": height, "bg": bg,
+            "z_top": z_top, "z_bottom": z_bottom, "bounds": (sx0, sy0, sx1, sy1),
+            "offsets": _OFFSETS.unpack_from(raw, HEADER.size)}
+
+def _read_block(f, code:str, off:int, n:int) -> array:
+    out = array(code)
+    f.seek(off)
+    out.fromfile(f, n)
+    if not _NATIVE:
+        out.byteswap()
+    return out
+
+def _align(pos:int) -> int:
+    return (pos + 7) & ~7
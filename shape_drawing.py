@@ -1,9 +1,40 @@
-from PyQt5.QtWidgets import QWidget
-from PyQt5.QtGui import QPainter, QPen, QPixmap
-from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPen
+from PyQt5.QtCore import Qt, QRect
+
+from canvas_core import CanvasCore
+from undo import DEFAULT_BUDGET
+import metrics
+
+# 도형 이름 -> CanvasCore 추가 메서드
+_ADD = {"사각형": "add_rect", "원": "add_ellipse", "삼각형": "add_triangle", "직선": "add_line"}
+
+class PreviewOverlay:
+    """완성된 도형 층 위에 얹는 점선 미리보기 층.
+
+    마지막으로 보인 영역을 기억해 두고, 미리보기가 바뀌면 옛 영역과 새 영역의 합만
+    다시 그리게 한다 (아래 층은 캐시된 이미지에서 그 부분만 복사된다).
+    """
+
+    def __init__(self, pen_width=2):
+        self.pen = QPen(Qt.black, pen_width, Qt.DashLine)
+        self.pad = pen_width // 2 + 2
+        self.rect = QRect()
+
+    def bounds(self, x0, y0, x1, y1):
+        return QRect(min(x0, x1), min(y0, y1), abs(x1 - x0) + 1, abs(y1 - y0) + 1) \
+            .adjusted(-self.pad, -self.pad, self.pad, self.pad)
+
+    def move(self, rect):
+        # 갱신해야 할 영역(옛 영역 ∪ 새 영역)을 돌려준다
+        dirty = self.rect.united(rect)
+        self.rect = rect
+        return dirty
+
+    def hide(self):
+        return self.move(QRect())
 
 class ShapeDrawingFunctions:
-    def __init__(self, canvas_widget: QWidget):
+    def __init__(self, canvas_widget, undo_budget: int = DEFAULT_BUDGET):
         self.canvas = canvas_widget
         self.current_shape = "사각형"
         self.is_drawing = False
@@ -11,8 +42,16 @@ class ShapeDrawingFunctions:
         self.start_y = 0
         self.end_x = 0
         self.end_y = 0
-        self.canvas_image = QPixmap(self.canvas.size())
-        self.canvas_image.fill(Qt.white)
+        self.stroke_color = "black"
+        self.stroke_width = 2
+        # 완성된 도형은 픽셀이 아니라 장면에 남는다. scene.image 가 합성된 래스터 캐시
+        self.scene = CanvasCore(self.canvas.width(), self.canvas.height(), bg="white", antialias=False)
+        self.history = self.scene.enable_history(undo_budget)
+        self.overlay = PreviewOverlay(2)
+
+    @property
+    def canvas_image(self):
+        return self.scene.image
 
     def set_shape(self, shape_name: str):
         self.current_shape = shape_name
@@ -21,30 +60,44 @@ class ShapeDrawingFunctions:
         self.is_drawing = True
         self.start_x, self.start_y = x, y
         self.end_x, self.end_y = x, y
+        self._move_preview()
 
     def update_drawing(self, x: int, y: int):
         if self.is_drawing:
             self.end_x, self.end_y = x, y
-            self.canvas.update()
+            self._move_preview()
 
     def finish_drawing(self, x: int, y: int):
         if self.is_drawing:
             self.end_x, self.end_y = x, y
-            self.draw_shape()
             self.is_drawing = False
+            self.canvas.update(self.overlay.hide())
+            self.draw_shape()
 
     def draw_shape(self):
-        painter = QPainter(self.canvas_image)
-        painter.setPen(QPen(Qt.black, 2, Qt.SolidLine))
-        if self.current_shape == "사각형":
-            self._draw_rectangle(painter)
-        elif self.current_shape == "원":
-            self._draw_circle(painter)
-        elif self.current_shape == "삼각형":
-            self._draw_triangle(painter)
-        elif self.current_shape == "직선":
-            self._draw_line(painter)
-        self.canvas.update()
+        # 새 도형은 맨 위라 캐시에 그 도형 하나만 덧그린다
+        add = getattr(self.scene, _ADD.get(self.current_shape, ""), None)
+        if add is None:
+            return None
+        sid = add((self.start_x, self.start_y), (self.end_x, self.end_y),
+                  stroke=self.stroke_color, width=self.stroke_width)
+        self._refresh()
+        return sid
+
+    def shape_at(self, x: int, y: int):
+        return self.scene.hit_test((x, y), include_lines=True)
+
+    def fill_at(self, x: int, y: int, color):
+        sid = self.scene.set_fill_at_point((x, y), color)
+        self._refresh()
+        return sid
+
+    def remove_at(self, x: int, y: int):
+        sid = self.shape_at(x, y)
+        if sid is not None:
+            self.scene.remove([sid])
+            self._refresh()
+        return sid
 
     def _draw_rectangle(self, painter):
         left, top = min(self.start_x, self.end_x), min(self.start_y, self.end_y)
@@ -68,7 +121,7 @@ class ShapeDrawingFunctions:
     def draw_preview(self, painter):
         if not self.is_drawing:
             return
-        painter.setPen(QPen(Qt.black, 2, Qt.DashLine))
+        painter.setPen(self.overlay.pen)
         if self.current_shape == "사각형":
             self._draw_rectangle(painter)
         elif self.current_shape == "원":
@@ -79,8 +132,44 @@ class ShapeDrawingFunctions:
             self._draw_line(painter)
 
     def clear_canvas(self):
-        self.canvas_image.fill(Qt.white)
+        self.scene.clear()
         self.canvas.update()
 
+    def undo(self):
+        if self.is_drawing or not self.history.undo():
+            return False
+        self._refresh()
+        return True
+
+    def redo(self):
+        if self.is_drawing or not self.history.redo():
+            return False
+        self._refresh()
+        return True
+
     def get_canvas_image(self):
-        return self.canvas_image
+        if self.scene.is_dirty:
+            self.scene.render()
+        return self.scene.image
+
+    def paint(self, painter, rect):
+        # 위젯 paintEvent 용 합성: 캐시된 도형 층에서 rect 만 복사하고, 미리보기 층이
+        # 그 안에 걸칠 때만 위에 그린다
+        start = metrics.frame_begin() if metrics.enabled else 0.0
+        painter.drawImage(rect, self.get_canvas_image(), rect)
+        if self.is_drawing and self.overlay.rect.intersects(rect):
+            painter.setClipRect(rect)
+            self.draw_preview(painter)
+        if metrics.enabled:
+            metrics.frame_end("paint.shape_drawing", start, pixels=rect.width() * rect.height())
+
+    def _move_preview(self):
+        rect = self.overlay.bounds(self.start_x, self.start_y, self.end_x, self.end_y)
+        self.canvas.update(self.overlay.move(rect))
+
+    def _refresh(self):
+        # 장면에서 바뀐 부분만 캐시에 다시 그리고, 위젯도 그 영역만 갱신
+        rect = self.scene.pending_rect()
+        if rect is not None:
+            self.scene.render()
+            self.canvas.update(rect)
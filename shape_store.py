@@ -0,0 +1,473 @@
+# shape_store.py
+from __future__ import annotations
+from array import array
+from typing import Callable, Dict, Iterator, Optional, Tuple
+import math
+import struct
+
+from PyQt5.QtCore import Qt, QPoint, QRect, QRectF
+from PyQt5.QtGui import QPainter, QPainterPath, QPen, QBrush, QColor, QPolygon
+
+from color import pack_color
+from spatial_index import Bounds
+
+RECT, ELLIPSE, LINE, TRIANGLE = 0, 1, 2, 3
+
+# (이름, array typecode) - 도형 하나당 약 48 바이트
+COLUMNS = (
+    ("kind", "b"),
+    ("ids", "q"),
+    ("x0", "i"), ("y0", "i"), ("x1", "i"), ("y1", "i"),
+    ("stroke", "I"),
+    ("width", "H"),
+    ("fill", "I"),
+    ("has_fill", "B"),
+    ("z", "q"),
+)
+
+TYPECODES = dict(COLUMNS)
+
+# COLUMNS 순서 그대로의 고정 길이 레코드 (little-endian, 44 바이트)
+RECORD = struct.Struct("<" + "".join(code for _, code in COLUMNS))
+
+def shape_record(s, z:int=0) -> tuple:
+    """Shape 데이터클래스나 ShapeView 를 RECORD 값 튜플로 바꾼다."""
+    fill = s.fill
+    return (s.kind, s.id, *s.coords(), s.stroke.rgba(), s.width,
+            fill.rgba() if fill is not None else 0, fill is not None, z)
+
+def segment_hit(x:float, y:float, x1:int, y1:int, x2:int, y2:int, width:int) -> bool:
+    dx, dy = x2 - x1, y2 - y1
+    if dx == 0 and dy == 0:
+        dist = math.hypot(x - x1, y - y1)
+    else:
+        t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / float(dx*dx + dy*dy)))
+        projx, projy = x1 + t*dx, y1 + t*dy
+        dist = math.hypot(x - projx, y - projy)
+    return dist <= max(3.0, width/2 + 1.5)
+
+def ellipse_hit(x:float, y:float, x0:int, y0:int, x1:int, y1:int) -> bool:
+    if x1 == x0 or y1 == y0:
+        return False
+    rx = (x1 - x0)/2.0
+    ry = (y1 - y0)/2.0
+    nx = (x - (x0 + rx))/rx
+    ny = (y - (y0 + ry))/ry
+    return nx*nx + ny*ny <= 1.0
+
+def triangle_points(x0:int, y0:int, x1:int, y1:int) -> Tuple[Tuple[int, int], ...]:
+    # 드래그 시작점 (x0, y0) 과 끝점 (x1, y1): 꼭짓점은 시작 행 가운데, 밑변은 끝 행
+    return ((x0 + x1) // 2, y0), (x0, y1), (x1, y1)
+
+def triangle_hit(x:float, y:float, x0:int, y0:int, x1:int, y1:int) -> bool:
+    (ax, ay), (bx, by), (cx, cy) = triangle_points(x0, y0, x1, y1)
+    if (bx - ax) * (cy - ay) - (by - ay) * (cx - ax) == 0:
+        return False
+    d1 = (bx - ax) * (y - ay) - (by - ay) * (x - ax)
+    d2 = (cx - bx) * (y - by) - (cy - by) * (x - bx)
+    d3 = (ax - cx) * (y - cy) - (ay - cy) * (x - cx)
+    return not ((d1 < 0 or d2 < 0 or d3 < 0) and (d1 > 0 or d2 > 0 or d3 > 0))
+
+def ellipse_path(rect:QRect) -> QPainterPath:
+    # drawEllipse 는 안티앨리어싱 없는 1px 펜에서 납작한 타원을 사각형 밖까지 찍는다.
+    # 경로로 그리면 경계 상자 안에 머물고, 일괄 그리기(paint_batch)와도 픽셀이 같다
+    path = QPainterPath()
+    path.addEllipse(QRectF(rect))
+    return path
+
+def shape_pad(width:int) -> int:
+    # 선 두께 절반 + 안티앨리어싱 여유, 직선 hit 허용 오차(최소 3px)까지 포함
+    return int(math.ceil(max(3.0, width/2 + 2)))
+
+class IdRows:
+    """id -> 행 번호 표. id 는 거의 빈틈없이 늘어나므로 ``array('q')`` 에 (id - base) 자리로 둔다.
+
+    빈 자리는 -1. 표가 id 수에 비해 너무 넓어지는 먼 id 만 ``_far`` dict 에 따로 둔다.
+    dict 처럼 ``in`` / ``[]`` / ``get`` / ``pop`` 을 지원한다.
+    """
+    __slots__ = ("base", "_rows", "_far", "_count")
+
+    def __init__(self) -> None:
+        self.base = 0
+        self._rows = array("q")
+        self._far: Dict[int, int] = {}
+        self._count = 0
+
+    @classmethod
+    def from_ids(cls, ids) -> "IdRows":
+        out = cls()
+        if len(ids) and max(ids) - min(ids) < 2 * len(ids) + 1024:
+            out.base = base = min(ids)
+            rows = out._rows = array("q", [-1]) * (max(ids) - base + 1)
+            for r, sid in enumerate(ids):
+                rows[sid - base] = r
+            out._count = len(ids)
+            return out
+        for r, sid in enumerate(ids):
+            out[sid] = r
+        return out
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, sid:int) -> bool:
+        i = sid - self.base
+        if 0 <= i < len(self._rows):
+            return self._rows[i] >= 0
+        return sid in self._far
+
+    def __getitem__(self, sid:int) -> int:
+        i = sid - self.base
+        if 0 <= i < len(self._rows):
+            r = self._rows[i]
+            if r >= 0:
+                return r
+            raise KeyError(sid)
+        return self._far[sid]
+
+    def get(self, sid:int, default:Optional[int]=None) -> Optional[int]:
+        i = sid - self.base
+        if 0 <= i < len(self._rows):
+            r = self._rows[i]
+            return default if r < 0 else r
+        return self._far.get(sid, default)
+
+    def __setitem__(self, sid:int, r:int) -> None:
+        rows = self._rows
+        i = sid - self.base
+        if 0 <= i < len(rows):
+            if rows[i] < 0:
+                self._count += 1
+            rows[i] = r
+            return
+        if sid in self._far:
+            self._far[sid] = r
+            return
+        self._count += 1
+        # 표를 넓히는 비용이 id 수에 비례하는 동안만 넓힌다 (빈 표면 base 를 이 id 로)
+        limit = 2 * self._count + 1024
+        if not rows:
+            self.base = sid
+            rows.append(r)
+        elif i >= len(rows) and i < limit:
+            lo = self.base + len(rows)
+            rows.extend(array("q", [-1]) * (i - len(rows)))
+            rows.append(r)
+            self._adopt_far(lo, sid)
+        elif i < 0 and len(rows) - i <= limit:
+            self._rows = array("q", [r]) + array("q", [-1]) * (-i - 1) + rows
+            self.base = sid
+            self._adopt_far(sid + 1, sid - i)
+        else:
+            self._far[sid] = r
+
+    def _adopt_far(self, lo:int, hi:int) -> None:
+        # 표가 [lo, hi) 로 넓어졌으면 그 범위의 먼 id 를 표로 옮긴다
+        far = self._far
+        if not far:
+            return
+        keys = range(lo, hi) if hi - lo < len(far) else list(far)
+        for sid in keys:
+            if lo <= sid < hi and sid in far:
+                self._rows[sid - self.base] = far.pop(sid)
+
+    def pop(self, sid:int, default:Optional[int]=None) -> Optional[int]:
+        i = sid - self.base
+        rows = self._rows
+        if 0 <= i < len(rows):
+            r = rows[i]
+            if r < 0:
+                return default
+            rows[i] = -1
+        elif sid in self._far:
+            r = self._far.pop(sid)
+        else:
+            return default
+        self._count -= 1
+        return r
+
+    def copy(self) -> "IdRows":
+        out = IdRows()
+        out.base, out._count = self.base, self._count
+        out._rows, out._far = array("q", self._rows), dict(self._far)
+        return out
+
+class ShapeStore:
+    """도형을 열(column) 단위 array 로 보관하는 저장소 (struct-of-arrays).
+
+    좌표는 사각형/타원이면 (x, y, x+w, y+h), 직선/삼각형이면 드래그한 (p1, p2) 이다.
+    색은 0xAARRGGBB 로 압축해 두고 그릴 때만 QColor 로 바꾼다.
+    삭제는 마지막 행을 빈자리로 옮기는 방식이라 행 번호는 바뀔 수 있다 - 밖에서는 id 로 접근.
+
+    ``mapped`` 로 만든 저장소는 열이 파일 mmap 위의 memoryview 이다. 채우기/z 변경은
+    그 자리에서 하고(copy-on-write 매핑), 행 추가/삭제 때 처음으로 array 로 복사한다.
+    """
+
+    def __init__(self) -> None:
+        for name, code in COLUMNS:
+            setattr(self, name, array(code))
+        self._row = IdRows()
+        self._mapped = None
+        self.on_change: Optional[Callable[[int], None]] = None
+
+    @classmethod
+    def mapped(cls, columns:Dict[str, memoryview], owner=None) -> "ShapeStore":
+        # owner(mmap 등)는 열 memoryview 가 살아 있는 동안 같이 붙잡아 둔다
+        out = cls.__new__(cls)
+        out.__dict__.update(columns)
+        out._mapped = owner if owner is not None else columns
+        out.on_change = None
+        return out
+
+    def __getattr__(self, name:str):
+        # mapped 저장소의 id -> 행 맵은 처음 필요할 때 만든다
+        if name == "_row":
+            self._row = IdRows.from_ids(self.ids)
+            return self._row
+        raise AttributeError(name)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, sid:int) -> bool:
+        return sid in self._row
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(memoryview(getattr(self, name)).nbytes for name, _ in COLUMNS)
+
+    @property
+    def is_mapped(self) -> bool:
+        return self._mapped is not None
+
+    def _materialize(self) -> None:
+        for name, code in COLUMNS:
+            setattr(self, name, _column(code, getattr(self, name)))
+        self._mapped = None
+
+    def row(self, sid:int) -> int:
+        return self._row[sid]
+
+    def add(self, kind:int, sid:int, x0:int, y0:int, x1:int, y1:int,
+            stroke:int, width:int, fill:Optional[int], z:int) -> int:
+        if sid in self._row:
+            raise KeyError(f"duplicate shape id {sid}")
+        if self._mapped is not None:
+            self._materialize()
+        r = len(self.ids)
+        self.kind.append(kind)
+        self.ids.append(sid)
+        self.x0.append(x0); self.y0.append(y0); self.x1.append(x1); self.y1.append(y1)
+        self.stroke.append(stroke)
+        self.width.append(width)
+        self.fill.append(fill or 0)
+        self.has_fill.append(fill is not None)
+        self.z.append(z)
+        self._row[sid] = r
+        return r
+
+    def add_record(self, rec:tuple) -> int:
+        kind, sid, x0, y0, x1, y1, stroke, width, fill, has_fill, z = rec
+        return self.add(kind, sid, x0, y0, x1, y1, stroke, width, fill if has_fill else None, z)
+
+    def record_at(self, r:int) -> tuple:
+        return tuple(getattr(self, name)[r] for name, _ in COLUMNS)
+
+    def remove(self, sid:int) -> bool:
+        r = self._row.pop(sid, None)
+        if r is None:
+            return False
+        if self._mapped is not None:
+            self._materialize()
+        last = len(self.ids) - 1
+        for name, _ in COLUMNS:
+            col = getattr(self, name)
+            if r != last:
+                col[r] = col[last]
+            col.pop()
+        if r != last:
+            self._row[self.ids[r]] = r
+        return True
+
+    def __getstate__(self) -> dict:
+        # 피클(프로세스 풀 전달)에는 열과 id 맵만 - 변경 콜백은 넘기지 않는다
+        state = {name: _column(code, getattr(self, name)) for name, code in COLUMNS}
+        state["_row"] = self._row
+        return state
+
+    def __setstate__(self, state:dict) -> None:
+        self.__dict__.update(state)
+        self._mapped = None
+        self.on_change = None
+
+    def copy(self) -> "ShapeStore":
+        out = ShapeStore()
+        for name, code in COLUMNS:
+            setattr(out, name, _column(code, getattr(self, name)))
+        out._row = self._row.copy()
+        return out
+
+    def clear(self) -> None:
+        for name, code in COLUMNS:
+            setattr(self, name, array(code))
+        self._row = IdRows()
+        self._mapped = None
+
+    def set_fill(self, sid:int, fill:Optional[int]) -> None:
+        r = self._row[sid]
+        if self.kind[r] == LINE:
+            fill = None
+        self.fill[r] = fill or 0
+        self.has_fill[r] = fill is not None
+        if self.on_change is not None:
+            self.on_change(sid)
+
+    def bounds(self, sid:int) -> Bounds:
+        r = self._row[sid]
+        pad = shape_pad(self.width[r])
+        x0, y0, x1, y1 = self.x0[r], self.y0[r], self.x1[r], self.y1[r]
+        if self.kind[r] >= LINE:
+            x0, x1 = min(x0, x1), max(x0, x1)
+            y0, y1 = min(y0, y1), max(y0, y1)
+        return x0-pad, y0-pad, x1+pad, y1+pad
+
+    def contains(self, sid:int, x:float, y:float) -> bool:
+        r = self._row[sid]
+        k = self.kind[r]
+        if k == RECT:
+            return self.x0[r] <= x < self.x1[r] and self.y0[r] <= y < self.y1[r]
+        if k == ELLIPSE:
+            return ellipse_hit(x, y, self.x0[r], self.y0[r], self.x1[r], self.y1[r])
+        if k == TRIANGLE:
+            return triangle_hit(x, y, self.x0[r], self.y0[r], self.x1[r], self.y1[r])
+        return segment_hit(x, y, self.x0[r], self.y0[r], self.x1[r], self.y1[r], self.width[r])
+
+    def view(self, sid:int) -> "ShapeView":
+        return _VIEWS[self.kind[self._row[sid]]](self, sid)
+
+    def view_at(self, r:int) -> "ShapeView":
+        return _VIEWS[self.kind[r]](self, self.ids[r])
+
+def _column(code:str, src) -> array:
+    # array 든 memoryview 든 같은 typecode 의 새 array 로 복사
+    out = array(code)
+    out.frombytes(memoryview(src).cast("B"))
+    return out
+
+class ShapeView:
+    """저장소 한 행을 Shape 처럼 다루게 해 주는 가벼운 프록시."""
+    __slots__ = ("_store", "id")
+    kind = -1
+
+    def __init__(self, store:ShapeStore, sid:int) -> None:
+        self._store = store
+        self.id = sid
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(id={self.id})"
+
+    @property
+    def _r(self) -> int:
+        return self._store.row(self.id)
+
+    @property
+    def stroke(self) -> QColor:
+        return QColor.fromRgba(self._store.stroke[self._r])
+
+    @property
+    def width(self) -> int:
+        return self._store.width[self._r]
+
+    @property
+    def fill(self) -> Optional[QColor]:
+        s, r = self._store, self._r
+        return QColor.fromRgba(s.fill[r]) if s.has_fill[r] else None
+
+    def set_fill(self, color) -> None:
+        self._store.set_fill(self.id, pack_color(color))
+
+    def contains(self, pt:QPoint) -> bool:
+        return self._store.contains(self.id, pt.x(), pt.y())
+
+    def bounds(self) -> Bounds:
+        return self._store.bounds(self.id)
+
+    def coords(self) -> Tuple[int, int, int, int]:
+        s, r = self._store, self._r
+        return s.x0[r], s.y0[r], s.x1[r], s.y1[r]
+
+    def _setup(self, p:QPainter) -> None:
+        s, r = self._store, self._r
+        p.setPen(QPen(QColor.fromRgba(s.stroke[r]), s.width[r], Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+        p.setBrush(QBrush(QColor.fromRgba(s.fill[r])) if s.has_fill[r] else Qt.NoBrush)
+
+    def draw(self, p:QPainter) -> None:
+        raise NotImplementedError
+
+class LineView(ShapeView):
+    __slots__ = ()
+    kind = LINE
+
+    @property
+    def p1(self) -> QPoint:
+        x0, y0, _, _ = self.coords()
+        return QPoint(x0, y0)
+
+    @property
+    def p2(self) -> QPoint:
+        _, _, x1, y1 = self.coords()
+        return QPoint(x1, y1)
+
+    def draw(self, p:QPainter) -> None:
+        self._setup(p)
+        x0, y0, x1, y1 = self.coords()
+        p.drawLine(x0, y0, x1, y1)
+
+class RectView(ShapeView):
+    __slots__ = ()
+    kind = RECT
+
+    @property
+    def rect(self) -> QRect:
+        x0, y0, x1, y1 = self.coords()
+        return QRect(x0, y0, x1 - x0, y1 - y0)
+
+    def draw(self, p:QPainter) -> None:
+        self._setup(p)
+        p.drawRect(self.rect)
+
+class EllipseView(ShapeView):
+    __slots__ = ()
+    kind = ELLIPSE
+
+    @property
+    def rect(self) -> QRect:
+        x0, y0, x1, y1 = self.coords()
+        return QRect(x0, y0, x1 - x0, y1 - y0)
+
+    def draw(self, p:QPainter) -> None:
+        self._setup(p)
+        p.drawPath(ellipse_path(self.rect))
+
+class TriangleView(ShapeView):
+    __slots__ = ()
+    kind = TRIANGLE
+
+    @property
+    def p1(self) -> QPoint:
+        x0, y0, _, _ = self.coords()
+        return QPoint(x0, y0)
+
+    @property
+    def p2(self) -> QPoint:
+        _, _, x1, y1 = self.coords()
+        return QPoint(x1, y1)
+
+    def draw(self, p:QPainter) -> None:
+        self._setup(p)
+        p.drawPolygon(QPolygon([QPoint(x, y) for x, y in triangle_points(*self.coords())]))
+
+_VIEWS = {RECT: RectView, ELLIPSE: EllipseView, LINE: LineView, TRIANGLE: TriangleView}
@@ -0,0 +1,134 @@
+# shape_types.py
+"""CanvasCore 의 예전 도형 API: 도형 하나를 객체 하나로 다루는 데이터클래스들.
+
+CanvasCore 는 도형을 ShapeStore 열로 보관하고 ShapeView 프록시를 돌려주므로, 이 클래스들은
+도형 목록을 직접 넘기는 코드(NumpyRasterizer.load, stream_export 등)용으로만 남아 있다.
+canvas_core 를 가볍게 불러오기 위해 따로 두었고, canvas_core.RectShape 처럼 접근해도 된다.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import ClassVar, Optional, Tuple
+
+from PyQt5.QtCore import Qt, QPoint, QRect
+from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QPolygon
+
+from color import ColorLike, to_qcolor
+from shape_store import (RECT, ELLIPSE, LINE, TRIANGLE, segment_hit, shape_pad, triangle_hit,
+                         triangle_points, ellipse_path)
+from spatial_index import Bounds
+
+@dataclass
+class Shape:
+    id: int
+    stroke: QColor
+    width: int
+    fill: Optional[QColor] = None
+    kind: ClassVar[int] = -1
+
+    def draw(self, p: QPainter) -> None:
+        raise NotImplementedError
+
+    def coords(self) -> Tuple[int, int, int, int]:
+        # ShapeStore 와 같은 좌표 규칙 (사각형/타원은 x, y, x+w, y+h)
+        r = self.rect
+        return r.x(), r.y(), r.x() + r.width(), r.y() + r.height()
+
+    def contains(self, pt: QPoint) -> bool:
+        raise NotImplementedError
+
+    def bounds(self) -> Bounds:
+        raise NotImplementedError
+
+    def _pad(self) -> int:
+        return shape_pad(self.width)
+
+    def set_fill(self, color: Optional[ColorLike]) -> None:
+        self.fill = to_qcolor(color)
+
+@dataclass
+class LineShape(Shape):
+    p1: QPoint = field(default_factory=QPoint)
+    p2: QPoint = field(default_factory=QPoint)
+    kind: ClassVar[int] = LINE
+
+    def coords(self) -> Tuple[int, int, int, int]:
+        return self.p1.x(), self.p1.y(), self.p2.x(), self.p2.y()
+
+    def draw(self, p: QPainter) -> None:
+        p.setPen(QPen(self.stroke, self.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+        p.setBrush(Qt.NoBrush)
+        p.drawLine(self.p1, self.p2)
+
+    def contains(self, pt: QPoint) -> bool:
+        return segment_hit(pt.x(), pt.y(), self.p1.x(), self.p1.y(), self.p2.x(), self.p2.y(), self.width)
+
+    def bounds(self) -> Bounds:
+        pad = self._pad()
+        x1, y1, x2, y2 = self.p1.x(), self.p1.y(), self.p2.x(), self.p2.y()
+        return min(x1,x2)-pad, min(y1,y2)-pad, max(x1,x2)+pad, max(y1,y2)+pad
+
+@dataclass
+class RectShape(Shape):
+    rect: QRect = field(default_factory=QRect)
+    kind: ClassVar[int] = RECT
+
+    def draw(self, p: QPainter) -> None:
+        p.setPen(QPen(self.stroke, self.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+        p.setBrush(QBrush(self.fill) if self.fill is not None else Qt.NoBrush)
+        p.drawRect(self.rect)
+
+    def contains(self, pt: QPoint) -> bool:
+        return self.rect.contains(pt)
+
+    def bounds(self) -> Bounds:
+        return _rect_bounds(self.rect, self._pad())
+
+@dataclass
+class EllipseShape(Shape):
+    rect: QRect = field(default_factory=QRect)
+    kind: ClassVar[int] = ELLIPSE
+
+    def draw(self, p: QPainter) -> None:
+        p.setPen(QPen(self.stroke, self.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+        p.setBrush(QBrush(self.fill) if self.fill is not None else Qt.NoBrush)
+        p.drawPath(ellipse_path(self.rect))
+
+    def contains(self, pt: QPoint) -> bool:
+        if self.rect.width() == 0 or self.rect.height() == 0:
+            return False
+        cx = self.rect.x() + self.rect.width()/2.0
+        cy = self.rect.y() + self.rect.height()/2.0
+        rx = self.rect.width()/2.0
+        ry = self.rect.height()/2.0
+        nx = (pt.x() - cx)/rx
+        ny = (pt.y() - cy)/ry
+        return nx*nx + ny*ny <= 1.0
+
+    def bounds(self) -> Bounds:
+        return _rect_bounds(self.rect, self._pad())
+
+@dataclass
+class TriangleShape(Shape):
+    # p1 = 드래그 시작(꼭짓점 행), p2 = 드래그 끝(밑변 행)
+    p1: QPoint = field(default_factory=QPoint)
+    p2: QPoint = field(default_factory=QPoint)
+    kind: ClassVar[int] = TRIANGLE
+
+    def coords(self) -> Tuple[int, int, int, int]:
+        return self.p1.x(), self.p1.y(), self.p2.x(), self.p2.y()
+
+    def draw(self, p: QPainter) -> None:
+        p.setPen(QPen(self.stroke, self.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+        p.setBrush(QBrush(self.fill) if self.fill is not None else Qt.NoBrush)
+        p.drawPolygon(QPolygon([QPoint(x, y) for x, y in triangle_points(*self.coords())]))
+
+    def contains(self, pt: QPoint) -> bool:
+        return triangle_hit(pt.x(), pt.y(), *self.coords())
+
+    def bounds(self) -> Bounds:
+        pad = self._pad()
+        x1, y1, x2, y2 = self.coords()
+        return min(x1,x2)-pad, min(y1,y2)-pad, max(x1,x2)+pad, max(y1,y2)+pad
+
+def _rect_bounds(r:QRect, pad:int) -> Bounds:
+    return r.left()-pad, r.top()-pad, r.left()+r.width()+pad, r.top()+r.height()+pad
@@ -0,0 +1,111 @@
+# spatial_index.py
+from __future__ import annotations
+from array import array
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+Bounds = Tuple[int, int, int, int]  # x0, y0, x1, y1 (양 끝 포함)
+
+class GridIndex:
+    """균일 격자 공간 인덱스. 셀마다 그 셀에 걸치는 도형 id 를 array 로 보관한다.
+
+    너무 많은 셀에 걸치는 큰 도형은 ``_large`` 에 따로 두어 삽입 비용을 제한한다.
+    ``bounds_of`` 를 주면 경계 상자를 따로 저장하지 않고 그 함수로 조회한다
+    (도형 저장소가 이미 좌표를 들고 있을 때 메모리 절약). 이 경우 remove 는
+    저장소에서 도형을 지우기 전에 불러야 한다.
+    z-order 는 호출하는 쪽(CanvasCore)이 관리한다.
+    """
+
+    def __init__(self, cell:int=64, max_cells:int=1024,
+                 bounds_of:Optional[Callable[[int], Bounds]]=None) -> None:
+        self.cell = max(1, int(cell))
+        self.max_cells = max_cells
+        self._cells: Dict[Tuple[int, int], array] = {}
+        self._own: Dict[int, Bounds] = {}
+        self._owns = bounds_of is None
+        self.bounds: Callable[[int], Bounds] = bounds_of or self._own.__getitem__
+        self._large: Set[int] = set()
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def insert(self, sid:int, b:Bounds) -> None:
+        if self._owns:
+            self._own[sid] = b
+        self._count += 1
+        cx0, cy0, cx1, cy1 = self._cell_range(b)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > self.max_cells:
+            self._large.add(sid)
+            return
+        cells = self._cells
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = array("q", (sid,))
+                else:
+                    bucket.append(sid)
+
+    def remove(self, sid:int) -> None:
+        b = self.bounds(sid)
+        self._own.pop(sid, None)
+        self._count -= 1
+        if sid in self._large:
+            self._large.discard(sid)
+            return
+        cx0, cy0, cx1, cy1 = self._cell_range(b)
+        cells = self._cells
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is not None:
+                    bucket.remove(sid)
+                    if not bucket:
+                        del cells[(cx, cy)]
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._own.clear()
+        self._large.clear()
+        self._count = 0
+
+    def query_point(self, x:int, y:int) -> List[int]:
+        c = self.cell
+        bounds = self.bounds
+        out = []
+        for sid in self._cells.get((x // c, y // c), ()):
+            x0, y0, x1, y1 = bounds(sid)
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                out.append(sid)
+        for sid in self._large:
+            x0, y0, x1, y1 = bounds(sid)
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                out.append(sid)
+        return out
+
+    def query_rect(self, b:Bounds) -> List[int]:
+        qx0, qy0, qx1, qy1 = b
+        cx0, cy0, cx1, cy1 = self._cell_range(b)
+        seen: Set[int] = set()
+        cells = self._cells
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(cells):
+            for bucket in cells.values():
+                seen.update(bucket)
+        else:
+            for cy in range(cy0, cy1 + 1):
+                for cx in range(cx0, cx1 + 1):
+                    bucket = cells.get((cx, cy))
+                    if bucket:
+                        seen.update(bucket)
+        seen.update(self._large)
+        bounds = self.bounds
+        out = []
+        for sid in seen:
+            x0, y0, x1, y1 = bounds(sid)
+            if x0 <= qx1 and qx0 <= x1 and y0 <= qy1 and qy0 <= y1:
+                out.append(sid)
+        return out
+
+    def _cell_range(self, b:Bounds) -> Bounds:
+        c = self.cell
+        return b[0] // c, b[1] // c, b[2] // c, b[3] // c
@@ -0,0 +1,149 @@
+# stream_export.py
+from __future__ import annotations
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+import mmap
+import struct
+import tempfile
+import zlib
+
+from PyQt5.QtGui import QImage, QPainter, QColor
+
+from color import pack_color
+from paint_batch import BatchPainter
+from shape_store import RECORD, ShapeStore, shape_pad, shape_record
+from tiled_render import padded_rect, render_tile
+
+_PNG_SIG = b"\x89PNG\r\n\x1a\n"
+_IDAT_CHUNK = 1 << 16
+_SPILL_FLUSH = 8192
+
+def export_png(path:str, source, width:Optional[int]=None, height:Optional[int]=None,
+               band:int=256, bg="white", antialias:bool=True, level:int=6) -> None:
+    """밴드(가로 띠) 단위로 그리면서 PNG 행을 바로 압축해 파일에 쓴다.
+
+    source 는 CanvasCore 이거나 z 오름차순 도형(Shape/ShapeView)의 iterable 이다.
+    최대 메모리는 캔버스 크기가 아니라 밴드 높이(와 밴드에 걸치는 가장 큰 도형 높이)에
+    비례한다. 밴드는 걸치는 도형이 다 들어가게 위아래로 넓혀 그린 뒤 잘라 내므로 경계에
+    이음매가 없다.
+    """
+    with open(path, "wb") as f:
+        w, h, bands = _bands(source, width, height, band, bg, antialias)
+        f.write(_PNG_SIG)
+        _chunk(f, b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0))
+        z = zlib.compressobj(level)
+        pending = bytearray()
+        for img in bands:
+            for row in _rgb_rows(img):
+                pending += b"\x00"
+                pending += row
+            data = z.compress(bytes(pending))
+            pending.clear()
+            if data:
+                for i in range(0, len(data), _IDAT_CHUNK):
+                    _chunk(f, b"IDAT", data[i:i + _IDAT_CHUNK])
+        _chunk(f, b"IDAT", z.flush())
+        _chunk(f, b"IEND", b"")
+
+def export_ppm(path:str, source, width:Optional[int]=None, height:Optional[int]=None,
+               band:int=256, bg="white", antialias:bool=True) -> None:
+    """binary PPM(P6) 파일을 미리 만들어 mmap 하고 밴드마다 해당 행 구간만 채운다."""
+    w, h, bands = _bands(source, width, height, band, bg, antialias)
+    header = b"P6\n%d %d\n255\n" % (w, h)
+    with open(path, "wb+") as f:
+        f.truncate(len(header) + w * h * 3)
+        with mmap.mmap(f.fileno(), 0) as m:
+            m[:len(header)] = header
+            pos = len(header)
+            for img in bands:
+                for row in _rgb_rows(img):
+                    m[pos:pos + len(row)] = row
+                    pos += len(row)
+            m.flush()
+
+def _bands(source, width, height, band, bg, antialias) -> Tuple[int, int, Iterator[QImage]]:
+    from canvas_core import CanvasCore
+    if isinstance(source, CanvasCore):
+        w, h = source.image.width(), source.image.height()
+        if width is not None or height is not None:
+            raise ValueError("width/height come from the CanvasCore image")
+        store, index, bgc = source.store, source.index, source._bg.rgba()
+        aa = source.antialias
+        # 넓히는 양은 걸치는 도형의 범위(reach)로만 제한한다 - band 로 자르면 큰 도형에 이음매
+        return w, h, (render_tile(store, index, (0, y, w, min(band, h - y)), bgc, aa, h, (w, h))
+                      for y in range(0, h, band))
+    if width is None or height is None:
+        raise ValueError("width and height are required for a shape iterable")
+    bgc = pack_color("white" if bg is None else bg)
+    return width, height, _spilled_bands(source, width, height, band, bgc, antialias)
+
+def _spilled_bands(shapes:Iterable, w:int, h:int, band:int, bg:int,
+                   antialias:bool) -> Iterator[QImage]:
+    # 도형을 한 번만 훑으면서 걸치는 밴드마다 레코드를 임시 파일로 흘려 보낸다
+    nb = (h + band - 1) // band
+    buffers: Dict[int, bytearray] = {}
+    chunks: List[List[Tuple[int, int]]] = [[] for _ in range(nb)]
+    # 밴드마다 걸치는 도형들의 세로 범위 (밴드를 넓혀 그릴 만큼)
+    reach: List[List[int]] = [[b * band, (b + 1) * band - 1] for b in range(nb)]
+    with tempfile.TemporaryFile() as spill:
+        def flush(b:int) -> None:
+            buf = buffers.pop(b)
+            chunks[b].append((spill.tell(), len(buf)))
+            spill.write(buf)
+
+        for z, s in enumerate(shapes):
+            # 밴드 안에서는 z 를 id 로 써서 입력 id 가 겹쳐도 괜찮게 한다
+            rec = shape_record(s, z)
+            rec = RECORD.pack(rec[0], z, *rec[2:])
+            _, y0, _, y1 = _record_bounds(s)
+            for b in range(max(0, y0 // band), min(nb - 1, y1 // band) + 1):
+                r = reach[b]
+                if y0 < r[0]:
+                    r[0] = y0
+                if y1 > r[1]:
+                    r[1] = y1
+                buf = buffers.setdefault(b, bytearray())
+                buf += rec
+                if len(buf) >= _SPILL_FLUSH:
+                    flush(b)
+        for b in list(buffers):
+            flush(b)
+
+        for b in range(nb):
+            y = b * band
+            bh = min(band, h - y)
+            _, py, _, ph = padded_rect((0, y, w, bh), (0, reach[b][0], w - 1, reach[b][1]), h, (w, h))
+            img = QImage(w, ph, QImage.Format_RGB32)
+            img.fill(QColor.fromRgba(bg))
+            store = ShapeStore()
+            for off, n in chunks[b]:
+                spill.seek(off)
+                for rec in RECORD.iter_unpack(spill.read(n)):
+                    store.add_record(rec)
+            chunks[b] = []
+            if len(store):
+                p = QPainter(img)
+                p.setRenderHint(QPainter.Antialiasing, antialias)
+                p.translate(0, -py)
+                BatchPainter(p, store).paint_ids(store.ids)
+                p.end()
+            yield img if ph == bh else img.copy(0, y - py, w, bh)
+
+def _record_bounds(s) -> Tuple[int, int, int, int]:
+    x0, y0, x1, y1 = s.coords()
+    pad = shape_pad(s.width)
+    return min(x0, x1) - pad, min(y0, y1) - pad, max(x0, x1) + pad, max(y0, y1) + pad
+
+def _rgb_rows(img:QImage) -> Iterator[bytes]:
+    rgb = img.convertToFormat(QImage.Format_RGB888)
+    w3, bpl = rgb.width() * 3, rgb.bytesPerLine()
+    ptr = rgb.constBits()
+    ptr.setsize(rgb.sizeInBytes())
+    data = bytes(ptr)
+    for y in range(rgb.height()):
+        yield data[y * bpl:y * bpl + w3]
+
+def _chunk(f:BinaryIO, tag:bytes, data:bytes) -> None:
+    f.write(struct.pack(">I", len(data)))
+    f.write(tag)
+    f.write(data)
+    f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(tag)) & 0xffffffff))
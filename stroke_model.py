@@ -0,0 +1,170 @@
+# stroke_model.py
+from __future__ import annotations
+from array import array
+from itertools import accumulate
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+import math
+import zlib
+
+from PyQt5.QtCore import Qt, QPoint, QRect
+from PyQt5.QtGui import QPainter, QPen, QColor, QPolygon
+
+from color import pack_color
+
+Point = Tuple[int, int]
+
+def stroke_pad(width:int) -> int:
+    # 획이 점들의 경계 상자 밖으로 칠하는 범위. 펜이 SquareCap 이라 끝 모서리가
+    # 점에서 width/2*√2 까지 나가고, 안티앨리어싱 1px 을 더한다
+    return math.ceil(width * math.sqrt(2) / 2) + 1
+
+def simplify(points:Sequence[Point], tolerance:float) -> List[Point]:
+    """Ramer–Douglas–Peucker. 양 끝점은 항상 남기고, 선분에서 tolerance(px) 이내인 점은 버린다."""
+    n = len(points)
+    if n < 3 or tolerance <= 0:
+        return list(points)
+    keep = bytearray(n)
+    keep[0] = keep[-1] = 1
+    tol2 = tolerance * tolerance
+    stack = [(0, n - 1)]
+    while stack:
+        lo, hi = stack.pop()
+        ax, ay = points[lo]
+        bx, by = points[hi]
+        dx, dy = bx - ax, by - ay
+        den = dx*dx + dy*dy
+        best, best_d = -1, tol2
+        for i in range(lo + 1, hi):
+            px, py = points[i]
+            if den == 0:
+                d = (px - ax)**2 + (py - ay)**2
+            else:
+                # 선분까지 거리의 제곱 = (외적)^2 / |ab|^2
+                c = dx * (py - ay) - dy * (px - ax)
+                d = c * c / den
+            if d > best_d:
+                best, best_d = i, d
+        if best >= 0:
+            keep[best] = 1
+            stack.append((lo, best))
+            stack.append((best, hi))
+    return [pt for pt, k in zip(points, keep) if k]
+
+class Stroke:
+    """단순화한 점 열을 델타 인코딩 + zlib 으로 압축해 들고 있는 자유곡선 한 획."""
+    __slots__ = ("color", "width", "bounds", "count", "_data")
+
+    def __init__(self, color:int, width:int, points:Sequence[Point]) -> None:
+        self.color = color
+        self.width = width
+        self.count = len(points)
+        xs = [x for x, _ in points]
+        ys = [y for _, y in points]
+        pad = stroke_pad(width)
+        self.bounds = (min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad)
+        deltas = array("i")
+        px = py = 0
+        for x, y in points:
+            deltas.append(x - px)
+            deltas.append(y - py)
+            px, py = x, y
+        self._data = zlib.compress(deltas.tobytes())
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._data)
+
+    def points(self) -> List[Point]:
+        deltas = array("i")
+        deltas.frombytes(zlib.decompress(self._data))
+        return list(zip(accumulate(deltas[0::2]), accumulate(deltas[1::2])))
+
+    def intersects(self, b:Tuple[int, int, int, int]) -> bool:
+        x0, y0, x1, y1 = self.bounds
+        return x0 <= b[2] and b[0] <= x1 and y0 <= b[3] and b[1] <= y1
+
+    def draw(self, p:QPainter) -> None:
+        p.setPen(QPen(QColor.fromRgba(self.color), self.width, Qt.SolidLine))
+        p.drawPolyline(QPolygon([QPoint(x, y) for x, y in self.points()]))
+
+class FillRegion:
+    """페인트 통으로 채운 영역. 채운 구간 (y, x0, x1) 을 zlib 으로 압축해 든다.
+
+    채운 결과는 그 순간 픽셀에 달려 있으므로 다시 계산하지 않고 구간을 그대로 다시 칠한다.
+    """
+    __slots__ = ("color", "bounds", "count", "_data")
+
+    def __init__(self, color:int, spans) -> None:
+        # spans: flood_fill.Spans (y, x0, x1 int32 배열)
+        self.color = color
+        self.count = len(spans)
+        self.bounds = spans.bounds
+        rows = array("i")
+        for y, x0, x1 in zip(spans.y.tolist(), spans.x0.tolist(), spans.x1.tolist()):
+            rows.extend((y, x0, x1))
+        self._data = zlib.compress(rows.tobytes())
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._data)
+
+    def spans(self) -> List[Tuple[int, int, int]]:
+        rows = array("i")
+        rows.frombytes(zlib.decompress(self._data))
+        return list(zip(rows[0::3], rows[1::3], rows[2::3]))
+
+    def intersects(self, b:Tuple[int, int, int, int]) -> bool:
+        x0, y0, x1, y1 = self.bounds
+        return x0 <= b[2] and b[0] <= x1 and y0 <= b[3] and b[1] <= y1
+
+    def draw(self, p:QPainter) -> None:
+        color = QColor.fromRgba(self.color)
+        for y, x0, x1 in self.spans():
+            p.fillRect(x0, y, x1 - x0 + 1, 1, color)
+
+class StrokeModel:
+    """PaintCanvas 의 획 목록. 그리는 중인 획은 원본 점으로, 끝난 획은 Stroke 로 보관한다.
+
+    픽스맵은 이 모델의 캐시일 뿐이라 어떤 영역이든, 어떤 배율로든 다시 그릴 수 있다.
+    """
+
+    def __init__(self, tolerance:float=0.5) -> None:
+        self.tolerance = tolerance
+        # 끝난 획과 채운 영역을 그린 순서대로
+        self.strokes: List[Union[Stroke, FillRegion]] = []
+        self._live: List[Point] = []
+        self._live_style: Tuple[int, int] = (0, 1)
+
+    def __len__(self) -> int:
+        return len(self.strokes)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(s.nbytes for s in self.strokes)
+
+    def begin(self, color, width:int, pt:Point) -> None:
+        self._live_style = (pack_color(color), width)
+        self._live = [pt]
+
+    def extend(self, points:Iterable[Point]) -> None:
+        self._live.extend(points)
+
+    def end(self) -> Optional[Stroke]:
+        # 점이 하나뿐인(움직이지 않은) 획은 아무것도 그리지 않았으므로 버린다
+        points, self._live = self._live, []
+        if len(points) < 2:
+            return None
+        stroke = Stroke(*self._live_style, simplify(points, self.tolerance))
+        self.strokes.append(stroke)
+        return stroke
+
+    def clear(self) -> None:
+        self.strokes.clear()
+        self._live = []
+
+    def render(self, p:QPainter, rect:Optional[QRect]=None) -> None:
+        # rect 가 있으면 그 영역에 걸치는 획만 그린다 (클리핑은 호출하는 쪽에서)
+        b = None if rect is None else (rect.left(), rect.top(), rect.right(), rect.bottom())
+        for s in self.strokes:
+            if b is None or s.intersects(b):
+                s.draw(p)
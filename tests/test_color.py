@@ -0,0 +1,48 @@
+# tests/test_color.py
+import random
+
+import pytest
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
+
+import color
+from color import pack_color, _parse_hex
+
+_rnd = random.Random(7)
+_HEX = ["#" + "".join(_rnd.choice("0123456789abcdefABCDEF") for _ in range(n))
+        for n in (3, 6, 8) for _ in range(40)]
+_NAMES = ["white", "black", "red", "Blue", "darkGreen", "transparent", "cornflowerblue", "GRAY"]
+_INVALID = ["", "#", "#12", "#1234", "#12345", "#1234567", "#ggg", "#12345g", "#-1234",
+            "#12_345", "# 12345", "#１２３", "nocolor", "rgb(1,2,3)"]
+_TUPLES = [(0, 0, 0), (255, 255, 255), (10, 20, 30), (10, 20, 30, 0), (1, 2, 3, 128),
+           (256, 0, 0), (-1, 0, 0), (0, 0, 0, 300), (12, 300, 5, 7)]
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    color.clear_cache()
+    yield
+    color.clear_cache()
+
+@pytest.mark.parametrize("name", _HEX + _NAMES + _INVALID)
+def test_string_matches_qcolor(name):
+    assert pack_color(name) == QColor(name).rgba()
+
+@pytest.mark.parametrize("h", _HEX)
+def test_parse_hex_matches_qcolor(h):
+    assert _parse_hex(h[1:]) == QColor(h).rgba()
+
+@pytest.mark.parametrize("h", _INVALID)
+def test_parse_hex_leaves_invalid_to_qcolor(h):
+    if h[:1] == "#":
+        assert _parse_hex(h[1:]) is None
+
+@pytest.mark.parametrize("t", _TUPLES)
+def test_tuple_matches_qcolor(t):
+    assert pack_color(t) == QColor(*t).rgba()
+    assert pack_color(list(t)) == QColor(*t).rgba()
+
+def test_other_forms():
+    assert pack_color(None) is None
+    assert pack_color(QColor(1, 2, 3, 4)) == QColor(1, 2, 3, 4).rgba()
+    assert pack_color(Qt.red) == QColor(Qt.red).rgba()
+    assert pack_color(0x80112233) == 0x80112233
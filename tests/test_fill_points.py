@@ -0,0 +1,32 @@
+# tests/test_fill_points.py
+import pytest
+
+pytest.importorskip("numpy")
+
+from PyQt5.QtGui import QColor
+
+from canvas_core import CanvasCore
+
+def _three_rects():
+    core = CanvasCore(100, 40)
+    ids = [core.add_rect((x, 0), (x + 20, 20), "black", 1) for x in (0, 30, 60)]
+    return core, ids, [(10, 10), (40, 10), (70, 10)]
+
+def _fills(core, ids):
+    return [core.store.view(sid).fill.rgba() for sid in ids]
+
+def test_tuple_is_one_color():
+    core, ids, pts = _three_rects()
+    core.set_fill_at_points(pts, (10, 20, 30))
+    assert _fills(core, ids) == [QColor(10, 20, 30).rgba()] * 3
+
+def test_list_of_three_ints_is_per_point():
+    core, ids, pts = _three_rects()
+    core.set_fill_at_points(pts, [0xff0000ff, 0xff00ff00, 0xffff0000])
+    assert _fills(core, ids) == [0xff0000ff, 0xff00ff00, 0xffff0000]
+
+def test_array_is_per_point():
+    np = pytest.importorskip("numpy")
+    core, ids, pts = _three_rects()
+    core.set_fill_at_points(np.array(pts), np.array([1, 2, 3], np.uint32) | 0xff000000)
+    assert _fills(core, ids) == [0xff000001, 0xff000002, 0xff000003]
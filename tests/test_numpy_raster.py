@@ -0,0 +1,41 @@
+# tests/test_numpy_raster.py
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from canvas_core import CanvasCore
+import numpy_raster
+
+def _scene(backend, n=6000, w=600, h=400, seed=3, antialias=None):
+    core = CanvasCore(w, h, backend=backend, antialias=antialias)
+    rnd = random.Random(seed)
+    colors = ["blue", "green", (255, 0, 0, 120), None]
+    for i in range(n):
+        x, y = rnd.randrange(-20, w + 20), rnd.randrange(-20, h + 20)
+        p2 = (x + rnd.randint(-30, 30), y + rnd.randint(-30, 30))
+        kind = ("rect", "ellipse", "line", "triangle")[i % 4]
+        if kind == "line":
+            core.add_line((x, y), p2, rnd.choice(["black", (0, 0, 0, 90)]), rnd.randint(1, 5))
+        else:
+            getattr(core, "add_" + kind)((x, y), p2, "red", rnd.randint(1, 5), rnd.choice(colors))
+    return core
+
+def test_exact_backend_matches_qpainter():
+    ref = _scene("qpainter", antialias=False)
+    ref.render(full=True)
+    exact = _scene("numpy_exact")
+    exact.render(full=True)
+    assert exact.image == ref.image
+
+def test_cross_check_rects_and_ellipses_exact():
+    core = _scene("qpainter", antialias=False)
+    diff = numpy_raster.cross_check(core.store, 600, 400)
+    assert diff["rect"] == 0 and diff["ellipse"] == 0
+
+@pytest.mark.parametrize("backend", ["numpy", "numpy_exact"])
+def test_numpy_backend_rejects_antialias(backend):
+    assert CanvasCore(10, 10, backend=backend).antialias is False
+    with pytest.raises(ValueError):
+        CanvasCore(10, 10, backend=backend, antialias=True)
@@ -0,0 +1,35 @@
+# tests/test_stream_export.py
+import random
+
+import pytest
+from PyQt5.QtGui import QImage
+
+from canvas_core import CanvasCore
+import stream_export
+
+def _tall_scene(antialias, n=1500, w=400, h=400, span=150, seed=2):
+    # 밴드(64)보다 두 배 넘게 긴 도형이 많은 장면
+    core = CanvasCore(w, h, antialias=antialias)
+    rnd = random.Random(seed)
+    for i in range(n):
+        x, y = rnd.randrange(w), rnd.randrange(h)
+        p2 = (x + rnd.randint(-span, span), y + rnd.randint(-span, span))
+        kind = ("rect", "ellipse", "line", "triangle")[i % 4]
+        if kind == "line":
+            core.add_line((x, y), p2, "black", rnd.randint(1, 6))
+        else:
+            getattr(core, "add_" + kind)((x, y), p2, "red", rnd.randint(1, 6),
+                                         rnd.choice(["blue", None, (0, 200, 0, 120)]))
+    core.render(full=True)
+    return core
+
+@pytest.mark.parametrize("antialias", [False, True])
+@pytest.mark.parametrize("source", ["core", "shapes"])
+def test_bands_have_no_seams(tmp_path, antialias, source):
+    core = _tall_scene(antialias)
+    path = str(tmp_path / "out.ppm")
+    if source == "core":
+        stream_export.export_ppm(path, core, band=64)
+    else:
+        stream_export.export_ppm(path, list(core.shapes), 400, 400, band=64, antialias=antialias)
+    assert QImage(path).convertToFormat(QImage.Format_RGB32) == core.image
@@ -0,0 +1,50 @@
+# tests/test_viewport.py
+import random
+
+import pytest
+
+from canvas_core import CanvasCore
+from viewport import Viewport
+import viewport
+
+def _scene(n=20000, w=800, h=600, seed=1):
+    core = CanvasCore(w, h)
+    rnd = random.Random(seed)
+    for i in range(n):
+        x, y = rnd.randrange(w), rnd.randrange(h)
+        p2 = (x + rnd.randint(-40, 40), y + rnd.randint(-40, 40))
+        kind = ("rect", "ellipse", "line", "triangle")[i % 4]
+        if kind == "line":
+            core.add_line((x, y), p2, "black", rnd.randint(1, 3))
+        else:
+            getattr(core, "add_" + kind)((x, y), p2, "red", rnd.randint(1, 3),
+                                         rnd.choice(["blue", "green", None]))
+    return core
+
+def test_identity_view_matches_render():
+    plain = _scene()
+    plain.render(full=True)
+    viewed = _scene()
+    viewed.set_view(Viewport())
+    viewed.render()
+    assert viewed.image == plain.image
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_placeholders_stay_under_covering_shape(monkeypatch, use_numpy):
+    # 축소하면 작은 빨간 사각형은 자리표시가 되지만, 위를 덮은 파란 사각형 밖으로 새면 안 된다
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(viewport, "np", None)
+    core = CanvasCore(400, 400)
+    rnd = random.Random(2)
+    for _ in range(3000):
+        x, y = rnd.randrange(100, 2000), rnd.randrange(100, 2000)
+        core.add_rect((x, y), (x + 8, y + 8), "red", 1, "red")
+    core.add_rect((0, 0), (2400, 2400), "blue", 2, "blue")
+    core.set_view(Viewport(0.15))
+    core.render()
+    img = core.image
+    red = sum(1 for y in range(img.height()) for x in range(img.width())
+              if img.pixel(x, y) == 0xffff0000)
+    assert red == 0
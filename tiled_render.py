@@ -0,0 +1,110 @@
+# tiled_render.py
+from __future__ import annotations
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+import multiprocessing
+import os
+
+from PyQt5.QtGui import QImage, QPainter, QColor
+
+from paint_batch import BatchPainter
+from shape_store import ShapeStore
+from spatial_index import Bounds, GridIndex
+
+TileRect = Tuple[int, int, int, int]  # x, y, w, h
+
+def tile_rects(width:int, height:int, tile:int) -> List[TileRect]:
+    return [(x, y, min(tile, width - x), min(tile, height - y))
+            for y in range(0, height, tile) for x in range(0, width, tile)]
+
+def padded_rect(rect:TileRect, reach:Bounds, pad:int, size:Tuple[int, int]) -> TileRect:
+    """rect 를 reach(걸치는 도형들의 경계 상자 합)까지, 방향마다 최대 pad 만큼 넓힌다 (이미지 안으로).
+
+    QPainter 는 장치 가장자리에 걸친 도형을 잘라서 래스터화하므로 가장자리 픽셀이
+    통째로 그렸을 때와 조금 달라진다. 걸치는 도형이 모두 들어가게 넓혀 그린 뒤 잘라 내면
+    render() 와 같아진다 (pad 보다 멀리 나가는 큰 도형은 예외).
+    """
+    x, y, w, h = rect
+    x0 = max(min(x, reach[0]), x - pad, 0)
+    y0 = max(min(y, reach[1]), y - pad, 0)
+    x1 = min(max(x + w, reach[2] + 1), x + w + pad, size[0])
+    y1 = min(max(y + h, reach[3] + 1), y + h + pad, size[1])
+    return x0, y0, x1 - x0, y1 - y0
+
+def render_tile(store:ShapeStore, index:GridIndex, rect:TileRect, bg:int, antialias:bool,
+                pad:int=0, size:Optional[Tuple[int, int]]=None) -> QImage:
+    # 타일 하나를 자기 QImage 에 그린다. 타일에 걸치지 않는 도형은 인덱스에서 걸러진다.
+    # pad 를 주면 이미지 크기 size 안에서 타일을 넓혀 그리고 잘라 낸다 (padded_rect)
+    x, y, w, h = rect
+    ids = index.query_rect((x, y, x + w - 1, y + h - 1))
+    px, py, pw, ph = rect
+    if pad and ids:
+        bounds = store.bounds
+        boxes = [bounds(sid) for sid in ids]
+        reach = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                 max(b[2] for b in boxes), max(b[3] for b in boxes))
+        px, py, pw, ph = padded_rect(rect, reach, pad, size)
+    img = QImage(pw, ph, QImage.Format_RGB32)
+    img.fill(QColor.fromRgba(bg))
+    if ids:
+        z, row = store.z, store.row
+        ids.sort(key=lambda sid: z[row(sid)])
+        p = QPainter(img)
+        p.setRenderHint(QPainter.Antialiasing, antialias)
+        p.translate(-px, -py)
+        BatchPainter(p, store).paint_ids(ids)
+        p.end()
+    if (pw, ph) != (w, h):
+        img = img.copy(x - px, y - py, w, h)
+    return img
+
+def iter_tiles(core, tile:int=512, workers:Optional[int]=None,
+               processes:bool=False) -> Iterator[Tuple[TileRect, QImage]]:
+    """타일을 풀에서 병렬로 그려 (rect, QImage) 를 행 우선 순서로 내보낸다.
+
+    스레드 풀은 QPainter 호출 동안 GIL 이 풀리는 것에 기대고, ``processes=True`` 는
+    도형 저장소를 워커마다 한 번 넘겨 완전히 별도 프로세스에서 그린다.
+    타일은 걸치는 도형이 다 들어가게 (방향마다 최대 ``tile`` 만큼) 넓혀 그린 뒤 잘라 내므로
+    결과는 render() 와 같다. 타일보다 더 멀리 나가는 도형만 가장자리 픽셀이 다를 수 있다.
+    """
+    size = (core.image.width(), core.image.height())
+    rects = tile_rects(size[0], size[1], tile)
+    workers = workers or os.cpu_count() or 1
+    bg = core._bg.rgba()
+    if processes:
+        pool: Executor = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker,
+            initargs=(core.store, core.index.cell, bg, core.antialias, tile, size))
+        with pool:
+            for rect, data, bpl in pool.map(_worker_tile, rects):
+                yield rect, QImage(data, rect[2], rect[3], bpl, QImage.Format_RGB32).copy()
+    else:
+        store, index = core.store, core.index
+        with ThreadPoolExecutor(workers) as pool:
+            yield from zip(rects, pool.map(
+                lambda r: render_tile(store, index, r, bg, core.antialias, tile, size), rects))
+
+def render_tiled(core, tile:int=512, workers:Optional[int]=None, processes:bool=False,
+                 out:Optional[QImage]=None) -> QImage:
+    out = core.image if out is None else out
+    p = QPainter(out)
+    for (x, y, _, _), img in iter_tiles(core, tile, workers, processes):
+        p.drawImage(x, y, img)
+    p.end()
+    return out
+
+_worker: dict = {}
+
+def _init_worker(store:ShapeStore, cell:int, bg:int, antialias:bool, pad:int,
+                 size:Tuple[int, int]) -> None:
+    index = GridIndex(cell, bounds_of=store.bounds)
+    for sid in store:
+        index.insert(sid, store.bounds(sid))
+    _worker.update(store=store, index=index, bg=bg, antialias=antialias, pad=pad, size=size)
+
+def _worker_tile(rect:TileRect) -> Tuple[TileRect, bytes, int]:
+    w = _worker
+    img = render_tile(w["store"], w["index"], rect, w["bg"], w["antialias"], w["pad"], w["size"])
+    ptr = img.constBits()
+    ptr.setsize(img.sizeInBytes())
+    return rect, bytes(ptr), img.bytesPerLine()
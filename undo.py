@@ -0,0 +1,162 @@
+# undo.py
+from __future__ import annotations
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+import zlib
+
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QImage, QPainter
+
+DEFAULT_BUDGET = 32 << 20
+TILE = 64
+
+class Command:
+    """undo 기록 하나. 하위 클래스가 undo/redo 와 대략의 메모리 크기를 정한다."""
+    nbytes = 0
+
+    def undo(self) -> None:
+        raise NotImplementedError
+
+    def redo(self) -> None:
+        raise NotImplementedError
+
+class UndoStack:
+    """메모리 예산이 있는 undo/redo 기록.
+
+    전체 크기가 ``budget`` 을 넘으면 가장 오래된 기록부터 버린다. undo/redo 비용은
+    기록 하나의 크기에만 비례한다 (캔버스 크기와 무관).
+    """
+
+    def __init__(self, budget:int=DEFAULT_BUDGET) -> None:
+        self.budget = budget
+        self._undo: Deque[Command] = deque()
+        self._redo: List[Command] = []
+        self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._undo)
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def push(self, cmd:Command) -> None:
+        # 새 작업이 들어오면 redo 기록은 무효
+        for old in self._redo:
+            self.nbytes -= old.nbytes
+        self._redo.clear()
+        self._undo.append(cmd)
+        self.nbytes += cmd.nbytes
+        self._evict()
+
+    def undo(self) -> bool:
+        if not self._undo:
+            return False
+        cmd = self._undo.pop()
+        cmd.undo()
+        self._redo.append(cmd)
+        return True
+
+    def redo(self) -> bool:
+        if not self._redo:
+            return False
+        cmd = self._redo.pop()
+        cmd.redo()
+        self._undo.append(cmd)
+        return True
+
+    def clear(self) -> None:
+        self._undo.clear()
+        self._redo.clear()
+        self.nbytes = 0
+
+    def _evict(self) -> None:
+        while self.nbytes > self.budget and self._undo:
+            self.nbytes -= self._undo.popleft().nbytes
+
+class TileDelta(Command):
+    """래스터(QImage/QPixmap)에서 바뀐 타일만 zlib 으로 압축해 전/후를 보관한다.
+
+    그리기 전에 ``touch(rect)`` 로 칠할 영역의 타일을 (처음 한 번만) 떠 두고,
+    다 그린 뒤 ``finish()`` 로 같은 타일의 결과를 뜬다. 바뀌지 않은 타일은 버린다.
+    """
+
+    def __init__(self, device, tile:int=TILE, on_undo:Optional[Callable[[], None]]=None,
+                 on_redo:Optional[Callable[[], None]]=None,
+                 on_apply:Optional[Callable[[QRect], None]]=None) -> None:
+        self.device = device
+        self.tile = tile
+        self.on_undo, self.on_redo, self.on_apply = on_undo, on_redo, on_apply
+        self._before: Dict[Tuple[int, int], bytes] = {}
+        self._after: Dict[Tuple[int, int], bytes] = {}
+        self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._after)
+
+    def touch(self, rect:QRect) -> None:
+        rect = rect.intersected(self.device.rect())
+        if rect.isEmpty():
+            return
+        t = self.tile
+        for ty in range(rect.top() // t, rect.bottom() // t + 1):
+            for tx in range(rect.left() // t, rect.right() // t + 1):
+                if (tx, ty) not in self._before:
+                    self._before[(tx, ty)] = self._grab(tx, ty)
+
+    def finish(self) -> "TileDelta":
+        for key, before in list(self._before.items()):
+            after = self._grab(*key)
+            if after == before:
+                del self._before[key]
+            else:
+                self._after[key] = after
+        self.nbytes = sum(map(len, self._before.values())) + sum(map(len, self._after.values()))
+        return self
+
+    def bounds(self) -> QRect:
+        out = QRect()
+        for key in self._after:
+            out = out.united(self._tile_rect(*key))
+        return out
+
+    def undo(self) -> None:
+        self._apply(self._before)
+        if self.on_undo is not None:
+            self.on_undo()
+
+    def redo(self) -> None:
+        self._apply(self._after)
+        if self.on_redo is not None:
+            self.on_redo()
+
+    def _tile_rect(self, tx:int, ty:int) -> QRect:
+        t = self.tile
+        return QRect(tx * t, ty * t, t, t).intersected(self.device.rect())
+
+    def _grab(self, tx:int, ty:int) -> bytes:
+        img = self.device.copy(self._tile_rect(tx, ty))
+        if not isinstance(img, QImage):
+            img = img.toImage()
+        img = img.convertToFormat(QImage.Format_ARGB32)
+        ptr = img.constBits()
+        ptr.setsize(img.sizeInBytes())
+        return zlib.compress(bytes(ptr), 1)
+
+    def _apply(self, tiles:Dict[Tuple[int, int], bytes]) -> None:
+        p = QPainter(self.device)
+        p.setCompositionMode(QPainter.CompositionMode_Source)
+        dirty = QRect()
+        for key, data in tiles.items():
+            r = self._tile_rect(*key)
+            raw = zlib.decompress(data)
+            img = QImage(raw, r.width(), r.height(), r.width() * 4, QImage.Format_ARGB32)
+            p.drawImage(r.topLeft(), img)
+            dirty = dirty.united(r)
+        p.end()
+        if self.on_apply is not None and not dirty.isEmpty():
+            self.on_apply(dirty)
@@ -0,0 +1,354 @@
+# viewport.py
+"""확대/이동 가능한 CanvasCore 보기: 월드 -> 이미지 변환, 보이지 않는 도형 걸러내기, 크기별 LOD.
+
+보기 배율에서 도형의 화면 크기(경계 상자의 긴 변 + 선 두께)가
+  - ``dot_px`` 미만이면 가운데 픽셀 하나 (채우기 색, 없으면 선 색),
+  - ``lod_px`` 미만이면 선 없이 채운 경계 사각형,
+  - 그 이상이면 원래 모양
+으로 그린다. 원래 모양으로 그릴 도형이 ``max_detail`` 개를 넘으면 큰 것부터 그만큼만
+그리고 나머지는 그 프레임에서 건너뛰어, 축소했을 때도 한 프레임 비용이 묶여 있게 한다
+(화면에서 큰 도형을 사각형으로 바꾸면 위에 있는 도형을 가리고 칠할 픽셀도 많다).
+LOD 와 ``max_detail`` 은 축소(배율 < 1)했을 때만 쓴다 - 1:1 이상에서는 보이는 도형을 모두
+원래 모양으로 그려 보통 ``render()`` 와 같은 그림이 된다.
+안티앨리어싱은 배율이 ``aa_scale`` 이상일 때만 켠다.
+
+NumPy 가 있으면 분류를 배열 연산 한 번으로 하고, 원래 모양을 z 순서대로 모두 그린 뒤
+자리표시는 이미지 버퍼에 한꺼번에 쓴다. 이때 원래 모양들을 z 순위 색으로 한 번 더 그린
+덮개 버퍼를 보고, 자기보다 위의 원래 모양이 불투명하게 덮은 픽셀에는 쓰지 않는다.
+없으면 (공간 인덱스로 줄인) 후보 도형을 하나씩 분류하고, 원래 모양과 자리표시를 z 순서대로
+번갈아 QPainter 로 그린다.
+"""
+from __future__ import annotations
+from array import array
+from typing import Callable, List, Optional, Sequence, Tuple
+import math
+
+from PyQt5.QtCore import Qt, QPoint, QRect
+from PyQt5.QtGui import QImage, QPainter, QColor, QPen, QPolygon, QTransform
+
+from paint_batch import BatchPainter, FrameStats, StyleCache
+from shape_store import LINE, RECT, TRIANGLE, TYPECODES, ShapeStore, ellipse_path, triangle_points
+from spatial_index import Bounds
+
+try:
+    import numpy as np
+except ImportError:  # numpy 는 선택 의존성 - 없으면 도형마다 Python 으로 분류한다
+    np = None
+
+_OPAQUE = 0xff000000
+
+class Viewport:
+    """배율과 이미지 왼쪽 위의 월드 좌표. 바꾸지 않고 ``panned``/``zoomed`` 로 새로 만든다."""
+    __slots__ = ("scale", "ox", "oy", "dot_px", "lod_px", "aa_scale", "max_detail")
+
+    def __init__(self, scale:float=1.0, ox:float=0.0, oy:float=0.0, dot_px:float=1.0,
+                 lod_px:float=4.0, aa_scale:float=0.75, max_detail:Optional[int]=10000) -> None:
+        if not scale > 0:
+            raise ValueError(f"scale must be positive, got {scale}")
+        self.scale = float(scale)
+        self.ox = float(ox)
+        self.oy = float(oy)
+        self.dot_px = dot_px
+        self.lod_px = lod_px
+        self.aa_scale = aa_scale
+        self.max_detail = max_detail
+
+    def _key(self) -> tuple:
+        return (self.scale, self.ox, self.oy, self.dot_px, self.lod_px, self.aa_scale,
+                self.max_detail)
+
+    def __repr__(self) -> str:
+        return f"Viewport(scale={self.scale:g}, ox={self.ox:g}, oy={self.oy:g})"
+
+    def __eq__(self, other:object) -> bool:
+        if not isinstance(other, Viewport):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def _replace(self, scale:float, ox:float, oy:float) -> "Viewport":
+        return Viewport(scale, ox, oy, self.dot_px, self.lod_px, self.aa_scale, self.max_detail)
+
+    def panned(self, dx:float, dy:float) -> "Viewport":
+        # 화면에서 내용이 (dx, dy) px 만큼 움직인다
+        return self._replace(self.scale, self.ox - dx / self.scale, self.oy - dy / self.scale)
+
+    def zoomed(self, factor:float, anchor:Tuple[float, float]=(0.0, 0.0)) -> "Viewport":
+        # anchor(화면 좌표) 아래의 월드 점이 제자리에 남도록
+        sx, sy = anchor
+        wx, wy = self.to_world(sx, sy)
+        scale = self.scale * factor
+        return self._replace(scale, wx - sx / scale, wy - sy / scale)
+
+    def to_world(self, sx:float, sy:float) -> Tuple[float, float]:
+        return self.ox + sx / self.scale, self.oy + sy / self.scale
+
+    def to_screen(self, x:float, y:float) -> Tuple[float, float]:
+        return (x - self.ox) * self.scale, (y - self.oy) * self.scale
+
+    def world_rect(self, width:int, height:int) -> Bounds:
+        # width x height 이미지에 보이는 월드 영역 (양 끝 포함)
+        x1, y1 = self.to_world(width, height)
+        return math.floor(self.ox), math.floor(self.oy), math.ceil(x1), math.ceil(y1)
+
+    def transform(self) -> QTransform:
+        s = self.scale
+        return QTransform(s, 0, 0, s, -self.ox * s, -self.oy * s)
+
+    def antialias(self, on:bool) -> bool:
+        return on and self.scale >= self.aa_scale
+
+def paint_view(image:QImage, store:ShapeStore, rows:Sequence[int], view:Viewport, bg:QColor,
+               antialias:bool, styles:Optional[StyleCache]=None,
+               stop:Optional[Callable[[], bool]]=None,
+               table:Optional[LodTable]=None) -> Optional[FrameStats]:
+    """rows(z 오름차순 후보 행)를 view 로 image 에 그린다. stop() 이 참이 되면 None.
+
+    ``table`` 은 같은 store/rows 로 만든 LodTable (NumPy 가 있을 때, 없으면 여기서 만든다).
+    돌려주는 FrameStats.shapes 는 실제로 그린 (자리표시 포함) 도형 수다.
+    """
+    image.fill(bg)
+    w, h = image.width(), image.height()
+    if np is None:
+        return _paint_runs(image, store, _classify(store, rows, view, w, h), view, antialias,
+                           styles, stop)
+    if table is None:
+        table = LodTable(store, rows)
+    full, ranks, lod = _classify_np(table, view, w, h)
+    p = QPainter(image)
+    p.setRenderHint(QPainter.Antialiasing, view.antialias(antialias))
+    p.setTransform(view.transform())
+    batch = BatchPainter(p, store, styles)
+    for i in range(0, len(full), _CHUNK):
+        if stop is not None and stop():
+            p.end()
+            return None
+        batch.paint_rows(full[i:i + _CHUNK])
+    p.end()
+    stats = batch.stats
+    if lod is not None:
+        # 자리표시는 원래 모양들을 다 그린 뒤에 쓰므로, 자기보다 위에 있는 원래 모양이
+        # 불투명하게 덮은 픽셀은 건너뛴다
+        above = ranks > lod[4].min() if len(ranks) else ranks
+        cover = None
+        if above.any() and len(table) < _MAX_RANK:
+            cover = _cover(store, [r for r, a in zip(full, above.tolist()) if a], ranks[above],
+                           view, w, h)
+        stats.shapes += _put_rects(image, *lod, cover=cover)
+        stats.draw_calls += 1
+    return stats
+
+def _paint_runs(image:QImage, store:ShapeStore, runs:list, view:Viewport, antialias:bool,
+                styles:Optional[StyleCache], stop:Optional[Callable[[], bool]]) -> Optional[FrameStats]:
+    # NumPy 없는 경로: 원래 모양/상자/점 구간을 z 순서대로 QPainter 로 그린다
+    aa = view.antialias(antialias)
+    p = QPainter(image)
+    p.setRenderHint(QPainter.Antialiasing, aa)
+    p.setTransform(view.transform())
+    batch = BatchPainter(p, store, styles)
+    stats = batch.stats
+    for kind, items in runs:
+        if stop is not None and stop():
+            p.end()
+            return None
+        if kind == "full":
+            batch.paint_rows(items)
+        elif kind == "box":
+            p.setRenderHint(QPainter.Antialiasing, False)
+            batch.paint_boxes(items)
+            p.setRenderHint(QPainter.Antialiasing, aa)
+        else:
+            # 점은 화면 좌표. save/restore 로 BatchPainter 가 아는 펜/브러시 상태를 되돌린다
+            p.save()
+            p.resetTransform()
+            for color, points in items.items():
+                p.setPen(QPen(QColor.fromRgba(color), 1))
+                p.drawPoints(QPolygon(points))
+                stats.shapes += len(points)
+                stats.draw_calls += 1
+            p.restore()
+    p.end()
+    return stats
+
+# 원래 모양을 그리는 동안 이 행 수마다 취소 여부를 확인한다
+_CHUNK = 16384
+# 덮개 버퍼는 z 순위 + 1 을 RGB 24비트에 담는다
+_MAX_RANK = 1 << 24
+
+def _cover(store:ShapeStore, rows:List[int], ranks:"np.ndarray", view:Viewport, w:int,
+           h:int) -> "np.ndarray":
+    # 원래 모양 도형들을 (z 순위 + 1) 색으로 안티앨리어싱 없이 z 순서대로 그린 (h, w) 배열.
+    # 불투명한 선/채우기만 그리므로 픽셀 값은 그 픽셀을 가리는 가장 위 도형의 순위 + 1
+    from numpy_raster import image_array
+    image = QImage(w, h, QImage.Format_RGB32)
+    image.fill(0)
+    p = QPainter(image)
+    p.setTransform(view.transform())
+    kind, x0, y0, x1, y1 = store.kind, store.x0, store.y0, store.x1, store.y1
+    stroke, width, fill, has_fill = store.stroke, store.width, store.fill, store.has_fill
+    for r, k in zip(rows, ranks.tolist()):
+        c = QColor.fromRgba(_OPAQUE | (k + 1))
+        p.setPen(QPen(c, width[r], Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+                 if stroke[r] >= _OPAQUE else Qt.NoPen)
+        p.setBrush(c if has_fill[r] and fill[r] >= _OPAQUE and kind[r] != LINE else Qt.NoBrush)
+        if kind[r] == RECT:
+            p.drawRect(x0[r], y0[r], x1[r] - x0[r], y1[r] - y0[r])
+        elif kind[r] == LINE:
+            p.drawLine(x0[r], y0[r], x1[r], y1[r])
+        elif kind[r] == TRIANGLE:
+            p.drawPolygon(QPolygon([QPoint(x, y) for x, y in triangle_points(x0[r], y0[r], x1[r], y1[r])]))
+        else:
+            p.drawPath(ellipse_path(QRect(x0[r], y0[r], x1[r] - x0[r], y1[r] - y0[r])))
+    p.end()
+    return (image_array(image) & 0xffffff).astype(np.int32)
+
+class LodTable:
+    """보기 렌더용 장면 표 (NumPy). 도형의 경계 상자, 크기, 자리표시 색을 공간 순서(위쪽부터)로 든다.
+
+    장면이 바뀔 때만 다시 만들면 되고, 이동/확대 프레임은 이 표에서 비교 몇 번으로 분류한다.
+    공간 순서라 보이는 도형들이 이미지 버퍼의 가까운 곳에 모여 자리표시 쓰기도 빠르다.
+    """
+
+    def __init__(self, store:ShapeStore, rows:Sequence[int]) -> None:
+        order = np.frombuffer(rows, np.int32) if isinstance(rows, array) else np.asarray(rows, np.int32)
+        col = lambda name: np.frombuffer(getattr(store, name), TYPECODES[name])[order] \
+            if len(order) else np.zeros(0, TYPECODES[name])
+        x0, y0, x1, y1 = (col(k) for k in ("x0", "y0", "x1", "y1"))
+        lx, hx = np.minimum(x0, x1), np.maximum(x0, x1)
+        ly, hy = np.minimum(y0, y1), np.maximum(y0, y1)
+        width = col("width").astype(np.int32)
+        pad = (width >> 1) + 2
+        # 자리표시 색은 z 순서 그대로 둔다 (z 순위로 찾는다)
+        self.color = np.where(col("has_fill") != 0, col("fill"), col("stroke")) | np.uint32(_OPAQUE)
+        s = np.argsort(ly, kind="stable")
+        self.z = s.astype(np.int32)
+        self.rows = order[s]
+        self.lx, self.hx, self.ly, self.hy = lx[s], hx[s], ly[s], hy[s]
+        self.bx0, self.bx1 = (lx - pad)[s], (hx + pad)[s]
+        self.by0, self.by1 = (ly - pad)[s], (hy + pad)[s]
+        self.ext = (np.maximum(hx - lx, hy - ly) + width)[s]
+
+    def __len__(self) -> int:
+        return len(self.z)
+
+def _classify_np(t:LodTable, view:Viewport, w:int, h:int):
+    # 보이는 도형을 화면 크기로 나눈다: 원래 모양은 z 순서의 저장소 행과 그 z 순위,
+    # 자리표시는 화면 사각형(양 끝 포함)과 z 순위
+    vx0, vy0, vx1, vy1 = view.world_rect(w, h)
+    vis = np.flatnonzero((t.bx0 <= vx1) & (t.bx1 >= vx0) & (t.by0 <= vy1) & (t.by1 >= vy0))
+    s, ox, oy = view.scale, view.ox, view.oy
+    if s >= 1 or not len(vis):
+        # 1:1 이상으로는 모두 원래 모양 (보통 보기와 같은 그림)
+        f = vis[np.argsort(t.z[vis])]
+        return t.rows[f].tolist(), t.z[f], None
+    ext = t.ext[vis]
+    small = ext < view.lod_px / s
+    f = vis[~small]
+    budget = view.max_detail
+    if budget is not None and len(f) > budget:
+        # 큰 것부터 budget 개만 남기고 나머지는 건너뛴다 (크기가 같으면 위에 있는 것부터)
+        f = f[np.lexsort((-t.z[f], -t.ext[f]))[:budget]]
+    f = f[np.argsort(t.z[f])]
+    full, ranks = t.rows[f].tolist(), t.z[f]
+    d = vis[small]
+    if not len(d):
+        return full, ranks, None
+    dot = ext[small] < view.dot_px / s
+    # 점은 가운데 한 픽셀, 상자는 경계 사각형이 덮는 픽셀들
+    lx, hx = t.lx[d].astype(np.float64), t.hx[d].astype(np.float64)
+    ly, hy = t.ly[d].astype(np.float64), t.hy[d].astype(np.float64)
+    cx, cy = (lx + hx) * 0.5, (ly + hy) * 0.5
+    sx0 = np.floor((np.where(dot, cx, lx) - ox) * s).astype(np.int64)
+    sx1 = np.floor((np.where(dot, cx, hx) - ox) * s).astype(np.int64)
+    sy0 = np.floor((np.where(dot, cy, ly) - oy) * s).astype(np.int64)
+    sy1 = np.floor((np.where(dot, cy, hy) - oy) * s).astype(np.int64)
+    return full, ranks, (sx0, sy0, sx1, sy1, t.z[d], t.color)
+
+# 이 크기(px) 이하의 자리표시는 사각형 안 위치별로 한 번에 칠한다
+_SMALL_RECT = 16
+
+def _put_rects(image:QImage, x0:"np.ndarray", y0:"np.ndarray", x1:"np.ndarray", y1:"np.ndarray",
+               z:"np.ndarray", color:"np.ndarray", cover:Optional["np.ndarray"]=None) -> int:
+    # 작은 사각형들을 이미지 버퍼에 바로 칠한다. 겹치는 픽셀은 z 순위가 가장 높은 것,
+    # 색은 color[z 순위]. cover(_cover 결과)가 있으면 더 위의 원래 모양이 덮은 픽셀은 둔다
+    from numpy_raster import image_array
+    a = image_array(image)
+    h, w = a.shape
+    keep = (x1 >= 0) & (x0 < w) & (y1 >= 0) & (y0 < h)
+    x0, x1 = np.clip(x0[keep], 0, w - 1), np.clip(x1[keep], 0, w - 1)
+    y0, y1 = np.clip(y0[keep], 0, h - 1), np.clip(y1[keep], 0, h - 1)
+    ids = z[keep] + 1
+    n = len(ids)
+    if not n:
+        return 0
+    cw = (x1 - x0 + 1).astype(np.int32)
+    ch = (y1 - y0 + 1).astype(np.int32)
+    start = (y0 * w + x0).astype(np.int32)
+    # 픽셀마다 가장 높은 z 순위 + 1 (0 은 비어 있음)
+    owner = np.zeros(h * w, np.int32)
+    big = (cw > _SMALL_RECT) | (ch > _SMALL_RECT)
+    if big.any():
+        # 큰 사각형은 (lod_px 가 클 때만 생긴다) 이미지 조각에 바로 쓴다
+        grid = owner.reshape(h, w)
+        b = np.flatnonzero(big)
+        for bx0, by0, bx1, by1, i in zip(x0[b].tolist(), y0[b].tolist(), x1[b].tolist(),
+                                         y1[b].tolist(), ids[b].tolist()):
+            cell = grid[by0:by1 + 1, bx0:bx1 + 1]
+            np.maximum(cell, i, out=cell)
+        keep = ~big
+        cw, ch, start, ids = cw[keep], ch[keep], start[keep], ids[keep]
+    # 사각형 안 위치 (dx, dy) 마다 그 위치를 덮는 사각형들을 한 번에. 너비 내림차순으로
+    # 두면 행 dy 를 덮는 것들만 고른 뒤 dx 열을 덮는 것은 앞부분 조각이다
+    # (너비는 _SMALL_RECT 이하라 uint8 키로 정렬하면 기수 정렬이 된다)
+    order = np.argsort((_SMALL_RECT - cw).astype(np.uint8), kind="stable")
+    start, cw, ch, ids = start[order], cw[order], ch[order], ids[order]
+    dy = 0
+    while len(ids):
+        s = start + dy * w
+        neg = -cw
+        for dx in range(int(cw[0])):
+            k = int(np.searchsorted(neg, -dx))
+            np.maximum.at(owner, s[:k] + dx, ids[:k])
+        dy += 1
+        m = ch > dy
+        start, cw, ch, ids = start[m], cw[m], ch[m], ids[m]
+    owner = owner.reshape(h, w)
+    np.copyto(a, color[owner - 1], where=owner > (0 if cover is None else cover))
+    return n
+
+def _classify(store:ShapeStore, rows:Sequence[int], view:Viewport, w:int, h:int) -> list:
+    # 보이는 도형을 나눠 z 순서의 구간 목록으로: ("full", 행들), ("box", 행들),
+    # ("dot", {색: 화면 점들})
+    x0, y0, x1, y1 = store.x0, store.y0, store.x1, store.y1
+    width, stroke, fill, has_fill = store.width, store.stroke, store.fill, store.has_fill
+    vx0, vy0, vx1, vy1 = view.world_rect(w, h)
+    scale, ox, oy, dot_px, lod_px = view.scale, view.ox, view.oy, view.dot_px, view.lod_px
+    if scale >= 1:
+        dot_px = lod_px = 0.0
+    items: List[Tuple[str, int, float]] = []
+    for r in rows:
+        lx, hx = (x0[r], x1[r]) if x0[r] <= x1[r] else (x1[r], x0[r])
+        ly, hy = (y0[r], y1[r]) if y0[r] <= y1[r] else (y1[r], y0[r])
+        pad = width[r] // 2 + 2
+        if lx - pad > vx1 or hx + pad < vx0 or ly - pad > vy1 or hy + pad < vy0:
+            continue
+        size = (max(hx - lx, hy - ly) + width[r]) * scale
+        items.append(("full" if size >= lod_px else "box" if size >= dot_px else "dot", r, size))
+    budget = view.max_detail
+    full = [i for i, it in enumerate(items) if it[0] == "full"]
+    if scale < 1 and budget is not None and len(full) > budget:
+        # 큰 것부터 budget 개만 남기고 나머지는 건너뛴다 (크기가 같으면 위에 있는 것부터)
+        keep = set(sorted(full, key=lambda i: (items[i][2], i), reverse=True)[:budget])
+        items = [it for i, it in enumerate(items) if it[0] != "full" or i in keep]
+    runs: list = []
+    for kind, r, _ in items:
+        if not runs or runs[-1][0] != kind:
+            runs.append((kind, {} if kind == "dot" else []))
+        if kind == "dot":
+            lx, hx = (x0[r], x1[r]) if x0[r] <= x1[r] else (x1[r], x0[r])
+            ly, hy = (y0[r], y1[r]) if y0[r] <= y1[r] else (y1[r], y0[r])
+            c = (fill[r] if has_fill[r] else stroke[r]) | _OPAQUE
+            runs[-1][1].setdefault(c, []).append(QPoint(math.floor(((lx + hx) * 0.5 - ox) * scale),
+                                                        math.floor(((ly + hy) * 0.5 - oy) * scale)))
+        else:
+            runs[-1][1].append(r)
+    return runs